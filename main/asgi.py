@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up; serves live updates, passing on the rest.
+from umealse.live import LiveUpdatesApp  # noqa: E402
+
+application = LiveUpdatesApp(django_application)
@@ -57,19 +57,29 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "taggit",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "umealse.middleware.ReplicaPinningMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "umealse.middleware.SocialGraphMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Opt-in per-request query and timing instrumentation.
+REQUEST_METRICS = os.getenv("REQUEST_METRICS", "").lower() in ("1", "true", "yes")
+REQUEST_METRICS_SLOW_MS = int(os.getenv("REQUEST_METRICS_SLOW_MS", "500"))
+
+if REQUEST_METRICS:
+    MIDDLEWARE.insert(0, "umealse.middleware.RequestMetricsMiddleware")
+
 ROOT_URLCONF = "main.urls"
 
 TEMPLATES = [
@@ -105,6 +115,57 @@ DATABASES = {
     }
 }
 
+# Read replicas, as comma separated "host[:port]" with the primary's credentials.
+DB_REPLICA_HOSTS = [
+    host for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host
+]
+
+DATABASE_REPLICAS: List[str] = []
+for number, replica in enumerate(DB_REPLICA_HOSTS, start=1):
+    host, _, port = replica.partition(":")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DB_PORT,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["umealse.routers.ReplicaRouter"]
+
+# Seconds reads of a client stay on the primary after it wrote.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Sessions and signed in users are read from the cache, see umealse.auth, but
+# only from one shared by all workers: logging out or changing a password has
+# to drop them everywhere, which a per-process cache can't.
+if REDIS_URL:
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    AUTHENTICATION_BACKENDS = ["umealse.auth.CachedModelBackend"]
+else:
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+    AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
+AUTH_USER_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -141,6 +202,40 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# Production asset mode, see umealse.assets: collectstatic writes hashed and
+# precompressed files, and the app serves them and media itself.
+SERVE_ASSETS = os.getenv("SERVE_ASSETS", "").lower() in ("1", "true", "yes")
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "umealse.assets.CompressedManifestStaticFilesStorage"
+            if SERVE_ASSETS
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        )
+    },
+}
+
+# Cache lifetimes of static files without a hashed name, and of media.
+STATIC_MAX_AGE = 60 * 60
+MEDIA_MAX_AGE = 60 * 60 * 24 * 7
+
+# Let the front proxy send file bodies: "X-Accel-Redirect" (nginx, redirected
+# to SENDFILE_LOCATION + "static/" or "media/" + path, which have to be
+# internal locations aliasing STATIC_ROOT and MEDIA_ROOT) or "X-Sendfile".
+SENDFILE_HEADER = os.getenv("SENDFILE_HEADER", "")
+SENDFILE_LOCATION = os.getenv("SENDFILE_LOCATION", "/internal/")
+
+# Live updates over server-sent events, see umealse.live. LocalBroker only
+# reaches connections of its own process; with several workers use
+# "umealse.live.PostgresBroker".
+LIVE_PATH = "/live/"
+LIVE_BROKER = os.getenv("LIVE_BROKER", "umealse.live.LocalBroker")
+LIVE_HEARTBEAT_SECONDS = 15
+LIVE_QUEUE_SIZE = 100
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -159,3 +254,18 @@ LOGOUT_URL = "logout"
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+
+# Profile photos
+
+PROFILE_PHOTO_MAX_SIZE = 10 * 1024 * 1024
+PROFILE_PHOTO_MAX_PIXELS = 40_000_000
+
+
+# Job queue, see umealse.jobs
+
+JOBS_MAX_ATTEMPTS = 5
+# Delay before the first retry, doubled for every next one.
+JOBS_BACKOFF_SECONDS = 10
+# How long a worker may run a job before others consider it dead.
+JOBS_LEASE_SECONDS = 300
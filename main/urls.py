@@ -13,15 +13,29 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from umealse import assets
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("umealse.urls")),
 ]
 
-if settings.DEBUG:
+
+def _prefix(url: str) -> str:
+    return "^" + re.escape(url.lstrip("/")) + "(?P<path>.+)$"
+
+
+if settings.SERVE_ASSETS:
+    urlpatterns += [
+        re_path(_prefix(settings.STATIC_URL), assets.serve_static),
+        re_path(_prefix(settings.MEDIA_URL), assets.serve_media),
+    ]
+elif settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
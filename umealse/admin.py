@@ -1,10 +1,25 @@
+from typing import Tuple
+
 from django.contrib import admin
-from .models import Event, Profile
+from django.db.models.query import QuerySet
+from django.http import HttpRequest
+
+from .models import Event, Job, Profile
+from .search import search_events
 
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ["title", "host", "created", "event_date", "private", "status"]
+    list_display = [
+        "title",
+        "host",
+        "created",
+        "event_date",
+        "private",
+        "status",
+        "attendee_count",
+        "capacity",
+    ]
     list_filter = ["status", "host", "created", "event_date", "private"]
     search_fields = ["title", "body"]
     prepopulated_fields = {"slug": ("title",)}
@@ -12,8 +27,23 @@ class EventAdmin(admin.ModelAdmin):
     date_hierarchy = "event_date"
     ordering = ["event_date"]
 
+    def get_search_results(
+        self, request: HttpRequest, queryset: QuerySet, search_term: str
+    ) -> Tuple[QuerySet, bool]:
+        """Search through the full-text index instead of `ILIKE` scans."""
+        if not search_term.strip():
+            return queryset, False
+        return search_events(queryset, search_term), False
+
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ["user", "photo"]
     raw_id_fields = ["user"]
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["func", "key", "status", "run_at", "attempts", "created"]
+    list_filter = ["status", "func"]
+    search_fields = ["key"]
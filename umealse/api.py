@@ -0,0 +1,287 @@
+"""Read-only JSON API for mobile clients, versioned by its URL prefix.
+
+Every list endpoint takes:
+
+- `fields`: comma separated fields to include instead of the default ones,
+- `cursor` and `limit`: keyset pagination, see `umealse.pagination`,
+- `ids`: comma separated ids to fetch as one batch instead of a page.
+
+Rows are loaded with the same plans as the HTML views (e.g.
+`EventQuerySet.with_list_relations`), chosen by the requested fields, so a
+response costs a fixed number of queries however many rows it has. Objects
+are serialized by plain functions straight into compact JSON.
+"""
+from dataclasses import dataclass
+from functools import wraps
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model
+from django.db.models.query import QuerySet
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from taggit.models import Tag
+
+from .models import Event, Friendship, Profile
+from .pagination import InvalidCursor, KeysetPaginator
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_IDS = 100
+
+
+class ApiError(Exception):
+    """Raised on invalid query parameters; answered with status 400."""
+
+
+@dataclass
+class Resource:
+    """How to load and serialize one kind of object.
+
+    `load` adds to a queryset whatever relations the given fields read.
+    """
+
+    fields: Dict[str, Callable[[Any], Any]]
+    default: Sequence[str]
+    ordering: Sequence[str]
+    load: Callable[[QuerySet, Sequence[str]], QuerySet]
+
+
+def _load_events(events: QuerySet, fields: Sequence[str]) -> QuerySet:
+    if "attendees" in fields:
+        return events.with_detail_relations()
+    if "tags" in fields:
+        return events.with_list_relations()
+    if "host" in fields:
+        return events.select_related("host")
+    return events
+
+
+def _load_profiles(profiles: QuerySet, fields: Sequence[str]) -> QuerySet:
+    return profiles.select_related("user")
+
+
+def _load_friendships(friendships: QuerySet, fields: Sequence[str]) -> QuerySet:
+    relations = [
+        relation
+        for field, relation in [
+            ("from_username", "from_user__user"),
+            ("to_username", "to_user__user"),
+        ]
+        if field in fields
+    ]
+    return friendships.select_related(*relations) if relations else friendships
+
+
+def _as_is(objects: QuerySet, fields: Sequence[str]) -> QuerySet:
+    return objects
+
+
+EVENT = Resource(
+    fields={
+        "id": attrgetter("id"),
+        "title": attrgetter("title"),
+        "slug": attrgetter("slug"),
+        "host": lambda event: event.host.username,
+        "body": attrgetter("body"),
+        "publish": attrgetter("publish"),
+        "event_date": attrgetter("event_date"),
+        "updated": attrgetter("updated"),
+        "capacity": attrgetter("capacity"),
+        "attendee_count": attrgetter("attendee_count"),
+        "latitude": attrgetter("latitude"),
+        "longitude": attrgetter("longitude"),
+        "tags": lambda event: sorted(tag.name for tag in event.tags.all()),
+        "attendees": lambda event: sorted(
+            user.username for user in event.attendees.all()
+        ),
+        "url": lambda event: event.get_absolute_url(),
+    },
+    default=[
+        "id",
+        "title",
+        "host",
+        "event_date",
+        "capacity",
+        "attendee_count",
+        "tags",
+        "url",
+    ],
+    ordering=("-event_date", "-id"),
+    load=_load_events,
+)
+
+TAG = Resource(
+    fields={
+        "id": attrgetter("id"),
+        "name": attrgetter("name"),
+        "slug": attrgetter("slug"),
+        "url": lambda tag: reverse("event_list_by_tag", args=[tag.slug]),
+    },
+    default=["id", "name", "slug"],
+    ordering=("name", "id"),
+    load=_as_is,
+)
+
+PROFILE = Resource(
+    fields={
+        "id": attrgetter("id"),
+        "username": lambda profile: profile.user.username,
+        "first_name": lambda profile: profile.user.first_name,
+        "last_name": lambda profile: profile.user.last_name,
+        "photo": lambda profile: profile.photo.url if profile.photo else None,
+        "photo_variants": attrgetter("photo_variant_urls"),
+        "url": lambda profile: reverse("profile", args=[profile.user.username]),
+    },
+    default=["id", "username", "first_name", "last_name", "photo"],
+    ordering=("id",),
+    load=_load_profiles,
+)
+
+FRIENDSHIP = Resource(
+    fields={
+        "id": attrgetter("id"),
+        "from_user": attrgetter("from_user_id"),
+        "to_user": attrgetter("to_user_id"),
+        "from_username": lambda friendship: friendship.from_user.user.username,
+        "to_username": lambda friendship: friendship.to_user.user.username,
+    },
+    default=["id", "from_user", "to_user"],
+    ordering=("id",),
+    load=_load_friendships,
+)
+
+
+def _json(data: Dict[str, Any], status: int = 200) -> JsonResponse:
+    return JsonResponse(
+        data,
+        status=status,
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={"separators": (",", ":")},
+    )
+
+
+def api_view(view: Callable[..., HttpResponse]) -> Callable[..., HttpResponse]:
+    """Answer GETs of signed in users only, turning `ApiError` into a 400."""
+
+    @require_GET
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if not request.user.is_authenticated:
+            return _json({"error": "Authentication required."}, status=401)
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as e:
+            return _json({"error": str(e)}, status=400)
+
+    return wrapper
+
+
+def _fields(request: HttpRequest, resource: Resource) -> Sequence[str]:
+    value = request.GET.get("fields", "")
+    if not value:
+        return resource.default
+    names = (name.strip() for name in value.split(","))
+    fields = list(dict.fromkeys(name for name in names if name))
+    unknown = [name for name in fields if name not in resource.fields]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+
+def _int_list(request: HttpRequest, name: str) -> Optional[List[int]]:
+    if name not in request.GET:
+        return None
+    try:
+        values = [int(value) for value in request.GET[name].split(",") if value]
+    except ValueError:
+        raise ApiError(f"{name} must be comma separated integers.")
+    return list(dict.fromkeys(values))
+
+
+def _limit(request: HttpRequest) -> int:
+    try:
+        limit = int(request.GET.get("limit", PAGE_SIZE))
+    except ValueError:
+        raise ApiError("limit must be an integer.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ApiError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+    return limit
+
+
+def _serialize(obj: Model, resource: Resource, fields: Sequence[str]) -> Dict:
+    return {name: resource.fields[name](obj) for name in fields}
+
+
+def _respond(
+    request: HttpRequest, objects: QuerySet, resource: Resource
+) -> HttpResponse:
+    """Serialize a page of objects, or the batch named by `ids`."""
+    fields = _fields(request, resource)
+    objects = resource.load(objects, fields)
+
+    ids = _int_list(request, "ids")
+    if ids is not None:
+        if len(ids) > MAX_IDS:
+            raise ApiError(f"At most {MAX_IDS} ids can be fetched at once.")
+        found = {obj.pk: obj for obj in objects.filter(pk__in=ids)}
+        return _json(
+            {
+                "data": [
+                    _serialize(found[pk], resource, fields) for pk in ids if pk in found
+                ]
+            }
+        )
+
+    paginator = KeysetPaginator(objects, _limit(request), ordering=resource.ordering)
+    try:
+        page = paginator.page(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise ApiError("Invalid cursor.")
+    return _json(
+        {
+            "data": [_serialize(obj, resource, fields) for obj in page.object_list],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        }
+    )
+
+
+@api_view
+def events(request: HttpRequest) -> HttpResponse:
+    """Published events, latest first, optionally only those with `tag`."""
+    events = Event.published.all()
+    if request.GET.get("tag"):
+        events = events.filter(tags__slug=request.GET["tag"])
+    return _respond(request, events, EVENT)
+
+
+@api_view
+def tags(request: HttpRequest) -> HttpResponse:
+    """All tags by name."""
+    return _respond(request, Tag.objects.all(), TAG)
+
+
+@api_view
+def profiles(request: HttpRequest) -> HttpResponse:
+    """All profiles, or the user's friends with `friends=1`."""
+    profiles = Profile.objects.all()
+    if request.GET.get("friends"):
+        profile = request.social.profile
+        profiles = profile.friends.all() if profile else Profile.objects.none()
+    return _respond(request, profiles, PROFILE)
+
+
+@api_view
+def friendships(request: HttpRequest) -> HttpResponse:
+    """Pending friend requests sent to the user, or sent by them with `sent=1`."""
+    profile = request.social.profile
+    if profile is None:
+        friendships = Friendship.objects.none()
+    elif request.GET.get("sent"):
+        friendships = Friendship.objects.filter(from_user=profile)
+    else:
+        friendships = Friendship.objects.filter(to_user=profile)
+    return _respond(request, friendships, FRIENDSHIP)
@@ -0,0 +1,244 @@
+"""Serving static files and media in production.
+
+`CompressedManifestStaticFilesStorage` gives collected files content hashed
+names and writes precompressed variants next to them while `collectstatic`
+runs: gzip always, brotli when the optional `brotli` package is installed.
+
+`serve_static` and `serve_media` answer with validators, range requests and
+cache headers; hashed static files are cached for a year as immutable. They
+pick the smallest precompressed variant the client accepts, or, with
+`SENDFILE_HEADER` set, leave sending the body to the front proxy.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from typing import Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE = {".css", ".js", ".map", ".svg", ".txt", ".html", ".json", ".xml"}
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+# Names given by `ManifestStaticFilesStorage`, e.g. `css/umealse.0123456789ab.css`.
+_HASHED = re.compile(r"\.[0-9a-f]{12}(\.[^./]+)?$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _compressors() -> Iterator[Tuple[str, str]]:
+    """Encodings of precompressed variants and their extensions, best first."""
+    if brotli is not None:
+        yield "br", ".br"
+    yield "gzip", ".gz"
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage also writing `.br` and `.gz` variants of text files.
+
+    A variant is only kept if it's noticeably smaller than the original.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                names.update([name, hashed_name])
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(names):
+                self._compress(name)
+
+    def _compress(self, name: str) -> None:
+        if os.path.splitext(name)[1] not in COMPRESSIBLE:
+            return
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for encoding, extension in _compressors():
+            compressed = compress(data, encoding)
+            variant = name + extension
+            if self.exists(variant):
+                self.delete(variant)
+            if len(compressed) < len(data) * 0.95:
+                self._save(variant, ContentFile(compressed))
+
+
+def _accepts(request: HttpRequest, encoding: str) -> bool:
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = item.partition(";")
+        if name.strip().lower() == encoding:
+            return not re.fullmatch(r"\s*q=0(\.0*)?\s*", params)
+    return False
+
+
+def _byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """First and last byte of a single `Range`, None to send the whole file.
+
+    Raises ValueError if the range can't be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        # Multiple ranges or other units; sending everything is allowed.
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read(path: str, start: int, length: int) -> Iterable[bytes]:
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(
+    request: HttpRequest, root: str, path: str, kind: str, cache_control: str
+) -> HttpResponse:
+    """Answer a GET or HEAD of a file under root; `kind` names the root."""
+    try:
+        fullpath = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    stat = os.stat(fullpath)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    headers = {
+        "Cache-Control": cache_control,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+    }
+    content_type, file_encoding = mimetypes.guess_type(path)
+    if file_encoding or not content_type:
+        # Compressed files requested as such are sent as they are.
+        content_type = "application/octet-stream"
+    served, size, encoding = fullpath, stat.st_size, None
+    range_header = request.headers.get("Range")
+    if settings.SENDFILE_HEADER:
+        # The proxy answers ranges, and would drop Content-Encoding.
+        range_header = None
+    else:
+        variants = [
+            (name, fullpath + extension)
+            for name, extension in _compressors()
+            if os.path.isfile(fullpath + extension)
+        ]
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+        if not range_header:
+            for name, variant in variants:
+                if _accepts(request, name):
+                    served, size, encoding = variant, os.path.getsize(variant), name
+                    etag = f'{etag[:-1]}-{name}"'
+                    break
+    headers["ETag"] = etag
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is not None:
+        for header in ("Cache-Control", "ETag", "Last-Modified", "Vary"):
+            if header in headers:
+                response[header] = headers[header]
+        return response
+
+    if range_header and request.headers.get("If-Range", etag) != etag:
+        range_header = None
+    try:
+        byte_range = _byte_range(range_header, size) if range_header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if settings.SENDFILE_HEADER:
+        response = HttpResponse(content_type=content_type)
+        if settings.SENDFILE_HEADER == "X-Accel-Redirect":
+            location = f"{settings.SENDFILE_LOCATION}{kind}/{quote(path)}"
+            response[settings.SENDFILE_HEADER] = location
+        else:
+            response[settings.SENDFILE_HEADER] = fullpath
+    elif byte_range is None:
+        response = FileResponse(open(served, "rb"), content_type=content_type)
+        # It would name the precompressed variant.
+        del response["Content-Disposition"]
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read(served, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    for header, value in headers.items():
+        if header == "Vary":
+            patch_vary_headers(response, [value])
+        else:
+            response[header] = value
+    return response
+
+
+@require_safe
+def serve_static(request: HttpRequest, path: str) -> HttpResponse:
+    """Serve a collected static file, cached for good if its name is hashed."""
+    cache_control = (
+        IMMUTABLE
+        if _HASHED.search(path)
+        else f"public, max-age={settings.STATIC_MAX_AGE}"
+    )
+    return serve_file(request, settings.STATIC_ROOT, path, "static", cache_control)
+
+
+@require_safe
+def serve_media(request: HttpRequest, path: str) -> HttpResponse:
+    """Serve an uploaded file such as a profile photo or its variants."""
+    cache_control = f"public, max-age={settings.MEDIA_MAX_AGE}"
+    return serve_file(request, settings.MEDIA_ROOT, path, "media", cache_control)
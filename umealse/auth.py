@@ -0,0 +1,66 @@
+"""Authentication backend keeping signed in users in the cache.
+
+Together with the `cached_db` session engine this lets a page of a signed in
+user run without identity queries: the session comes from the cache, and so
+does the user, with its profile already attached for `request.user.profile`
+and `request.social`.
+
+Django still checks the session's auth hash against the cached user, so the
+entry must never outlive a password change: `umealse.signals` drops it
+whenever the user or their profile is saved or deleted. That only reaches
+other workers through a shared cache, so settings use this backend only
+when `REDIS_URL` is set.
+"""
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+
+def user_cache_key(user_id: Any) -> str:
+    return f"umealse:auth-user:{user_id}"
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a cached user, now and again once the transaction commits.
+
+    The second delete covers a request caching the old row in between.
+    """
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedModelBackend(ModelBackend):
+    """`ModelBackend` reading users (and their profiles) through the cache."""
+
+    def get_user(self, user_id: Any) -> Optional[User]:
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User._default_manager.select_related("profile").get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            if not self.user_can_authenticate(user):
+                return None
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+    async def aget_user(self, user_id: Any) -> Optional[User]:
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            try:
+                user = await User._default_manager.select_related("profile").aget(
+                    pk=user_id
+                )
+            except User.DoesNotExist:
+                return None
+            if not self.user_can_authenticate(user):
+                return None
+            await cache.aset(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
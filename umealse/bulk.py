@@ -0,0 +1,232 @@
+"""Streaming import and export of events in JSON Lines and CSV formats.
+
+Rows are plain dicts with `FIELDS` as keys; users (`host`, `attendees`) are
+referenced by username and tags by name. Both directions work in batches,
+so memory use doesn't depend on the size of the file.
+"""
+import csv
+import json
+from itertools import islice
+from typing import IO, Any, Dict, Iterable, Iterator, List, Set
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.db.models.query import QuerySet
+from django.utils.text import slugify
+from taggit.models import Tag, TaggedItem
+from taggit.utils import edit_string_for_tags, parse_tags
+
+from . import timeline
+from .models import Event
+from .search import update_search_vectors
+
+Row = Dict[str, Any]
+
+FORMATS = ("jsonl", "csv")
+FIELDS = [
+    "title",
+    "slug",
+    "host",
+    "body",
+    "publish",
+    "event_date",
+    "private",
+    "status",
+    "capacity",
+    "latitude",
+    "longitude",
+    "tags",
+    "attendees",
+]
+# Columns copied onto `Event` as they are, after `to_python` conversion.
+SIMPLE_FIELDS = [
+    "title",
+    "slug",
+    "body",
+    "publish",
+    "event_date",
+    "private",
+    "status",
+    "capacity",
+    "latitude",
+    "longitude",
+]
+
+
+class InvalidRow(Exception):
+    """Raised when an imported row can't be turned into an event."""
+
+
+def read_events(file: IO[str], format: str) -> Iterator[Row]:
+    """Parse rows lazily from a text file in given format."""
+    if format == "jsonl":
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+        return
+    for record in csv.DictReader(file):
+        row: Row = dict(record)
+        row["tags"] = parse_tags(row.get("tags") or "")
+        row["attendees"] = (row.get("attendees") or "").split()
+        yield row
+
+
+def write_events(rows: Iterable[Row], file: IO[str], format: str) -> Iterator[Row]:
+    """Write rows to a text file, yielding each one once it's written."""
+    if format == "jsonl":
+        for row in rows:
+            file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            yield row
+        return
+    writer = csv.DictWriter(file, FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(
+            {
+                **row,
+                "tags": edit_string_for_tags([Tag(name=name) for name in row["tags"]]),
+                "attendees": " ".join(row["attendees"]),
+            }
+        )
+        yield row
+
+
+def export_events(events: QuerySet, batch_size: int = 1000) -> Iterator[Row]:
+    """Serialize events into rows, fetching `batch_size` of them at a time."""
+    events = (
+        events.select_related("host")
+        .prefetch_related(
+            "tags", Prefetch("attendees", queryset=User.objects.only("username"))
+        )
+        .order_by("id")
+    )
+    for event in events.iterator(chunk_size=batch_size):
+        yield {
+            "title": event.title,
+            "slug": event.slug,
+            "host": event.host.username,
+            "body": event.body,
+            "publish": event.publish.isoformat(),
+            "event_date": event.event_date.isoformat(),
+            "private": event.private,
+            "status": event.status,
+            "capacity": event.capacity,
+            "latitude": event.latitude,
+            "longitude": event.longitude,
+            "tags": sorted(tag.name for tag in event.tags.all()),
+            "attendees": sorted(user.username for user in event.attendees.all()),
+        }
+
+
+def import_events(rows: Iterable[Row], batch_size: int = 1000) -> Iterator[int]:
+    """Create events from rows, `batch_size` at a time.
+
+    Every batch is inserted in its own transaction with a handful of bulk
+    queries, whatever its size. Yields the number of events imported so far;
+    a bad row raises `InvalidRow`, rolling back only its batch.
+    """
+    rows = iter(rows)
+    done = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        _import_batch(batch, first_row=done + 1)
+        done += len(batch)
+        yield done
+
+
+def _import_batch(batch: List[Row], first_row: int) -> None:
+    usernames: Set[str] = set()
+    for row in batch:
+        usernames.add(row.get("host") or "")
+        usernames.update(row.get("attendees") or [])
+    user_ids = dict(
+        User.objects.filter(username__in=usernames).values_list("username", "id")
+    )
+
+    events = [
+        _build_event(row, user_ids, number)
+        for number, row in enumerate(batch, start=first_row)
+    ]
+    with transaction.atomic():
+        # Signals aren't sent by bulk_create, so the work of the receivers in
+        # `umealse.signals` is done below for the whole batch at once.
+        Event.objects.bulk_create(events)
+        tag_ids = _tag_ids({name for row in batch for name in row.get("tags") or []})
+        content_type = ContentType.objects.get_for_model(Event)
+        TaggedItem.objects.bulk_create(
+            [
+                TaggedItem(content_type=content_type, object_id=event.id, tag_id=tag_id)
+                for event, row in zip(events, batch)
+                for tag_id in {tag_ids[name] for name in row.get("tags") or []}
+            ]
+        )
+        Event.attendees.through.objects.bulk_create(
+            [
+                Event.attendees.through(event_id=event.id, user_id=user_ids[username])
+                for event, row in zip(events, batch)
+                for username in row.get("attendees") or []
+            ],
+            ignore_conflicts=True,
+        )
+        update_search_vectors(Event.objects.filter(id__in=[e.id for e in events]))
+        timeline.fan_out_new(events)
+
+
+def _build_event(row: Row, user_ids: Dict[str, int], number: int) -> Event:
+    missing = [
+        username
+        for username in [row.get("host"), *(row.get("attendees") or [])]
+        if username not in user_ids
+    ]
+    if missing:
+        raise InvalidRow(f"Row {number}: unknown user {missing[0]!r}.")
+
+    values = {
+        name: row[name] for name in SIMPLE_FIELDS if row.get(name) not in (None, "")
+    }
+    values.setdefault("slug", slugify(values.get("title", "")))
+    event = Event(
+        host_id=user_ids[row["host"]],
+        attendee_count=len(set(row.get("attendees") or [])),
+    )
+    try:
+        for name, value in values.items():
+            setattr(event, name, Event._meta.get_field(name).to_python(value))
+        # Constraints are checked below, validating them would cost a query.
+        event.full_clean(
+            exclude=["host"], validate_unique=False, validate_constraints=False
+        )
+    except ValidationError as e:
+        raise InvalidRow(f"Row {number}: {'; '.join(e.messages)}") from e
+    if (event.latitude is None) != (event.longitude is None):
+        raise InvalidRow(f"Row {number}: give both latitude and longitude.")
+    event.geohash = event.compute_geohash()
+    if event.capacity is not None and event.attendee_count > event.capacity:
+        raise InvalidRow(
+            f"Row {number}: {event.attendee_count} attendees exceed "
+            f"capacity {event.capacity}."
+        )
+    return event
+
+
+def _tag_ids(names: Set[str]) -> Dict[str, int]:
+    """Map tag names to ids, creating tags that don't exist yet."""
+    if not names:
+        return {}
+    tags = Tag.objects.filter(name__in=names)
+    found = dict(tags.values_list("name", "id"))
+    if names - found.keys():
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=Tag().slugify(name)) for name in names - found.keys()],
+            ignore_conflicts=True,
+        )
+        found = dict(tags.values_list("name", "id"))
+    for name in names - found.keys():
+        # Its slug is taken by a differently named tag; `save` picks a free one.
+        found[name] = Tag.objects.create(name=name).id
+    return found
@@ -0,0 +1,63 @@
+"""Cached rendering of event cards shown on list pages.
+
+A card only depends on the event itself, so rendered HTML is cached under a
+key made of the event id and its `updated` timestamp. Whatever changes a card
+(saving the event, changing its tags) bumps `updated`, which makes old keys
+unreachable; see `umealse.signals` for explicit invalidation.
+"""
+from typing import Dict, List
+
+from django.core.cache import cache
+from django.db.models import aprefetch_related_objects, prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+
+from .models import Event
+
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_cache_key(event: Event) -> str:
+    return f"umealse:event-card:{event.pk}:{event.updated.timestamp()}"
+
+
+def _render_misses(events: List[Event]) -> Dict[str, str]:
+    return {
+        card_cache_key(event): render_to_string("event/card.html", {"event": event})
+        for event in events
+    }
+
+
+def render_cards(events: List[Event]) -> List[SafeString]:
+    """Return rendered cards of events, rendering only those not cached yet.
+
+    Cached cards are fetched with a single multi-get. Tags are loaded only
+    for the events that have to be rendered, so a warm page costs no queries
+    beyond the one fetching events.
+    """
+    keys = [card_cache_key(event) for event in events]
+    cards = cache.get_many(keys)
+    misses = [event for event, key in zip(events, keys) if key not in cards]
+    if misses:
+        prefetch_related_objects(misses, "tags")
+        rendered = _render_misses(misses)
+        cache.set_many(rendered, CARD_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+async def arender_cards(events: List[Event]) -> List[SafeString]:
+    """Async version of `render_cards`."""
+    keys = [card_cache_key(event) for event in events]
+    cards = await cache.aget_many(keys)
+    misses = [event for event, key in zip(events, keys) if key not in cards]
+    if misses:
+        await aprefetch_related_objects(misses, "tags")
+        rendered = _render_misses(misses)
+        await cache.aset_many(rendered, CARD_TIMEOUT)
+        cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+def invalidate_card(event: Event) -> None:
+    cache.delete(card_cache_key(event))
@@ -0,0 +1,172 @@
+"""Conditional GET (`ETag` / `Last-Modified`) for event pages.
+
+Validators are computed from cheap single-row or aggregate queries over
+`Event.updated`, which is bumped whenever an event, its tags or attendees
+change, so unchanged pages are answered with 304 before the view runs.
+
+Pages showing flash messages are never validated: the messages are shown
+once, so neither a 304 nor a later revalidation of such a page may hide or
+repeat them.
+"""
+import datetime
+import hashlib
+from functools import wraps
+from typing import Awaitable, Callable, Iterable, Optional, Tuple, Union
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AbstractBaseUser, AnonymousUser
+from django.contrib.messages import get_messages
+from django.db.models import Max, Subquery
+from django.db.models.functions import Greatest
+from django.db.models.query import QuerySet
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .ical import feed_events, token_user_id
+from .models import Event, EventRemoval
+
+
+Validators = Tuple[Optional[str], Optional[datetime.datetime]]
+View = Callable[..., Awaitable[HttpResponse]]
+
+
+def mark_events_removed(
+    everywhere: bool = False,
+    tags: Iterable[str] = (),
+    users: Iterable[int] = (),
+) -> None:
+    """Record that events left the lists and feeds of some tags or users.
+
+    Such a change doesn't raise the latest `updated` of the list it left, so
+    its validators also take the `EventRemoval` of its scope into account:
+    "all" for the event list, "tag:<slug>" for a tag's list and feed and
+    "user:<id>" for a user's own calendar feed. The row is written in the
+    transaction removing the events, so it's seen by every worker exactly
+    when the new content is.
+    """
+    scopes = [f"tag:{slug}" for slug in tags] + [f"user:{pk}" for pk in users]
+    if everywhere:
+        scopes.append("all")
+    if not scopes:
+        return
+    now = timezone.now()
+    EventRemoval.objects.bulk_create(
+        # In key order, so concurrent removals lock rows in the same order.
+        [EventRemoval(scope=scope, removed=now) for scope in sorted(set(scopes))],
+        update_conflicts=True,
+        unique_fields=["scope"],
+        update_fields=["removed"],
+    )
+
+
+async def _latest(events: QuerySet, scope: str) -> Optional[datetime.datetime]:
+    """Latest `updated` of events, or removal from their scope if later."""
+    removed = EventRemoval.objects.filter(scope=scope).values("removed")
+    # Both in one query; GREATEST skips NULLs.
+    latest = Greatest(Max("updated"), Subquery(removed))
+    return (await events.aaggregate(latest=latest))["latest"]
+
+
+def conditional_page(
+    validators: Callable[..., Awaitable[Validators]]
+) -> Callable[[View], View]:
+    """Like Django's `condition`, for async views.
+
+    `validators` is awaited with the view's arguments and returns both the
+    ETag and the last modification time, so they share a single query.
+    """
+
+    def decorator(view: View) -> View:
+        @wraps(view)
+        async def inner(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if await _has_messages(request):
+                return await view(request, *args, **kwargs)
+            etag, last_modified = await validators(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                if timestamp and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(timestamp)
+                if etag:
+                    response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
+
+    return decorator
+
+
+async def _has_messages(request: HttpRequest) -> bool:
+    """Whether messages are waiting to be shown, without marking them shown."""
+    if not hasattr(request, "_messages"):
+        return False
+    # Loading them may read the session.
+    return await sync_to_async(lambda: len(get_messages(request)) > 0)()
+
+
+def _user_version(user: Union[AbstractBaseUser, AnonymousUser]) -> str:
+    """Digest of the user fields pages show, e.g. the greeting in the header."""
+    fields = [
+        user.pk,
+        user.get_username(),
+        getattr(user, "first_name", ""),
+        getattr(user, "last_login", None),
+    ]
+    return hashlib.md5(repr(fields).encode()).hexdigest()[:12]
+
+
+def _for_user(
+    user: Union[AbstractBaseUser, AnonymousUser],
+    prefix: str,
+    updated: Optional[datetime.datetime],
+) -> Validators:
+    """Pages greet the current user, so changes to them invalidate pages too."""
+    if updated is None:
+        return None, None
+    last_login = getattr(user, "last_login", None)
+    if last_login:
+        updated = max(updated, last_login)
+    return f"{prefix}-{_user_version(user)}-{updated.timestamp()}", updated
+
+
+async def event_detail_validators(request: HttpRequest, id: int) -> Validators:
+    updated = (
+        await Event.published.filter(id=id).values_list("updated", flat=True).afirst()
+    )
+    user = await request.auser()  # type: ignore[attr-defined]
+    # Without validators for a missing event the view answers with 404.
+    return _for_user(user, f"event-{id}", updated)
+
+
+async def event_list_validators(request: HttpRequest, tag_slug: str = "") -> Validators:
+    # Drafts are included on purpose: unpublishing bumps their `updated`.
+    events = Event.objects.all()
+    if tag_slug:
+        events = events.filter(tags__slug=tag_slug)
+    scope = f"tag:{tag_slug}" if tag_slug else "all"
+    updated = await _latest(events, scope)
+    user = await request.auser()  # type: ignore[attr-defined]
+    return _for_user(user, f"events-{tag_slug}", updated)
+
+
+async def calendar_validators(
+    request: HttpRequest, token: str, tag_slug: str = ""
+) -> Validators:
+    user_id = token_user_id(token)
+    if user_id is None:
+        return None, None
+    events = feed_events(user_id, tag_slug)
+    scope = f"tag:{tag_slug}" if tag_slug else f"user:{user_id}"
+    updated = await _latest(events, scope)
+    if updated is None:
+        return None, None
+    # Feeds only reach back `ical.PAST_DAYS`, a window moving every day.
+    today = timezone.localdate()
+    return f"calendar-{user_id}-{tag_slug}-{updated.timestamp()}-{today}", updated
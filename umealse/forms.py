@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth.models import User
+from .images import check_image
 from .models import Event, Profile
 
 
@@ -47,8 +48,57 @@ class ProfileEditForm(forms.ModelForm):
         model = Profile
         fields = ["photo"]
 
+    def clean_photo(self):
+        photo = self.cleaned_data["photo"]
+        if photo and "photo" in self.changed_data:
+            check_image(photo)
+        return photo
+
 
 class EventAddForm(forms.ModelForm):
     class Meta:
         model = Event
-        fields = ["title", "body", "event_date", "private", "tags"]
+        fields = [
+            "title",
+            "body",
+            "event_date",
+            "private",
+            "capacity",
+            "latitude",
+            "longitude",
+            "tags",
+        ]
+
+
+class InviteForm(forms.Form):
+    friends = forms.ModelMultipleChoiceField(
+        queryset=Profile.objects.none(),
+        widget=forms.CheckboxSelectMultiple,
+        required=False,
+    )
+    everyone = forms.BooleanField(label="Invite all friends", required=False)
+
+    def __init__(self, profile: Profile, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.all_friends = profile.friends.select_related("user").order_by(
+            "user__username"
+        )
+        self.fields["friends"].queryset = self.all_friends
+
+    def clean(self):
+        cd = super().clean()
+        if not cd.get("everyone") and not cd.get("friends"):
+            raise forms.ValidationError("Pick friends to invite.")
+        return cd
+
+    def guests(self):
+        cd = self.cleaned_data
+        return list(self.all_friends) if cd["everyone"] else list(cd["friends"])
+
+
+class NearbyForm(forms.Form):
+    latitude = forms.FloatField(min_value=-90, max_value=90)
+    longitude = forms.FloatField(min_value=-180, max_value=180)
+    radius = forms.FloatField(
+        label="Radius (km)", min_value=0.1, max_value=100, initial=5
+    )
@@ -0,0 +1,129 @@
+"""Location search of events over geohashes, without PostGIS.
+
+A geohash interleaves bits of longitude and latitude into a base32 string,
+so every prefix names a rectangular cell and all points in a cell share it.
+`nearby` covers the search circle with the smallest cell at least as large
+as the radius and its eight neighbours, which turns the search into a few
+index range scans over `Event.geohash`; exact great-circle distances are
+then computed in SQL for those candidates only.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import F, Q, Value
+from django.db.models.expressions import CombinedExpression
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+from django.db.models.query import QuerySet
+
+ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+_INDEX: Dict[str, int] = {char: i for i, char in enumerate(ALPHABET)}
+
+
+def encode(latitude: float, longitude: float, precision: int = PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(ALPHABET[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Height and width of a cell in degrees of latitude and longitude."""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180 / 2**lat_bits, 360 / 2**lon_bits
+
+
+def cover(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    """Geohash prefixes of cells together covering the circle.
+
+    An empty list means the circle is too large for any cell but the whole
+    world.
+    """
+    # Cells narrow towards the poles, so measure them at the circle's far edge.
+    far = min(abs(latitude) + radius_km / KM_PER_DEGREE, 89.9)
+    scale = math.cos(math.radians(far))
+    precision = 0
+    for candidate in range(1, PRECISION + 1):
+        height, width = cell_size(candidate)
+        if min(height * KM_PER_DEGREE, width * KM_PER_DEGREE * scale) < radius_km:
+            break
+        precision = candidate
+    if precision == 0:
+        return []
+    height, width = cell_size(precision)
+    prefixes = set()
+    for dlat in (-height, 0, height):
+        for dlon in (-width, 0, width):
+            lat = latitude + dlat
+            if -90 <= lat <= 90:
+                lon = (longitude + dlon + 180) % 360 - 180
+                prefixes.add(encode(lat, lon, precision))
+    return sorted(prefixes)
+
+
+def _successor(prefix: str) -> Optional[str]:
+    """The first string after all those starting with prefix, in any collation.
+
+    Geohash characters sort the same way in every collation, unlike the ASCII
+    character following them, so the bound is built from the alphabet.
+    """
+    while prefix:
+        last = _INDEX[prefix[-1]]
+        if last + 1 < len(ALPHABET):
+            return prefix[:-1] + ALPHABET[last + 1]
+        prefix = prefix[:-1]
+    return None
+
+
+def prefix_filter(prefixes: List[str]) -> Q:
+    """Range conditions matching geohashes starting with any of prefixes."""
+    condition = Q()
+    for prefix in prefixes:
+        upper = _successor(prefix)
+        condition |= Q(geohash__gte=prefix) & (Q(geohash__lt=upper) if upper else Q())
+    return condition
+
+
+def distance_km(latitude: float, longitude: float) -> CombinedExpression:
+    """Haversine distance of an event from a point."""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = Radians(F("latitude")), Radians(F("longitude"))
+    sin_lat = Sin((lat2 - Value(lat1)) / 2)
+    sin_lon = Sin((lon2 - Value(lon1)) / 2)
+    half_chord = Power(sin_lat, 2) + Cos(Value(lat1)) * Cos(lat2) * Power(sin_lon, 2)
+    # Rounding can push the sine just over 1, out of ASIN's domain.
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(Least(half_chord, Value(1.0))))
+
+
+def nearby(
+    events: QuerySet, latitude: float, longitude: float, radius_km: float
+) -> QuerySet:
+    """Events within radius_km of a point, nearest first, as `distance`."""
+    prefixes = cover(latitude, longitude, radius_km)
+    if prefixes:
+        events = events.filter(prefix_filter(prefixes))
+    return (
+        events.filter(geohash__isnull=False)
+        .annotate(distance=distance_km(latitude, longitude))
+        .filter(distance__lte=radius_km)
+        .order_by("distance", "id")
+    )
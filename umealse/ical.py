@@ -0,0 +1,128 @@
+"""iCalendar (RFC 5545) feeds of events, for calendar apps to subscribe to.
+
+Calendar apps can't log in, so feed URLs carry a signed token naming the
+user instead. Feeds are streamed: events are read through a server-side
+cursor and written out one at a time, so a feed is never held in memory.
+That takes an iterator of the handler's kind: Django reads an async one
+into a list under WSGI, and a sync one under ASGI.
+"""
+import datetime
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from django.contrib.auth.models import AbstractBaseUser
+from django.core import signing
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from .models import Event
+
+# Past events stay in feeds this long, so calendars keep recent history.
+PAST_DAYS = 30
+CHUNK_SIZE = 500
+
+_signer = signing.Signer(salt="umealse.calendar")
+
+
+def calendar_token(user: AbstractBaseUser) -> str:
+    return _signer.sign(str(user.pk))
+
+
+def token_user_id(token: str) -> Optional[int]:
+    """Id of the user a token was made for, None if it's forged."""
+    try:
+        return int(_signer.unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def feed_events(user_id: int, tag_slug: str = "") -> QuerySet:
+    """All events of a feed, drafts included; see `window`.
+
+    Without a tag it's the user's own calendar: events they host or attend.
+    """
+    if tag_slug:
+        return Event.objects.filter(tags__slug=tag_slug)
+    return Event.objects.filter(Q(host_id=user_id) | Q(attendees=user_id)).distinct()
+
+
+def window(events: QuerySet) -> QuerySet:
+    """Published events of a feed that calendars are sent."""
+    since = timezone.now() - datetime.timedelta(days=PAST_DAYS)
+    return events.filter(status=Event.Status.PUBLISHED, event_date__gte=since)
+
+
+def _escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _line(name: str, value: str) -> str:
+    """A content line folded at 75 octets, as RFC 5545 requires."""
+    data = f"{name}:{value}".encode()
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        # Don't split a multi-byte UTF-8 character.
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+    parts.append(data)
+    return "\r\n ".join(part.decode() for part in parts) + "\r\n"
+
+
+def _timestamp(value: datetime.datetime) -> str:
+    return value.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def vevent(event: Event, url: str, domain: str) -> str:
+    return "".join(
+        [
+            "BEGIN:VEVENT\r\n",
+            _line("UID", f"event-{event.id}@{domain}"),
+            _line("DTSTAMP", _timestamp(event.updated)),
+            _line("DTSTART", _timestamp(event.event_date)),
+            _line("SUMMARY", _escape(event.title)),
+            _line("DESCRIPTION", _escape(event.body)),
+            _line("URL", url),
+            "END:VEVENT\r\n",
+        ]
+    )
+
+
+def _begin(name: str) -> str:
+    return (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//umeal.se//events//EN\r\n"
+        + _line("X-WR-CALNAME", _escape(name))
+    )
+
+
+def _ordered(events: QuerySet) -> QuerySet:
+    events = events.only("id", "title", "body", "event_date", "updated")
+    return events.order_by("event_date", "id")
+
+
+def stream_calendar(
+    events: QuerySet, name: str, url: Callable[[Event], str], domain: str
+) -> Iterator[str]:
+    """Yield a calendar of events piece by piece; `url` links to an event."""
+    yield _begin(name)
+    for event in _ordered(events).iterator(chunk_size=CHUNK_SIZE):
+        yield vevent(event, url(event), domain)
+    yield "END:VCALENDAR\r\n"
+
+
+async def astream_calendar(
+    events: QuerySet, name: str, url: Callable[[Event], str], domain: str
+) -> AsyncIterator[str]:
+    """Like `stream_calendar`, for responses served by the ASGI handler."""
+    yield _begin(name)
+    async for event in _ordered(events).aiterator(chunk_size=CHUNK_SIZE):
+        yield vevent(event, url(event), domain)
+    yield "END:VCALENDAR\r\n"
@@ -0,0 +1,82 @@
+"""Processing of uploaded profile photos.
+
+Originals are never served directly. Every upload is decoded once, at a
+reduced scale where the format allows it, and saved as square thumbnails in
+WebP and JPEG so templates can pick the smallest variant a browser accepts.
+"""
+import os
+from io import BytesIO
+from typing import IO, Dict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .auth import invalidate_user
+from .models import Profile
+
+THUMBNAIL_SIZES = (100, 200)
+FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+
+
+def check_image(file: IO[bytes]) -> None:
+    """Reject images too big to be decoded safely, reading only their header."""
+    if file.size > settings.PROFILE_PHOTO_MAX_SIZE:
+        raise ValidationError("Photo file is too large.")
+    with Image.open(file) as image:
+        width, height = image.size
+    file.seek(0)
+    if width * height > settings.PROFILE_PHOTO_MAX_PIXELS:
+        raise ValidationError("Photo dimensions are too large.")
+
+
+def _render(image: Image.Image, size: int, image_format: str) -> ContentFile:
+    thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    thumbnail.save(buffer, image_format, quality=80, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(profile: Profile) -> Dict[str, str]:
+    """Store thumbnails of profile's photo and return their storage names."""
+    storage = profile.photo.storage
+    stem = os.path.splitext(os.path.basename(profile.photo.name))[0]
+    variants = {}
+    with profile.photo.open("rb") as file, Image.open(file) as image:
+        width, height = image.size
+        if width * height > settings.PROFILE_PHOTO_MAX_PIXELS:
+            raise ValidationError("Photo dimensions are too large.")
+        # Let JPEG decode at a fraction of full resolution when it's enough.
+        largest = max(THUMBNAIL_SIZES)
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size in THUMBNAIL_SIZES:
+            for extension, image_format in FORMATS.items():
+                name = f"users/variants/{stem}_{size}.{extension}"
+                variants[f"{extension}_{size}"] = storage.save(
+                    name, _render(image, size, image_format)
+                )
+    return variants
+
+
+def process_profile_photo(profile_id: int) -> None:
+    """Regenerate variants of a profile's current photo, dropping old ones."""
+    profile = Profile.objects.filter(id=profile_id).first()
+    if profile is None:
+        return
+    old_variants = profile.photo_variants
+    variants = generate_variants(profile) if profile.photo else {}
+    updated = Profile.objects.filter(id=profile_id, photo=profile.photo.name).update(
+        photo_variants=variants
+    )
+    if updated:
+        invalidate_user(profile.user_id)
+        stale = [
+            name for name in old_variants.values() if name not in variants.values()
+        ]
+    else:
+        # A newer upload won the race, so the variants just made are stale.
+        stale = list(variants.values())
+    for name in stale:
+        profile.photo.storage.delete(name)
@@ -0,0 +1,83 @@
+"""Inviting friends to events.
+
+`invite` stores any number of invitations with a single bulk insert and
+queues a job for the emails, so the request doesn't wait on SMTP. The job
+sends them in batches over one reused connection and marks what it sent, so
+running it again only emails guests that weren't notified yet.
+"""
+from typing import Collection
+
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Event, Invitation, Profile
+from .jobs import enqueue
+
+EMAIL_BATCH_SIZE = 100
+
+
+def invite(event: Event, guests: Collection[Profile], event_url: str) -> int:
+    """Invite guests to event, skipping those invited before.
+
+    Returns the number of new invitations; their emails, linking to
+    event_url, are sent by a job queued in the current transaction.
+    """
+    user_ids = {profile.user_id for profile in guests} - {event.host_id}
+    invited = set(
+        Invitation.objects.filter(event=event, guest_id__in=user_ids).values_list(
+            "guest_id", flat=True
+        )
+    )
+    new = user_ids - invited
+    if not new:
+        return 0
+    # Conflicts can still come from a concurrent request inviting the same guest.
+    Invitation.objects.bulk_create(
+        [Invitation(event=event, guest_id=user_id) for user_id in sorted(new)],
+        ignore_conflicts=True,
+    )
+    enqueue(send_invitations, event.id, event_url)
+    return len(new)
+
+
+def send_invitations(event_id: int, event_url: str) -> None:
+    """Email guests of an event who weren't notified yet, a batch at a time.
+
+    Batches are claimed with `SKIP LOCKED`, so tasks running at the same time
+    don't email anyone twice.
+    """
+    event = Event.objects.select_related("host").get(id=event_id)
+    pending = (
+        Invitation.objects.filter(event_id=event_id, notified__isnull=True)
+        .select_related("guest")
+        .select_for_update(skip_locked=True, of=("self",))
+        .order_by("id")
+    )
+    with get_connection() as connection:
+        while True:
+            with transaction.atomic():
+                batch = list(pending[:EMAIL_BATCH_SIZE])
+                if not batch:
+                    return
+                connection.send_messages(
+                    [
+                        _message(event, invitation.guest, event_url)
+                        for invitation in batch
+                        if invitation.guest.email
+                    ]
+                )
+                Invitation.objects.filter(
+                    id__in=[invitation.id for invitation in batch]
+                ).update(notified=timezone.now())
+
+
+def _message(event: Event, guest: User, event_url: str) -> EmailMessage:
+    context = {"event": event, "guest": guest, "event_url": event_url}
+    return EmailMessage(
+        subject=f"{event.host} invites you to {event.title}",
+        body=render_to_string("event/invitation_email.txt", context),
+        to=[guest.email],
+    )
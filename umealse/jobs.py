@@ -0,0 +1,197 @@
+"""A job queue kept in PostgreSQL, run by the `run_jobs` command.
+
+`enqueue` stores a call of a module level function as a `Job` row, inside
+the current transaction, so a job exists exactly when the data it works on
+was committed. Workers claim due jobs with `SELECT ... FOR UPDATE SKIP
+LOCKED`, which lets any number of them poll the table without blocking each
+other or taking the same job, and lease them for `JOBS_LEASE_SECONDS`; jobs
+of a worker that died are picked up again when their lease runs out. A lease
+is renewed as its job starts, so jobs waiting behind slow ones of the same
+batch aren't taken over, and a worker only records the outcome of a job
+while it still holds the lease.
+
+Finished jobs are deleted. Failed ones are retried with exponential backoff
+until `max_attempts`, then kept with status `FAILED` and their traceback.
+"""
+import datetime
+import logging
+import random
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(
+    func: Callable[..., Any],
+    *args: Any,
+    key: Optional[str] = None,
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+) -> None:
+    """Queue func(*args); args have to be JSON serializable.
+
+    A job with a `key` is skipped while another one with the same key is
+    still queued or running.
+    """
+    Job.objects.bulk_create(
+        [
+            Job(
+                func=f"{func.__module__}.{func.__qualname__}",
+                args=list(args),
+                key=key,
+                run_at=timezone.now() + datetime.timedelta(seconds=delay),
+                max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+            )
+        ],
+        ignore_conflicts=key is not None,
+    )
+
+
+def claim(limit: int) -> List[Job]:
+    """Lease up to `limit` due jobs to the calling worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.exclude(status=Job.Status.FAILED)
+            .filter(run_at__lte=now)
+            .order_by("run_at", "id")
+            .select_for_update(skip_locked=True)[:limit]
+        )
+        lease = _lease()
+        Job.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=Job.Status.RUNNING, run_at=lease
+        )
+    for job in jobs:
+        job.status = Job.Status.RUNNING
+        job.run_at = lease
+    return jobs
+
+
+def _lease() -> datetime.datetime:
+    return timezone.now() + datetime.timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+
+
+def _leased(job: Job) -> QuerySet:
+    """The row of a claimed job, unless its lease was taken over since.
+
+    Every claim or renewal sets a new `run_at`, so it identifies the lease.
+    """
+    return Job.objects.filter(id=job.id, status=Job.Status.RUNNING, run_at=job.run_at)
+
+
+def renew(job: Job) -> bool:
+    """Extend the lease of a claimed job; False if it was lost."""
+    lease = _lease()
+    if not _leased(job).update(run_at=lease):
+        return False
+    job.run_at = lease
+    return True
+
+
+def backoff(attempts: int) -> float:
+    """Seconds to wait before the next attempt, doubling with jitter."""
+    delay = min(settings.JOBS_BACKOFF_SECONDS * 2 ** (attempts - 1), 3600)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def run(job: Job) -> bool:
+    """Run a claimed job and record its outcome; returns whether it succeeded."""
+    if not renew(job):
+        logger.warning("Job %s was taken over before it started.", job)
+        return False
+    attempts = job.attempts + 1
+    try:
+        with use_primary():
+            import_string(job.func)(*job.args)
+    except Exception:
+        logger.exception("Job %s failed (attempt %d).", job, attempts)
+        retry = attempts < job.max_attempts
+        _leased(job).update(
+            status=Job.Status.QUEUED if retry else Job.Status.FAILED,
+            run_at=timezone.now() + datetime.timedelta(seconds=backoff(attempts)),
+            attempts=attempts,
+            last_error=traceback.format_exc(),
+        )
+        return False
+    _leased(job).delete()
+    return True
+
+
+def queue_stats() -> Dict[str, int]:
+    """Number of jobs by status, and how many queued ones are due."""
+    counts = dict(Job.objects.values_list("status").annotate(Count("id")))
+    due = Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=timezone.now())
+    return {
+        "queued": counts.get(Job.Status.QUEUED, 0),
+        "running": counts.get(Job.Status.RUNNING, 0),
+        "failed": counts.get(Job.Status.FAILED, 0),
+        "due": due.count(),
+    }
+
+
+@dataclass
+class WorkerStats:
+    """Throughput of a worker, safe to update from its threads."""
+
+    succeeded: int = 0
+    failed: int = 0
+    busy: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, ok: bool, duration: float) -> None:
+        with self.lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.busy += duration
+
+    def summary(self) -> str:
+        with self.lock:
+            done = self.succeeded + self.failed
+            elapsed = time.monotonic() - self.started
+            mean = self.busy / done * 1000 if done else 0.0
+            return (
+                f"{done} jobs ({self.failed} failed), "
+                f"{done / elapsed:.1f} jobs/s, {mean:.1f} ms per job"
+            )
+
+
+def work(
+    stats: WorkerStats,
+    stop: threading.Event,
+    batch_size: int = 10,
+    poll_interval: float = 1.0,
+    drain: bool = False,
+) -> None:
+    """Claim and run jobs until `stop` is set, or the queue is empty if `drain`."""
+    try:
+        while not stop.is_set():
+            jobs = claim(batch_size)
+            if not jobs:
+                if drain:
+                    return
+                stop.wait(poll_interval)
+                continue
+            for job in jobs:
+                start = time.perf_counter()
+                ok = run(job)
+                stats.record(ok, time.perf_counter() - start)
+            close_old_connections()
+    finally:
+        close_old_connections()
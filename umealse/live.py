@@ -0,0 +1,397 @@
+"""Live updates of pages, pushed to browsers as server-sent events.
+
+Changes are published to channels, `event:<id>` for attendees of an event
+and `profile:<id>` for friend requests of a user, once the transaction
+making them commits. The broker configured as `LIVE_BROKER` fans them out:
+
+- `LocalBroker` delivers to connections of the current process only,
+- `PostgresBroker` relays messages through `NOTIFY`, so every worker
+  process gets them and hands them to its own connections.
+
+`LiveUpdatesApp` wraps the Django application in `main/asgi.py` and serves
+`LIVE_PATH` itself, outside Django's request handling: a connection is a
+coroutine waiting on a small bounded queue, without a thread or database
+connection of its own, so thousands of idle ones cost little memory.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from importlib import import_module
+from typing import Any, Callable, Collection, Dict, List, Optional, Set
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.http import HttpRequest, QueryDict
+from django.http.cookie import parse_cookie
+from django.utils.module_loading import import_string
+
+from .models import Event, Friendship, Profile
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, Any]
+
+# Milliseconds browsers wait before reconnecting.
+RETRY_MS = 3000
+
+
+def event_channel(event_id: int) -> str:
+    return f"event:{event_id}"
+
+
+def profile_channel(profile_id: int) -> str:
+    return f"profile:{profile_id}"
+
+
+class SubscriptionLost(Exception):
+    """Raised to a subscriber that fell behind or was closed."""
+
+
+class Subscription:
+    """Messages of some channels for one connection, queued on its loop."""
+
+    __slots__ = ("channels", "loop", "queue", "lost")
+
+    def __init__(self, channels: Collection[str], maxsize: int) -> None:
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.lost = False
+
+    def put(self, message: Optional[Message]) -> None:
+        """Queue a message, from any thread; None closes the subscription."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop was closed, the connection is gone.
+            pass
+
+    def _put(self, message: Optional[Message]) -> None:
+        if self.lost:
+            return
+        if message is None or self.queue.full():
+            # A client that can't keep up reconnects and reloads instead.
+            self.lost = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(message)
+
+    async def next(self, timeout: float) -> Optional[Message]:
+        """The next message, or None if there was none for timeout seconds."""
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if message is None:
+            raise SubscriptionLost
+        return message
+
+
+class LocalBroker:
+    """Deliver messages to subscribers in this process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, channels: Collection[str]) -> Subscription:
+        """Subscribe the running event loop to channels."""
+        subscription = Subscription(channels, settings.LIVE_QUEUE_SIZE)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def has_subscribers(self, channel: str) -> bool:
+        with self._lock:
+            return channel in self._subscribers
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(set().union(*self._subscribers.values()))
+
+    def publish(self, channel: str, message: Message) -> None:
+        self.deliver(channel, message)
+
+    def deliver(self, channel: str, message: Message) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+
+class PostgresBroker(LocalBroker):
+    """Relay messages between processes with PostgreSQL `LISTEN`/`NOTIFY`.
+
+    Each process listens on one connection of its own, opened by a thread
+    started with the first subscription.
+    """
+
+    CHANNEL = "umealse_live"
+    # PostgreSQL refuses payloads of 8000 bytes or more.
+    MAX_PAYLOAD = 7999
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._listener: Optional[threading.Thread] = None
+
+    def subscribe(self, channels: Collection[str]) -> Subscription:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="umealse-live", daemon=True
+                )
+                self._listener.start()
+        return super().subscribe(channels)
+
+    def has_subscribers(self, channel: str) -> bool:
+        # Those of other processes aren't known here.
+        return True
+
+    def publish(self, channel: str, message: Message) -> None:
+        payload = json.dumps({"channel": channel, "message": message})
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            # Too much to relay, pages reload to catch up instead.
+            message = {"type": message["type"], "reload": True}
+            payload = json.dumps({"channel": channel, "message": message})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.CHANNEL, payload])
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                self._listen_once()
+            except Exception:
+                logger.exception("Listening for live updates failed.")
+                time.sleep(1)
+
+    def _listen_once(self) -> None:
+        wrapper = connections["default"]
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.CHANNEL}")
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self._relay(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def _relay(self, payload: str) -> None:
+        data = json.loads(payload)
+        self.deliver(data["channel"], data["message"])
+
+
+_brokers: Dict[str, LocalBroker] = {}
+_brokers_lock = threading.Lock()
+
+
+def broker() -> LocalBroker:
+    """The broker configured as `LIVE_BROKER`, one per process."""
+    path = settings.LIVE_BROKER
+    with _brokers_lock:
+        if path not in _brokers:
+            _brokers[path] = import_string(path)()
+        return _brokers[path]
+
+
+def attendees_changed(
+    event_ids: Collection[int],
+    user_ids: Optional[Collection[int]],
+    joined: bool,
+    usernames: Optional[List[str]] = None,
+) -> None:
+    """Tell pages of events who joined or left them; all left if not user_ids.
+
+    The usernames of user_ids are looked up unless given, and only once
+    some page follows one of the events.
+    """
+
+    def send() -> None:
+        followed = [i for i in event_ids if broker().has_subscribers(event_channel(i))]
+        if not followed:
+            return
+        counts = dict(
+            Event.objects.filter(pk__in=followed).values_list("id", "attendee_count")
+        )
+        names = sorted(
+            usernames
+            if usernames is not None
+            else User.objects.filter(pk__in=user_ids or ()).values_list(
+                "username", flat=True
+            )
+        )
+        for event_id, count in counts.items():
+            broker().publish(
+                event_channel(event_id),
+                {
+                    "type": "attendees",
+                    "joined": names if joined else [],
+                    "left": names if not joined else [],
+                    "cleared": user_ids is None,
+                    "attendee_count": count,
+                },
+            )
+
+    transaction.on_commit(send)
+
+
+def friend_request_sent(friendship: Friendship) -> None:
+    sender = friendship.from_user
+
+    def send() -> None:
+        channel = profile_channel(friendship.to_user_id)
+        if not broker().has_subscribers(channel):
+            return
+        broker().publish(
+            channel,
+            {
+                "type": "friend_request",
+                "id": friendship.id,
+                "username": sender.user.username,
+            },
+        )
+
+    transaction.on_commit(send)
+
+
+def friend_requests_accepted(addressee: Profile, sender_ids: List[int]) -> None:
+    def send() -> None:
+        channels = [profile_channel(i) for i in sender_ids]
+        channels = [c for c in channels if broker().has_subscribers(c)]
+        if not channels:
+            return
+        message = {"type": "friend_accepted", "username": addressee.user.username}
+        for channel in channels:
+            broker().publish(channel, message)
+
+    transaction.on_commit(send)
+
+
+def _format(message: Message) -> bytes:
+    data = json.dumps(message, separators=(",", ":"))
+    return f"event: {message['type']}\ndata: {data}\n\n".encode()
+
+
+def _channels(headers: Dict[bytes, bytes], query_string: bytes) -> List[str]:
+    """Channels the signed in user of a request may follow; empty if none."""
+    request = HttpRequest()
+    cookies = parse_cookie(headers.get(b"cookie", b"").decode("latin-1"))
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    try:
+        user = auth.get_user(request)
+        if not user.is_authenticated:
+            return []
+        channels = []
+        profile = Profile.objects.filter(user=user).only("id").first()
+        if profile is not None:
+            channels.append(profile_channel(profile.id))
+        event = QueryDict(query_string).get("event", "")
+        if event.isdigit() and Event.published.filter(id=event).exists():
+            channels.append(event_channel(int(event)))
+        return channels
+    finally:
+        # The thread is shared, don't keep a connection open in it.
+        connections.close_all()
+
+
+class LiveUpdatesApp:
+    """ASGI app streaming live updates at `LIVE_PATH`, passing on the rest.
+
+    `GET LIVE_PATH?event=<id>` follows the signed in user's friend requests
+    and, if given, attendees of an event.
+    """
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["path"] != settings.LIVE_PATH:
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] != "GET":
+            await self._respond(send, 405, b"Method not allowed.")
+            return
+        channels = await sync_to_async(_channels, thread_sensitive=False)(
+            dict(scope["headers"]), scope["query_string"]
+        )
+        if not channels:
+            # Unlike other errors, 204 stops browsers from reconnecting.
+            await self._respond(send, 204, b"")
+            return
+        await self._stream(channels, receive, send)
+
+    @staticmethod
+    async def _respond(send: Callable, status: int, body: bytes) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _stream(
+        self, channels: List[str], receive: Callable, send: Callable
+    ) -> None:
+        subscription = broker().subscribe(channels)
+
+        async def wait_for_disconnect() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            subscription.put(None)
+
+        watcher = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            body = f"retry: {RETRY_MS}\n\n".encode()
+            while True:
+                await send(
+                    {"type": "http.response.body", "body": body, "more_body": True}
+                )
+                message = await subscription.next(settings.LIVE_HEARTBEAT_SECONDS)
+                # A comment keeps proxies from closing an idle connection.
+                body = _format(message) if message else b": ping\n\n"
+        except SubscriptionLost:
+            if not watcher.done():
+                # Dropped for falling behind, the browser reconnects.
+                await send({"type": "http.response.body", "body": b""})
+        except OSError:
+            pass
+        finally:
+            watcher.cancel()
+            broker().unsubscribe(subscription)
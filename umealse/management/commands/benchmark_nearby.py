@@ -0,0 +1,128 @@
+import datetime
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from umealse import geo
+from umealse.management.commands.generate_data import CITIES
+from umealse.models import Event
+
+
+class Rollback(Exception):
+    """Raised to undo the seeded events once measured."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed located events in a transaction that is rolled back afterwards, "
+        "then time the geohash nearby search against a full distance scan."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--events", type=int, default=1_000_000, help="Located events to seed."
+        )
+        parser.add_argument(
+            "--radius", type=float, default=5.0, help="Search radius in km."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=50, help="Timed searches per strategy."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options) -> None:
+        rng = random.Random(options["seed"])
+        try:
+            with transaction.atomic():
+                self._seed(rng, options["events"], options["batch_size"])
+                self._compare(rng, options["radius"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _seed(self, rng: random.Random, count: int, batch_size: int) -> None:
+        start = time.perf_counter()
+        host = User.objects.create(username=f"benchmark-{rng.getrandbits(32):x}")
+        now = timezone.now()
+        for offset in range(0, count, batch_size):
+            events = []
+            for i in range(offset, min(offset + batch_size, count)):
+                latitude, longitude = rng.choice(CITIES)
+                event = Event(
+                    title=f"Nearby #{i}",
+                    slug=f"nearby-{i}",
+                    host=host,
+                    body="",
+                    event_date=now + datetime.timedelta(minutes=rng.randrange(10**5)),
+                    latitude=latitude + rng.gauss(0, 0.5),
+                    longitude=longitude + rng.gauss(0, 1.0),
+                )
+                event.geohash = event.compute_geohash()
+                events.append(event)
+            Event.objects.bulk_create(events)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Event._meta.db_table}")
+        self.stdout.write(
+            f"Seeded {count} events in {time.perf_counter() - start:.1f} s."
+        )
+
+    def _compare(self, rng: random.Random, radius: float, repeat: int) -> None:
+        points = []
+        for _ in range(repeat):
+            latitude, longitude = rng.choice(CITIES)
+            points.append((latitude + rng.gauss(0, 0.3), longitude + rng.gauss(0, 0.6)))
+        upcoming = Event.published.filter(event_date__gte=timezone.now())
+
+        def geohash(latitude: float, longitude: float) -> QuerySet:
+            return geo.nearby(upcoming, latitude, longitude, radius)
+
+        def scan(latitude: float, longitude: float) -> QuerySet:
+            return (
+                upcoming.annotate(distance=geo.distance_km(latitude, longitude))
+                .filter(distance__lte=radius)
+                .order_by("distance", "id")
+            )
+
+        covers = [
+            geo.cover(latitude, longitude, radius) for latitude, longitude in points
+        ]
+        candidates = [
+            upcoming.filter(geo.prefix_filter(prefixes)).count() for prefixes in covers
+        ]
+        self.stdout.write(
+            f"Cells of {len(covers[0][0])} characters, "
+            f"{statistics.mean(candidates):.0f} candidates per search on average."
+        )
+        for name, search in [("geohash", geohash), ("full scan", scan)]:
+            result = _measure(search, points)
+            self.stdout.write(
+                f"{name:<10} p50 {result['p50_ms']:8.2f} ms"
+                f"  p95 {result['p95_ms']:8.2f} ms"
+                f"  {result['rows']:6.1f} events per search"
+            )
+
+
+def _measure(
+    search: Callable[[float, float], QuerySet], points: List
+) -> Dict[str, float]:
+    """Time the first page (10 events) of a search around each point."""
+    latencies: List[float] = []
+    rows = 0
+    for latitude, longitude in points:
+        start = time.perf_counter()
+        rows += len(search(latitude, longitude)[:10])
+        latencies.append((time.perf_counter() - start) * 1000)
+    centiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50_ms": round(centiles[49], 3),
+        "p95_ms": round(centiles[94], 3),
+        "rows": rows / len(points),
+    }
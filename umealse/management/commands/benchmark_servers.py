@@ -0,0 +1,179 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.test import Client
+
+from main.asgi import application as asgi_application
+from main.wsgi import application as wsgi_application
+
+# (status code, seconds) of every request made.
+Results = List[Tuple[int, float]]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and latency of the WSGI and ASGI entry points "
+        "serving read-heavy pages in-process, as a logged in user."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("username", help="User the requests are made as.")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Page to request, may be repeated (default: events and dashboard).",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requests per server."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Requests in flight at once (threads for WSGI, tasks for ASGI).",
+        )
+
+    def handle(self, *args, **options) -> None:
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        cookie = f"{settings.SESSION_COOKIE_NAME}={session}"
+        host = benchmark_host()
+
+        paths = options["paths"] or ["/events/", "/dashboard/"]
+        workload = [paths[i % len(paths)] for i in range(options["requests"])]
+        concurrency = options["concurrency"]
+
+        for name, run in (
+            ("WSGI", lambda: _run_wsgi(workload, concurrency, host, cookie)),
+            (
+                "ASGI",
+                lambda: asyncio.run(_run_asgi(workload, concurrency, host, cookie)),
+            ),
+        ):
+            self._report(name, *_timed(run))
+
+    def _report(self, name: str, results: Results, elapsed: float) -> None:
+        latencies = sorted(seconds * 1000 for _, seconds in results)
+        centiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        errors = sum(1 for status, _ in results if status != 200)
+        self.stdout.write(
+            f"{name}: {len(results) / elapsed:.1f} req/s, "
+            f"p50 {centiles[49]:.1f} ms, p95 {centiles[94]:.1f} ms, "
+            f"{errors} non-200 responses"
+        )
+
+
+def benchmark_host() -> str:
+    """A host name the running configuration accepts in requests."""
+    host = (settings.ALLOWED_HOSTS or ["localhost"])[0].lstrip(".")
+    return "localhost" if host == "*" else host
+
+
+def _timed(run: Callable[[], Results]) -> Tuple[Results, float]:
+    start = time.perf_counter()
+    results = run()
+    return results, time.perf_counter() - start
+
+
+def _run_wsgi(workload: List[str], concurrency: int, host: str, cookie: str) -> Results:
+    def get(path: str) -> Tuple[int, float]:
+        url = urlsplit(path)
+        environ: Dict = {
+            "REQUEST_METHOD": "GET",
+            "SCRIPT_NAME": "",
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": host,
+            "HTTP_COOKIE": cookie,
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        status = []
+        start = time.perf_counter()
+        body = wsgi_application(
+            environ, lambda line, headers: status.append(int(line.split()[0]))
+        )
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return status[0], time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(get, workload))
+
+
+async def _run_asgi(
+    workload: List[str], concurrency: int, host: str, cookie: str
+) -> Results:
+    async def get(path: str) -> Tuple[int, float]:
+        url = urlsplit(path)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": url.path,
+            "raw_path": url.path.encode(),
+            "query_string": url.query.encode(),
+            "root_path": "",
+            "headers": [(b"host", host.encode()), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": (host, 80),
+        }
+        disconnected = asyncio.Event()
+        sent_body = False
+        status = []
+
+        async def receive() -> Dict:
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict) -> None:
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        start = time.perf_counter()
+        await asgi_application(scope, receive, send)
+        disconnected.set()
+        return status[0], time.perf_counter() - start
+
+    queue = list(reversed(workload))
+    results: Results = []
+
+    async def worker() -> None:
+        while queue:
+            results.append(await get(queue.pop()))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
@@ -0,0 +1,171 @@
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from taggit.models import Tag
+
+from umealse.management.commands.benchmark_servers import benchmark_host
+from umealse.models import Event, Profile
+
+# Page name -> metric name -> value.
+Metrics = Dict[str, Dict[str, float]]
+
+# Metrics compared against a baseline; query counts must not grow at all.
+TIMED = ["p50_ms", "p95_ms", "peak_kib"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency, queries and allocations of the main pages through the "
+        "test client, optionally comparing them with a saved baseline."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--username",
+            help="User the pages are viewed as (default: the one with most friends).",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=50, help="Timed requests per page."
+        )
+        parser.add_argument(
+            "--baseline", help="JSON file with metrics to compare the results with."
+        )
+        parser.add_argument(
+            "--save", help="Write the results to this JSON file as a new baseline."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed relative slowdown or allocation growth over the baseline.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        client = Client(HTTP_HOST=benchmark_host())
+        user = self._user(options["username"])
+        client.force_login(user)
+
+        results: Metrics = {}
+        for name, url in self._pages(user).items():
+            results[name] = _measure(client, url, options["repeat"])
+            self.stdout.write(
+                f"{name:<16} p50 {results[name]['p50_ms']:8.2f} ms"
+                f"  p95 {results[name]['p95_ms']:8.2f} ms"
+                f"  {results[name]['queries']:3.0f} queries"
+                f"  peak {results[name]['peak_kib']:8.1f} KiB"
+            )
+
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+            regressions = _regressions(baseline, results, options["tolerance"])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions found.")
+            self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def _user(self, username: Optional[str]) -> User:
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username!r} does not exist.")
+        profile = (
+            Profile.objects.annotate(degree=Count("friends"))
+            .order_by("-degree", "id")
+            .select_related("user")
+            .first()
+        )
+        if profile is None:
+            raise CommandError("No profiles to benchmark with, run generate_data.")
+        return profile.user
+
+    def _pages(self, user: User) -> Dict[str, str]:
+        pages = {
+            "event_list": reverse("event_list"),
+            "dashboard": reverse("dashboard"),
+        }
+        tag = Tag.objects.annotate(uses=Count("taggit_taggeditem_items"))
+        tag = tag.order_by("-uses", "id").first()
+        if tag is not None:
+            pages["event_list_tag"] = reverse("event_list_by_tag", args=[tag.slug])
+        event = (
+            Event.published.annotate(guests=Count("attendees"))
+            .order_by("-guests", "id")
+            .first()
+        )
+        if event is not None:
+            pages["event_detail"] = reverse("event_detail", args=[event.id])
+        friend = user.profile.friends.select_related("user").order_by("id").first()
+        profile_user = friend.user if friend is not None else user
+        pages["show_profile"] = reverse("profile", args=[profile_user.username])
+        return pages
+
+
+def _measure(client: Client, url: str, repeat: int) -> Dict[str, float]:
+    """Time `repeat` warm requests, then count queries and allocations of one."""
+    response = client.get(url)
+    if response.status_code != 200:
+        raise CommandError(f"{url} answered {response.status_code}.")
+
+    latencies: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        client.get(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+    centiles = statistics.quantiles(latencies, n=100, method="inclusive")
+
+    # Not `CaptureQueriesContext`: with DEBUG on, every request resets its log.
+    queries: List[str] = []
+
+    def count(execute: Callable, sql: str, *args: Any) -> Any:
+        queries.append(sql)
+        return execute(sql, *args)
+
+    with connection.execute_wrapper(count):
+        client.get(url)
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(centiles[49], 3),
+        "p95_ms": round(centiles[94], 3),
+        "queries": len(queries),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def _regressions(baseline: Metrics, results: Metrics, tolerance: float) -> List[str]:
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        if metrics["queries"] > before["queries"]:
+            regressions.append(
+                f"{name}: {metrics['queries']:.0f} queries, "
+                f"baseline {before['queries']:.0f}"
+            )
+        for metric in TIMED:
+            if metrics[metric] > before[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {metric} {metrics[metric]}, baseline {before[metric]}"
+                )
+    return regressions
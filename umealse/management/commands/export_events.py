@@ -0,0 +1,56 @@
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from umealse.bulk import FORMATS, export_events, write_events
+from umealse.models import Event
+
+
+class Command(BaseCommand):
+    help = "Export events to a JSON Lines or CSV file (use - for stdout)."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path", help="File to write events to.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, guessed from the extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of events fetched from the database at a time.",
+        )
+        parser.add_argument(
+            "--status",
+            choices=Event.Status.values,
+            help="Export only events with this status.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        path = options["path"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        batch_size = options["batch_size"]
+        events = Event.objects.all()
+        if options["status"]:
+            events = events.filter(status=options["status"])
+
+        # Progress goes to stderr when the events themselves go to stdout.
+        progress = self.stderr if path == "-" else self.stdout
+        file = (
+            nullcontext(sys.stdout)
+            if path == "-"
+            else open(path, "w", newline="", encoding="utf-8")
+        )
+        start = time.perf_counter()
+        done = 0
+        with file as f:
+            rows = write_events(export_events(events, batch_size), f, format)
+            for done, _ in enumerate(rows, start=1):
+                if done % batch_size == 0:
+                    rate = done / (time.perf_counter() - start)
+                    progress.write(f"Exported {done} events ({rate:.0f}/s).")
+        progress.write(self.style.SUCCESS(f"Exported {done} events."))
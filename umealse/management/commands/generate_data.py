@@ -0,0 +1,213 @@
+import datetime
+import random
+import time
+from typing import Iterator, List, Set, Tuple
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.utils import timezone
+
+from umealse.bulk import Row, import_events
+from umealse.models import Event, Friendship, Profile
+from umealse.social import rebuild_suggestions
+
+TAGS = [
+    "soup",
+    "vegan",
+    "vegetarian",
+    "pasta",
+    "pizza",
+    "curry",
+    "dessert",
+    "baking",
+    "bbq",
+    "salad",
+    "brunch",
+    "sushi",
+    "tacos",
+    "ramen",
+    "pierogi",
+    "gluten-free",
+    "spicy",
+    "seafood",
+    "street-food",
+    "picnic",
+    "potluck",
+    "wine",
+    "coffee",
+    "breakfast",
+    "leftovers",
+]
+
+# Events are scattered around these (latitude, longitude) points.
+CITIES = [
+    (63.8258, 20.2630),
+    (59.3293, 18.0686),
+    (57.7089, 11.9746),
+    (55.6050, 13.0038),
+    (65.5848, 22.1547),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with seeded synthetic users, a power-law friendship "
+        "graph, pending friend requests and events with tags and attendees."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--events", type=int, default=5000)
+        parser.add_argument(
+            "--friends",
+            type=int,
+            default=5,
+            help="Friendships made by every joining user (preferential attachment).",
+        )
+        parser.add_argument(
+            "--requests",
+            type=float,
+            default=0.5,
+            help="Pending friend requests per user.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix", default="user", help="Prefix of generated usernames."
+        )
+        parser.add_argument(
+            "--password", default="password", help="Password of every generated user."
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options) -> None:
+        rng = random.Random(options["seed"])
+        prefix, batch_size = options["prefix"], options["batch_size"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f"Users prefixed with {prefix!r} already exist.")
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            password = make_password(options["password"])
+            users = User.objects.bulk_create(
+                (
+                    User(username=f"{prefix}{i:07d}", password=password)
+                    for i in range(options["users"])
+                ),
+                batch_size=batch_size,
+            )
+            profiles = Profile.objects.bulk_create(
+                (Profile(user=user) for user in users), batch_size=batch_size
+            )
+            edges = _friendship_graph(rng, len(profiles), options["friends"])
+            Profile.friends.through.objects.bulk_create(
+                (
+                    Profile.friends.through(
+                        from_profile_id=profiles[a].id, to_profile_id=profiles[b].id
+                    )
+                    for a, b in edges
+                ),
+                batch_size=batch_size,
+            )
+            Friendship.objects.bulk_create(
+                (
+                    Friendship(from_user=profiles[a], to_user=profiles[b])
+                    for a, b in _friend_requests(
+                        rng, len(profiles), options["requests"], edges
+                    )
+                ),
+                batch_size=batch_size,
+            )
+        self.stdout.write(
+            f"Created {len(users)} users with {len(edges) // 2} friendships."
+        )
+
+        usernames = [user.username for user in users]
+        friends: List[List[int]] = [[] for _ in users]
+        for a, b in edges:
+            friends[a].append(b)
+        done = 0
+        for done in import_events(
+            _events(rng, options["events"], usernames, friends), batch_size
+        ):
+            self.stdout.write(f"Created {done} events.")
+        for _ in rebuild_suggestions(batch_size):
+            pass
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated {done} events in {elapsed:.1f} s.")
+        )
+
+
+def _friendship_graph(rng: random.Random, n: int, m: int) -> Set[Tuple[int, int]]:
+    """Symmetric edges of a Barabási–Albert graph, giving power-law degrees.
+
+    Every joining node befriends `m` existing ones, picked with probability
+    proportional to how many friends they already have.
+    """
+    edges: Set[Tuple[int, int]] = set()
+    # Every node appears here once per friend, so uniform picks are weighted.
+    ends: List[int] = list(range(min(m, n)))
+    for node in range(min(m, n), n):
+        targets: Set[int] = set()
+        while len(targets) < m:
+            targets.add(rng.choice(ends))
+        for target in targets:
+            edges.update([(node, target), (target, node)])
+            ends.extend([node, target])
+    return edges
+
+
+def _friend_requests(
+    rng: random.Random, n: int, per_user: float, edges: Set[Tuple[int, int]]
+) -> Iterator[Tuple[int, int]]:
+    """Random pending requests between users that aren't friends yet."""
+    seen: Set[Tuple[int, int]] = set()
+    for _ in range(int(n * per_user) if n > 1 else 0):
+        a, b = rng.sample(range(n), 2)
+        if (a, b) not in edges and (a, b) not in seen and (b, a) not in seen:
+            seen.add((a, b))
+            yield a, b
+
+
+def _events(
+    rng: random.Random, count: int, usernames: List[str], friends: List[List[int]]
+) -> Iterator[Row]:
+    """Rows for `import_events`; tag use is Zipf-like, attendees are friends.
+
+    Some events have a capacity of up to a few seats above their attendance,
+    most have a location within about 20 km of one of `CITIES`.
+    """
+    now = timezone.now()
+    tag_weights = [1 / rank for rank in range(1, len(TAGS) + 1)]
+    for i in range(count):
+        host = rng.randrange(len(usernames))
+        event_date = now + datetime.timedelta(
+            minutes=rng.randint(-30 * 24 * 60, 90 * 24 * 60)
+        )
+        guests = min(int(rng.paretovariate(1.5)) - 1, len(friends[host]))
+        capacity = guests + rng.randint(0, 5) if rng.random() < 0.3 else None
+        latitude = longitude = None
+        if rng.random() < 0.8:
+            city_latitude, city_longitude = rng.choice(CITIES)
+            latitude = round(city_latitude + rng.gauss(0, 0.1), 6)
+            longitude = round(city_longitude + rng.gauss(0, 0.2), 6)
+        yield {
+            "title": f"{rng.choice(TAGS).title()} night #{i}",
+            "host": usernames[host],
+            "body": f"Event {i} hosted by {usernames[host]}.",
+            "publish": (event_date - datetime.timedelta(days=7)).isoformat(),
+            "event_date": event_date.isoformat(),
+            "status": (
+                Event.Status.PUBLISHED if rng.random() < 0.9 else Event.Status.DRAFT
+            ),
+            "capacity": capacity,
+            "latitude": latitude,
+            "longitude": longitude,
+            "tags": sorted(
+                set(rng.choices(TAGS, weights=tag_weights, k=rng.randint(0, 3)))
+            ),
+            "attendees": [usernames[f] for f in rng.sample(friends[host], guests)],
+        }
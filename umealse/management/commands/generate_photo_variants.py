@@ -0,0 +1,30 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandParser
+
+from umealse.images import process_profile_photo
+from umealse.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnails for profile photos uploaded before processing existed."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants of photos that already have them.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        profiles = Profile.objects.exclude(photo="")
+        if not options["force"]:
+            profiles = profiles.filter(photo_variants={})
+        count = 0
+        for count, profile_id in enumerate(
+            profiles.values_list("id", flat=True).iterator(), start=1
+        ):
+            try:
+                process_profile_photo(profile_id)
+            except ValidationError as e:
+                self.stderr.write(f"Skipped profile {profile_id}: {e.messages[0]}")
+        self.stdout.write(self.style.SUCCESS(f"Processed {count} photos."))
@@ -0,0 +1,46 @@
+import sys
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from umealse.bulk import FORMATS, InvalidRow, import_events, read_events
+
+
+class Command(BaseCommand):
+    help = "Import events from a JSON Lines or CSV file (use - for stdin)."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path", help="File to read events from.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, guessed from the extension by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of events inserted per transaction.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        path = options["path"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        file = (
+            nullcontext(sys.stdin)
+            if path == "-"
+            else open(path, newline="", encoding="utf-8")
+        )
+        start = time.perf_counter()
+        done = 0
+        with file as f:
+            try:
+                for done in import_events(
+                    read_events(f, format), batch_size=options["batch_size"]
+                ):
+                    rate = done / (time.perf_counter() - start)
+                    self.stdout.write(f"Imported {done} events ({rate:.0f}/s).")
+            except InvalidRow as e:
+                raise CommandError(f"{e} Imported {done} events before it.")
+        self.stdout.write(self.style.SUCCESS(f"Imported {done} events."))
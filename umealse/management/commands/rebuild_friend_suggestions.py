@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from umealse.social import rebuild_suggestions
+
+
+class Command(BaseCommand):
+    help = "Rebuild the friend-of-friend suggestion index from scratch."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of profiles recomputed per transaction.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        done = 0
+        for done in rebuild_suggestions(batch_size=options["batch_size"]):
+            self.stdout.write(f"Processed {done} profiles.")
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt suggestions for {done} profiles.")
+        )
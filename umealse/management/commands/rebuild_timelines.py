@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from umealse import timeline
+from umealse.models import Event
+
+
+class Command(BaseCommand):
+    help = "Fan all upcoming published events out to friends' timelines again."
+
+    def handle(self, *args, **options) -> None:
+        events = Event.published.filter(event_date__gte=timezone.now())
+        count = 0
+        for count, event in enumerate(events.iterator(), start=1):
+            timeline.sync_event(event)
+        self.stdout.write(self.style.SUCCESS(f"Synced {count} events."))
@@ -0,0 +1,83 @@
+import signal
+import threading
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from umealse.jobs import WorkerStats, queue_stats, work
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs, each thread claiming its own batches."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--concurrency", type=int, default=4, help="Number of worker threads."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=10, help="Jobs claimed at a time."
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when no job is due.",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=60.0,
+            help="Seconds between throughput reports.",
+        )
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="Exit once no job is due instead of waiting for more.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        stats = WorkerStats()
+        stop = threading.Event()
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            # Let running jobs finish on Ctrl+C or SIGTERM.
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                handlers[signum] = signal.signal(signum, lambda *_: stop.set())
+        try:
+            self._run(stats, stop, options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self._report(stats)
+
+    def _run(self, stats: WorkerStats, stop: threading.Event, options: Dict) -> None:
+        threads: List[threading.Thread] = [
+            threading.Thread(
+                target=work,
+                args=[stats, stop],
+                kwargs={
+                    "batch_size": options["batch_size"],
+                    "poll_interval": options["poll_interval"],
+                    "drain": options["drain"],
+                },
+                name=f"umealse-job-{i}",
+            )
+            for i in range(options["concurrency"])
+        ]
+        for thread in threads:
+            thread.start()
+        while True:
+            alive = [thread for thread in threads if thread.is_alive()]
+            if not alive:
+                break
+            alive[0].join(options["stats_interval"])
+            if alive[0].is_alive():
+                self._report(stats)
+
+    def _report(self, stats: WorkerStats) -> None:
+        queue = queue_stats()
+        self.stdout.write(
+            f"{stats.summary()}; queue: {queue['due']} due, "
+            f"{queue['queued']} queued, {queue['running']} running, "
+            f"{queue['failed']} failed"
+        )
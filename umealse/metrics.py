@@ -0,0 +1,263 @@
+"""In-process request metrics collected by `RequestMetricsMiddleware`.
+
+Timings of the current request live in a context variable, so they follow
+the request into `sync_to_async` threads. Queries are timed by an execute
+wrapper added to every database connection and templates by wrapping
+`Template.render`, both installed once when the middleware is loaded.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of latency histogram buckets, in milliseconds.
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SLOT_SECONDS = 60
+TOP_QUERIES = 5
+
+
+@dataclass
+class RequestTimings:
+    """What a single request spent its time on, in seconds."""
+
+    queries: List[Tuple[str, float]] = field(default_factory=list)
+    template: float = 0.0
+    view: float = 0.0
+    rendering: bool = False
+
+    @property
+    def db(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def slowest_queries(self, limit: int = TOP_QUERIES) -> List[Tuple[str, float]]:
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request() -> Tuple[RequestTimings, Token]:
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token: Token) -> None:
+    _current.reset(token)
+
+
+def _time_query(
+    execute: Callable, sql: str, params: Any, many: bool, context: Dict
+) -> Any:
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries.append((sql, time.perf_counter() - start))
+
+
+def _add_query_timer(sender: type, connection: Any, **kwargs: Any) -> None:
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+_render = Template.render
+
+
+def _timed_render(self: Template, context: Any) -> Any:
+    timings = _current.get()
+    if timings is None or timings.rendering:
+        # Included and extended templates are part of the outer render.
+        return _render(self, context)
+    timings.rendering = True
+    start = time.perf_counter()
+    try:
+        return _render(self, context)
+    finally:
+        timings.template += time.perf_counter() - start
+        timings.rendering = False
+
+
+def install() -> None:
+    """Hook query and template timing in; safe to call more than once."""
+    connection_created.connect(_add_query_timer, dispatch_uid=__name__)
+    for connection in connections.all(initialized_only=True):
+        _add_query_timer(type(connection), connection)
+    Template.render = _timed_render  # type: ignore[method-assign]
+
+
+class _Slot:
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+
+    def add(self, other: "_Slot") -> None:
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.db_ms += other.db_ms
+        self.queries += other.queries
+
+
+class Histogram:
+    """Request latencies of one view, over a rolling window and since startup.
+
+    The window is kept as a queue of one-minute slots, so old requests fall
+    out of it without storing every observation.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.total = _Slot()
+        self.slots: Deque[Tuple[int, _Slot]] = deque()
+
+    def observe(self, total_ms: float, db_ms: float, queries: int, now: float) -> None:
+        minute = int(now // SLOT_SECONDS)
+        if not self.slots or self.slots[-1][0] != minute:
+            self.slots.append((minute, _Slot()))
+        self._expire(now)
+        for slot in (self.total, self.slots[-1][1]):
+            slot.buckets[bisect_left(BUCKETS_MS, total_ms)] += 1
+            slot.count += 1
+            slot.total_ms += total_ms
+            slot.db_ms += db_ms
+            slot.queries += queries
+
+    def recent(self, now: float) -> _Slot:
+        self._expire(now)
+        merged = _Slot()
+        for _, slot in self.slots:
+            merged.add(slot)
+        return merged
+
+    def _expire(self, now: float) -> None:
+        oldest = int((now - self.window) // SLOT_SECONDS)
+        while self.slots and self.slots[0][0] <= oldest:
+            self.slots.popleft()
+
+
+def _percentile(slot: _Slot, fraction: float) -> Optional[float]:
+    """Upper bound of the bucket holding the given fraction of requests.
+
+    None means the requests in question were slower than the last bucket.
+    """
+    seen = 0
+    for bound, count in zip((*BUCKETS_MS, None), slot.buckets):
+        seen += count
+        if seen >= fraction * slot.count:
+            return bound
+    return None
+
+
+class MetricsRegistry:
+    """Histograms of all views, safe to update from many threads."""
+
+    def __init__(self, window: int = 600) -> None:
+        self.window = window
+        self.histograms: Dict[str, Histogram] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view: str, total: float, timings: RequestTimings) -> None:
+        with self.lock:
+            if view not in self.histograms:
+                self.histograms[view] = Histogram(self.window)
+            self.histograms[view].observe(
+                total * 1000, timings.db * 1000, len(timings.queries), time.time()
+            )
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Statistics of the rolling window, per view."""
+        now = time.time()
+        result = {}
+        with self.lock:
+            for view, histogram in sorted(self.histograms.items()):
+                slot = histogram.recent(now)
+                if not slot.count:
+                    continue
+                result[view] = {
+                    "count": slot.count,
+                    "mean_ms": round(slot.total_ms / slot.count, 3),
+                    "p50_ms": _percentile(slot, 0.5),
+                    "p95_ms": _percentile(slot, 0.95),
+                    "p99_ms": _percentile(slot, 0.99),
+                    "db_mean_ms": round(slot.db_ms / slot.count, 3),
+                    "queries_mean": round(slot.queries / slot.count, 2),
+                    "buckets": dict(zip(map(str, (*BUCKETS_MS, "+Inf")), slot.buckets)),
+                }
+        return result
+
+    def prometheus(self) -> str:
+        """Counters since startup in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE umealse_request_duration_seconds histogram",
+            "# TYPE umealse_request_db_seconds_total counter",
+            "# TYPE umealse_request_queries_total counter",
+        ]
+        with self.lock:
+            for view, histogram in sorted(self.histograms.items()):
+                slot = histogram.total
+                cumulative = 0
+                for bound, count in zip((*BUCKETS_MS, None), slot.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound is None else f"{bound / 1000:g}"
+                    lines.append(
+                        f'umealse_request_duration_seconds_bucket{{view="{view}",'
+                        f'le="{le}"}} {cumulative}'
+                    )
+                lines += [
+                    f'umealse_request_duration_seconds_sum{{view="{view}"}} '
+                    f"{slot.total_ms / 1000:g}",
+                    f'umealse_request_duration_seconds_count{{view="{view}"}} '
+                    f"{slot.count}",
+                    f'umealse_request_db_seconds_total{{view="{view}"}} '
+                    f"{slot.db_ms / 1000:g}",
+                    f'umealse_request_queries_total{{view="{view}"}} {slot.queries}',
+                ]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def server_timing(total: float, timings: RequestTimings) -> str:
+    """Value of the `Server-Timing` header, durations in milliseconds."""
+    return ", ".join(
+        [
+            f'db;dur={timings.db * 1000:.1f};desc="{len(timings.queries)} queries"',
+            f"tpl;dur={timings.template * 1000:.1f}",
+            f"view;dur={timings.view * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ]
+    )
+
+
+def log_slow_request(path: str, total: float, timings: RequestTimings) -> None:
+    statements = "\n".join(
+        f"  {duration * 1000:.1f} ms: {sql[:500]}"
+        for sql, duration in timings.slowest_queries()
+    )
+    logger.warning(
+        "Slow request %s took %.0f ms (%d queries, %.0f ms in database):\n%s",
+        path,
+        total * 1000,
+        len(timings.queries),
+        timings.db * 1000,
+        statements,
+    )
@@ -0,0 +1,175 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+from . import metrics, routers
+from .social import SocialGraph
+
+
+class SocialGraphMiddleware:
+    """Attach a lazily loaded `SocialGraph` of the current user as `request.social`.
+
+    Must come after `AuthenticationMiddleware`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(
+        self,
+        get_response: Callable[
+            [HttpRequest], Union[HttpResponse, Awaitable[HttpResponse]]
+        ],
+    ) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        request.social = SocialGraph(request)  # type: ignore[attr-defined]
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        return await self.get_response(request)  # type: ignore[misc]
+
+
+class RequestMetricsMiddleware:
+    """Time queries, templates and the view of every request.
+
+    Adds a `Server-Timing` header, logs requests slower than
+    `REQUEST_METRICS_SLOW_MS` with their slowest queries and feeds per-view
+    histograms served by the `request_metrics` view. Should come first in
+    `MIDDLEWARE`; the view time also covers response processing of the
+    middleware after it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(
+        self,
+        get_response: Callable[
+            [HttpRequest], Union[HttpResponse, Awaitable[HttpResponse]]
+        ],
+    ) -> None:
+        self.get_response = get_response
+        metrics.install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, timings, start)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)  # type: ignore[misc]
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, timings, start)
+
+    def process_view(
+        self,
+        request: HttpRequest,
+        view_func: Callable,
+        view_args: Tuple[Any, ...],
+        view_kwargs: Dict[str, Any],
+    ) -> Optional[HttpResponse]:
+        request._view_started = time.perf_counter()  # type: ignore[attr-defined]
+        return None
+
+    def _finish(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        timings: metrics.RequestTimings,
+        start: float,
+    ) -> HttpResponse:
+        end = time.perf_counter()
+        total = end - start
+        view_started = getattr(request, "_view_started", None)
+        if view_started is not None:
+            timings.view = end - view_started
+        response.headers["Server-Timing"] = metrics.server_timing(total, timings)
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "<unresolved>"
+        metrics.registry.observe(view, total, timings)
+        if total * 1000 >= settings.REQUEST_METRICS_SLOW_MS:
+            metrics.log_slow_request(request.path, total, timings)
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """Pin requests of clients that wrote recently to the primary database.
+
+    A request that writes sets a cookie holding the time until which reads
+    of that client keep going to the primary, see `umealse.routers`.
+    """
+
+    cookie_name = "primary_until"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(
+        self,
+        get_response: Callable[
+            [HttpRequest], Union[HttpResponse, Awaitable[HttpResponse]]
+        ],
+    ) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pin, token = routers.start_request(self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self._remember(pin, response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        pin, token = routers.start_request(self._pinned(request))
+        try:
+            response = await self.get_response(request)  # type: ignore[misc]
+        finally:
+            routers.end_request(token)
+        return self._remember(pin, response)
+
+    def _pinned(self, request: HttpRequest) -> bool:
+        if request.method not in ("GET", "HEAD"):
+            return True
+        try:
+            until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            return False
+        return until > time.time()
+
+    def _remember(self, pin: routers.Pin, response: HttpResponse) -> HttpResponse:
+        if pin.wrote:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                self.cookie_name,
+                str(time.time() + seconds),
+                max_age=seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("umealse", "0005_profile_friends_friendship"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="event",
+            name="status",
+            field=models.CharField(
+                choices=[("DF", "Draft"), ("PB", "Published")],
+                default="PB",
+                max_length=2,
+            ),
+        ),
+        migrations.CreateModel(
+            name="FriendSuggestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("mutual_friends", models.PositiveIntegerField()),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="umealse.profile",
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="suggestions",
+                        to="umealse.profile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["profile", "-mutual_friends"],
+                        name="umealse_fri_profile_bc5da8_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("profile", "candidate"), name="unique_friend_suggestion"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        (
+            "taggit",
+            "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx",
+        ),
+        ("umealse", "0007_timelineentry"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="umealse_eve_search__bb3e64_gin"
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE umealse_event e SET search_vector =
+                    setweight(to_tsvector('english', e.title), 'A')
+                    || setweight(to_tsvector('english', coalesce((
+                        SELECT string_agg(t.name, ' ')
+                        FROM taggit_taggeditem ti
+                        JOIN taggit_tag t ON t.id = ti.tag_id
+                        JOIN django_content_type ct ON ct.id = ti.content_type_id
+                        WHERE ct.app_label = 'umealse' AND ct.model = 'event'
+                            AND ti.object_id = e.id
+                    ), '')), 'B')
+                    || setweight(to_tsvector('english', e.body), 'C');
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        (
+            "taggit",
+            "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx",
+        ),
+        ("umealse", "0008_event_search_vector"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["-updated"], name="umealse_eve_updated_b86f0e_idx"
+            ),
+        ),
+    ]
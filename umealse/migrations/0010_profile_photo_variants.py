@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("umealse", "0009_event_updated_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="photo_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        (
+            "taggit",
+            "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx",
+        ),
+        ("umealse", "0010_profile_photo_variants"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="event",
+            name="umealse_eve_event_d_d24159_idx",
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                condition=models.Q(("status", "PB")),
+                fields=["-event_date", "-id"],
+                name="event_published_date_idx",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="friendsuggestion",
+            name="umealse_fri_profile_bc5da8_idx",
+        ),
+        migrations.AddIndex(
+            model_name="friendsuggestion",
+            index=models.Index(
+                fields=["profile", "-mutual_friends", "candidate"],
+                name="umealse_fri_profile_0c9004_idx",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="timelineentry",
+            name="umealse_tim_owner_i_1abc01_idx",
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["owner", "event_date", "event"],
+                name="umealse_tim_owner_i_fa4f20_idx",
+            ),
+        ),
+        # Lets a tag-filtered list walk event_published_date_idx and probe
+        # each event's tag. Joins compare the integer object_id cast to the
+        # bigint Event.id, so the index has to be on the cast expression.
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX IF NOT EXISTS taggit_taggeditem_tag_object_idx
+                ON taggit_taggeditem (tag_id, content_type_id, (object_id::bigint));
+            """,
+            reverse_sql="DROP INDEX IF EXISTS taggit_taggeditem_tag_object_idx;",
+        ),
+    ]
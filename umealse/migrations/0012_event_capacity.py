@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        (
+            "taggit",
+            "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx",
+        ),
+        ("umealse", "0011_plan_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="attendee_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="capacity",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Leave empty for no limit.", null=True
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE umealse_event SET attendee_count = (
+                    SELECT COUNT(*) FROM umealse_event_attendees
+                    WHERE umealse_event_attendees.event_id = umealse_event.id
+                );
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="event",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    ("capacity__isnull", True),
+                    ("attendee_count__lte", models.F("capacity")),
+                    _connector="OR",
+                ),
+                name="event_within_capacity",
+            ),
+        ),
+    ]
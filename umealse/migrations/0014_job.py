@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("umealse", "0013_invitation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("func", models.CharField(max_length=250)),
+                ("args", models.JSONField(default=list)),
+                ("key", models.CharField(blank=True, max_length=250, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("QD", "Queued"), ("RN", "Running"), ("FL", "Failed")],
+                        default="QD",
+                        max_length=2,
+                    ),
+                ),
+                ("run_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("max_attempts", models.PositiveIntegerField(default=5)),
+                ("last_error", models.TextField(blank=True)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "FL"), _negated=True),
+                        fields=["run_at"],
+                        name="job_pending_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status", "FL"), _negated=True),
+                        fields=("key",),
+                        name="unique_pending_job_key",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:19
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("umealse", "0014_job"),
+    ]
+
+    operations = [
+        # Drop requests the constraints reject: self requests, duplicates of
+        # a pair (keeping the oldest) and requests between friends.
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM umealse_friendship WHERE from_user_id = to_user_id;
+                DELETE FROM umealse_friendship f USING umealse_friendship g
+                WHERE LEAST(f.from_user_id, f.to_user_id)
+                        = LEAST(g.from_user_id, g.to_user_id)
+                    AND GREATEST(f.from_user_id, f.to_user_id)
+                        = GREATEST(g.from_user_id, g.to_user_id)
+                    AND f.id > g.id;
+                DELETE FROM umealse_friendship f USING umealse_profile_friends e
+                WHERE e.from_profile_id = f.from_user_id
+                    AND e.to_profile_id = f.to_user_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="friendship",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.comparison.Least("from_user", "to_user"),
+                django.db.models.functions.comparison.Greatest("from_user", "to_user"),
+                name="unique_friendship_pair",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="friendship",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("from_user", models.F("to_user")), _negated=True),
+                name="friendship_not_self",
+            ),
+        ),
+    ]
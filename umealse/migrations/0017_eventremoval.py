@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("umealse", "0016_event_location"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventRemoval",
+            fields=[
+                (
+                    "scope",
+                    models.CharField(max_length=120, primary_key=True, serialize=False),
+                ),
+                ("removed", models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,13 +1,31 @@
+from typing import Dict, Optional
+
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Greatest, Least
 from django.db.models.query import QuerySet
 from django.urls import reverse
 from django.utils import timezone
 from taggit.managers import TaggableManager
 
+from . import geo
+
+
+class EventQuerySet(models.QuerySet):
+    def with_list_relations(self) -> "EventQuerySet":
+        """Load everything an event card renders: host and tags."""
+        return self.select_related("host").prefetch_related("tags")
+
+    def with_detail_relations(self) -> "EventQuerySet":
+        """Load everything the event detail page renders."""
+        return self.with_list_relations().prefetch_related("attendees")
+
 
-class PublishedManager(models.Manager):
+class PublishedManager(models.Manager.from_queryset(EventQuerySet)):  # type: ignore
     def get_queryset(self) -> QuerySet:
         return super().get_queryset().filter(status=Event.Status.PUBLISHED)
 
@@ -21,6 +39,11 @@ class Event(models.Model):
     slug = models.SlugField(max_length=250)
     host = models.ForeignKey(User, on_delete=models.CASCADE, related_name="events")
     attendees = models.ManyToManyField(User, blank=True)
+    capacity = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Leave empty for no limit."
+    )
+    # Kept equal to the number of attendees by `umealse.signals`.
+    attendee_count = models.PositiveIntegerField(default=0, editable=False)
     body = models.TextField()
     publish = models.DateTimeField(default=timezone.now)
     event_date = models.DateTimeField(default=timezone.now)
@@ -30,16 +53,50 @@ class Event(models.Model):
     status = models.CharField(
         max_length=2, choices=Status.choices, default=Status.PUBLISHED
     )
+    search_vector = SearchVectorField(null=True, editable=False)
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
+    # Derived from the coordinates on save, see `umealse.geo`.
+    geohash = models.CharField(max_length=12, null=True, editable=False)
 
-    objects = models.Manager()
+    objects = EventQuerySet.as_manager()
     published = PublishedManager()
 
     tags = TaggableManager(blank=True)
 
     class Meta:
         ordering = ["-event_date"]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(capacity__isnull=True)
+                | models.Q(attendee_count__lte=models.F("capacity")),
+                name="event_within_capacity",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(latitude__isnull=True, longitude__isnull=True)
+                | models.Q(latitude__isnull=False, longitude__isnull=False),
+                name="event_complete_location",
+                violation_error_message="Give both latitude and longitude.",
+            ),
+        ]
         indexes = [
-            models.Index(fields=["-event_date"]),
+            # Lists, keyset pages and upcoming events read published ones only.
+            models.Index(
+                fields=["-event_date", "-id"],
+                name="event_published_date_idx",
+                condition=models.Q(status="PB"),
+            ),
+            models.Index(fields=["-updated"]),
+            GinIndex(fields=["search_vector"]),
+            models.Index(fields=["geohash"], name="event_geohash_idx"),
         ]
 
     def __str__(self) -> str:
@@ -48,23 +105,205 @@ class Event(models.Model):
     def get_absolute_url(self) -> str:
         return reverse("event_detail", args=[self.id])
 
+    def save(self, *args, **kwargs) -> None:
+        self.geohash = self.compute_geohash()
+        if "update_fields" in kwargs and kwargs["update_fields"] is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "geohash"}
+        super().save(*args, **kwargs)
+
+    def compute_geohash(self) -> Optional[str]:
+        if self.latitude is None or self.longitude is None:
+            return None
+        return geo.encode(self.latitude, self.longitude)
+
+    @property
+    def is_full(self) -> bool:
+        return self.capacity is not None and self.attendee_count >= self.capacity
+
+    @property
+    def is_past(self) -> bool:
+        return self.event_date <= timezone.now()
+
+
+class EventRemoval(models.Model):
+    """When events last left the lists or feeds of a scope.
+
+    Written by `umealse.conditional.mark_events_removed` in the transaction
+    removing them, and read by the validators of those lists and feeds.
+    """
+
+    scope = models.CharField(max_length=120, primary_key=True)
+    removed = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return self.scope
+
+
+class Invitation(models.Model):
+    """A guest invited to an event; `notified` is set once they were emailed."""
+
+    event = models.ForeignKey(
+        Event, related_name="invitations", on_delete=models.CASCADE
+    )
+    guest = models.ForeignKey(
+        User, related_name="invitations", on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    notified = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "guest"], name="unique_invitation"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.guest_id} to {self.event_id}"
+
 
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     photo = models.ImageField(upload_to="users/", blank=True)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     friends = models.ManyToManyField("Profile", blank=True)
 
     def __str__(self) -> str:
         return f"{self.user.username}"
 
+    @property
+    def photo_variant_urls(self) -> Dict[str, str]:
+        """URLs of processed photo thumbnails, e.g. `webp_100` or `jpg_200`."""
+        storage = self._meta.get_field("photo").storage
+        return {key: storage.url(name) for key, name in self.photo_variants.items()}
+
     def get_friend_requests(self):
         return Friendship.objects.filter(to_user=self)
 
 
 class Friendship(models.Model):
+    """A pending friend request; accepted ones become `Profile.friends` edges.
+
+    `Profile.friends` isn't symmetrical to Django, so `umealse.social` writes
+    and deletes an edge in each direction for every pair of friends itself.
+    """
+
     from_user = models.ForeignKey(
         Profile, related_name="from_user", on_delete=models.CASCADE
     )
     to_user = models.ForeignKey(
         Profile, related_name="to_user", on_delete=models.CASCADE
     )
+
+    class Meta:
+        constraints = [
+            # One pending request per pair, whichever of them sent it.
+            models.UniqueConstraint(
+                Least("from_user", "to_user"),
+                Greatest("from_user", "to_user"),
+                name="unique_friendship_pair",
+            ),
+            models.CheckConstraint(
+                condition=~models.Q(from_user=models.F("to_user")),
+                name="friendship_not_self",
+            ),
+        ]
+
+
+class FriendSuggestion(models.Model):
+    """Precomputed "people you may know" entry.
+
+    Rows are maintained by `umealse.social.refresh_suggestions` whenever a
+    friendship changes, and can be rebuilt with `rebuild_friend_suggestions`.
+    """
+
+    profile = models.ForeignKey(
+        Profile, related_name="suggestions", on_delete=models.CASCADE
+    )
+    candidate = models.ForeignKey(Profile, related_name="+", on_delete=models.CASCADE)
+    mutual_friends = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "candidate"], name="unique_friend_suggestion"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["profile", "-mutual_friends", "candidate"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.candidate_id} for {self.profile_id}"
+
+
+class TimelineEntry(models.Model):
+    """An event shown in the friends feed of `owner`.
+
+    The table is written on fan-out (see `umealse.timeline`) so reading a feed
+    is a single range scan over the (owner, event_date, event) index.
+    """
+
+    owner = models.ForeignKey(
+        Profile, related_name="timeline", on_delete=models.CASCADE
+    )
+    event = models.ForeignKey(Event, related_name="+", on_delete=models.CASCADE)
+    event_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "event"], name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "event_date", "event"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.event_id} for {self.owner_id}"
+
+
+class Job(models.Model):
+    """A call of `func` queued in the database, see `umealse.jobs`.
+
+    For a running job `run_at` is when its lease expires and another worker
+    may take it over.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "QD", "Queued"
+        RUNNING = "RN", "Running"
+        FAILED = "FL", "Failed"
+
+    func = models.CharField(max_length=250)
+    args = models.JSONField(default=list)
+    key = models.CharField(max_length=250, null=True, blank=True)
+    status = models.CharField(
+        max_length=2, choices=Status.choices, default=Status.QUEUED
+    )
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Only one pending job per deduplication key.
+            models.UniqueConstraint(
+                fields=["key"],
+                name="unique_pending_job_key",
+                condition=~models.Q(status="FL"),
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["run_at"],
+                name="job_pending_idx",
+                condition=~models.Q(status="FL"),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.func}{tuple(self.args)}"
@@ -0,0 +1,58 @@
+"""Emails about friend requests, sent by the job queue (`umealse.jobs`)."""
+from typing import List, Optional
+
+from django.contrib.auth.models import User
+from django.core.mail import get_connection, send_mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.template.loader import render_to_string
+
+from .models import Friendship, Profile
+
+
+def friend_request_sent(friendship_id: int) -> None:
+    """Tell the addressee of a friend request about it, if it's still pending."""
+    friendship = (
+        Friendship.objects.filter(id=friendship_id)
+        .select_related("from_user__user", "to_user__user")
+        .first()
+    )
+    if friendship is None:
+        return
+    _send(
+        friendship.to_user.user,
+        f"{friendship.from_user.user.username} wants to be your friend",
+        "account/friend_request_email.txt",
+        friendship.from_user.user,
+    )
+
+
+def friend_requests_accepted(accepter_id: int, sender_ids: List[int]) -> None:
+    """Tell senders of friend requests that accepter took them."""
+    profiles = Profile.objects.select_related("user").in_bulk(
+        [accepter_id, *sender_ids]
+    )
+    accepter = profiles.pop(accepter_id, None)
+    if accepter is None:
+        return
+    with get_connection() as connection:
+        for sender in profiles.values():
+            _send(
+                sender.user,
+                f"{accepter.user.username} accepted your friend request",
+                "account/friend_accepted_email.txt",
+                accepter.user,
+                connection,
+            )
+
+
+def _send(
+    recipient: User,
+    subject: str,
+    template: str,
+    friend: User,
+    connection: Optional[BaseEmailBackend] = None,
+) -> None:
+    if not recipient.email:
+        return
+    body = render_to_string(template, {"user": recipient, "friend": friend})
+    send_mail(subject, body, None, [recipient.email], connection=connection)
@@ -0,0 +1,172 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Model, Q
+from django.db.models.query import QuerySet
+
+
+class InvalidCursor(Exception):
+    """Raised when a pagination cursor can't be decoded."""
+
+
+class KeysetPage:
+    """A single page of results fetched by `KeysetPaginator`.
+
+    Unlike Django's `Page` it knows nothing about the total number of rows,
+    only whether there is anything before or after it.
+    """
+
+    def __init__(
+        self,
+        object_list: List[Model],
+        next_cursor: Optional[str] = None,
+        previous_cursor: Optional[str] = None,
+    ) -> None:
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self) -> str:
+        return f"<KeysetPage of {len(self.object_list)} objects>"
+
+    def __iter__(self) -> Iterator[Model]:
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Paginate a queryset by seeking past the last seen row.
+
+    Rows are ordered by `ordering`, which must end with a unique column so
+    that the order is total. A page is fetched with a `WHERE (a, b) < (x, y)`
+    style filter followed by `LIMIT`, so its cost doesn't depend on how deep
+    the page is and no `COUNT(*)` is ever needed.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        per_page: int,
+        ordering: Sequence[str] = ("-event_date", "-id"),
+    ) -> None:
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip("-") for name in self.ordering]
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Return the page that starts right after (or ends right before) cursor."""
+        queryset, has_previous, backwards = self._query(cursor)
+        page = self._make_page(list(queryset), has_previous, backwards)
+        return page if page is not None else self.page()
+
+    async def apage(self, cursor: Optional[str] = None) -> KeysetPage:
+        """Async version of `page`."""
+        queryset, has_previous, backwards = self._query(cursor)
+        rows = [row async for row in queryset]
+        page = self._make_page(rows, has_previous, backwards)
+        return page if page is not None else await self.apage()
+
+    def encode_cursor(self, obj: Model, backwards: bool = False) -> str:
+        """Build an opaque token pointing at obj's position in the ordering."""
+        values = [self._dump(getattr(obj, field)) for field in self.fields]
+        payload = json.dumps([values, int(backwards)], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> Tuple[List[Any], bool]:
+        """Reverse `encode_cursor`, returning the key values and direction."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values, backwards = json.loads(base64.urlsafe_b64decode(padded))
+            if len(values) != len(self.fields):
+                raise InvalidCursor("Cursor doesn't match the ordering.")
+            values = [self._load(f, v) for f, v in zip(self.fields, values)]
+        except (binascii.Error, TypeError, ValueError, ValidationError) as e:
+            raise InvalidCursor("Cursor is malformed.") from e
+        return values, bool(backwards)
+
+    def _query(self, cursor: Optional[str]) -> Tuple[QuerySet, bool, bool]:
+        """Build the page query, telling if it has a predecessor and direction."""
+        if not cursor:
+            return self._limit(self.queryset, self.ordering), False, False
+
+        values, backwards = self.decode_cursor(cursor)
+        queryset = self.queryset.filter(self._seek(values, backwards))
+        if not backwards:
+            return self._limit(queryset, self.ordering), True, False
+        return self._limit(queryset, self._reversed_ordering()), False, True
+
+    def _limit(self, queryset: QuerySet, ordering: Sequence[str]) -> QuerySet:
+        return queryset.order_by(*ordering)[: self.per_page + 1]
+
+    def _make_page(
+        self, rows: List[Model], has_previous: bool, backwards: bool
+    ) -> Optional[KeysetPage]:
+        if backwards:
+            if len(rows) <= self.per_page:
+                # Walked back to the beginning: the caller shows a full first
+                # page instead of whatever remained before the cursor.
+                return None
+            rows = rows[: self.per_page][::-1]
+            return KeysetPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1]),
+                previous_cursor=self.encode_cursor(rows[0], backwards=True),
+            )
+
+        has_next = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if not rows:
+            return KeysetPage(rows)
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_next else None,
+            previous_cursor=(
+                self.encode_cursor(rows[0], backwards=True) if has_previous else None
+            ),
+        )
+
+    def _reversed_ordering(self) -> Tuple[str, ...]:
+        return tuple(
+            name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering
+        )
+
+    def _seek(self, values: List[Any], backwards: bool) -> Q:
+        """Expand a row comparison into `a < x OR (a = x AND b < y) ...`."""
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith("-")
+            lookup = "lt" if descending != backwards else "gt"
+            step = Q(**{f"{self.fields[i]}__{lookup}": values[i]})
+            for field, value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{field: value})
+            condition |= step
+        return condition
+
+    @staticmethod
+    def _dump(value: Any) -> Any:
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        return value
+
+    def _load(self, field_name: str, value: Any) -> Any:
+        try:
+            field = self.queryset.model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search rank) are stored as plain JSON values.
+            return value
+        return field.to_python(value)
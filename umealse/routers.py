@@ -0,0 +1,75 @@
+"""Routing of reads to read replicas.
+
+Reads go to a random alias of `DATABASE_REPLICAS` and writes to the
+primary. To keep read-your-writes consistency a request is pinned to the
+primary when it writes, inside transactions, and, through a cookie set by
+`ReplicaPinningMiddleware`, for `REPLICA_PIN_SECONDS` after its client last
+wrote, which is meant to outlast the replication lag.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class Pin:
+    """Routing state of the current request."""
+
+    pinned: bool = False
+    wrote: bool = False
+
+
+_pin: ContextVar[Optional[Pin]] = ContextVar("replica_pin", default=None)
+
+
+def start_request(pinned: bool) -> Tuple[Pin, Token]:
+    pin = Pin(pinned=pinned)
+    return pin, _pin.set(pin)
+
+
+def end_request(token: Token) -> None:
+    _pin.reset(token)
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """Send every read of the block to the primary."""
+    _, token = start_request(pinned=True)
+    try:
+        yield
+    finally:
+        end_request(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model: type, **hints: Any) -> Optional[str]:
+        replicas = settings.DATABASE_REPLICAS
+        pin = _pin.get()
+        if not replicas or (pin and (pin.pinned or pin.wrote)):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # A replica can't see what the open transaction wrote.
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model: type, **hints: Any) -> str:
+        pin = _pin.get()
+        if pin is not None:
+            pin.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Any, obj2: Any, **hints: Any) -> Optional[bool]:
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, **hints: Any) -> Optional[bool]:
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
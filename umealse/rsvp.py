@@ -0,0 +1,66 @@
+"""Joining and leaving events.
+
+Attendance changes with the event row locked (`SELECT ... FOR UPDATE`), so
+concurrent RSVPs to one event are serialized and can't take more seats than
+its `capacity`. `Event.attendee_count` is recounted by the `attendees_changed`
+receiver in the same transaction, and a check constraint backs the limit up.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Event
+
+
+class RsvpError(Exception):
+    """Raised when an RSVP isn't allowed; the message says why."""
+
+
+class EventFull(RsvpError):
+    """Raised when joining an event with no seats left."""
+
+    def __init__(self) -> None:
+        super().__init__("Sorry, the event is full.")
+
+
+def attendee_count() -> Coalesce:
+    """Expression counting attendees of the event, for `Event.attendee_count`."""
+    counts = (
+        Event.attendees.through.objects.filter(event_id=OuterRef("pk"))
+        .values("event_id")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def join(event_id: int, user: User) -> bool:
+    """Add user to attendees of a published event.
+
+    Returns False if they were attending already; raises `EventFull` when
+    there's no seat left, `RsvpError` for the host and past events, and
+    `Event.DoesNotExist` for unknown events.
+    """
+    with transaction.atomic():
+        event = Event.published.select_for_update().get(id=event_id)
+        if event.host_id == user.id:
+            raise RsvpError("You're hosting the event.")
+        if event.is_past:
+            raise RsvpError("The event has already taken place.")
+        if event.attendees.filter(id=user.id).exists():
+            return False
+        if event.is_full:
+            raise EventFull
+        event.attendees.add(user)
+    return True
+
+
+def leave(event_id: int, user: User) -> bool:
+    """Remove user from attendees; returns False if they weren't attending."""
+    with transaction.atomic():
+        event = Event.published.select_for_update().get(id=event_id)
+        if not event.attendees.filter(id=user.id).exists():
+            return False
+        event.attendees.remove(user)
+    return True
@@ -0,0 +1,55 @@
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    CombinedSearchVector,
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db.models import F, FloatField, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.query import QuerySet
+from taggit.models import TaggedItem
+
+from .models import Event
+
+SEARCH_CONFIG = "english"
+
+
+def event_search_vector() -> CombinedSearchVector:
+    """Expression computing `Event.search_vector` from title, tags and body."""
+    tag_names = (
+        TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Event),
+            object_id=OuterRef("pk"),
+        )
+        .values("object_id")
+        .annotate(names=StringAgg("tag__name", " "))
+        .values("names")
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(Subquery(tag_names), Value(""), output_field=TextField()),
+            weight="B",
+            config=SEARCH_CONFIG,
+        )
+        + SearchVector("body", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(events: QuerySet) -> int:
+    """Recompute stored search vectors of given events in one UPDATE."""
+    return events.update(search_vector=event_search_vector())
+
+
+def search_events(events: QuerySet, text: str) -> QuerySet:
+    """Filter events matching text using the GIN index, annotated with `rank`.
+
+    The rank is cast from `real` to `double precision` so that it survives a
+    round trip through a pagination cursor without losing equality.
+    """
+    query = SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+    return events.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+    )
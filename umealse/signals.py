@@ -0,0 +1,155 @@
+from typing import Any, Optional, Set
+
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from . import live, timeline
+from .auth import invalidate_user
+from .cards import invalidate_card
+from .conditional import mark_events_removed
+from .models import Event, Profile
+from .rsvp import attendee_count
+from .search import event_search_vector, update_search_vectors
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender: type, instance: User, **kwargs: Any) -> None:
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def drop_cached_profile(sender: type, instance: Profile, **kwargs: Any) -> None:
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Event)
+def fan_out_event(sender: type, instance: Event, **kwargs: Any) -> None:
+    timeline.sync_event(instance)
+
+
+@receiver(post_save, sender=Event)
+def index_event(sender: type, instance: Event, **kwargs: Any) -> None:
+    update_search_vectors(Event.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def drop_event_card(sender: type, instance: Event, **kwargs: Any) -> None:
+    invalidate_card(instance)
+
+
+@receiver(pre_delete, sender=Event)
+def event_removed(sender: type, instance: Event, **kwargs: Any) -> None:
+    """Its tags and attendees are gone by `post_delete`, so mark them before."""
+    mark_events_removed(
+        everywhere=True,
+        tags=instance.tags.values_list("slug", flat=True),
+        users=[
+            instance.host_id,
+            *instance.attendees.values_list("id", flat=True),
+        ],
+    )
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def event_untagged(
+    sender: type,
+    instance: Any,
+    action: str,
+    pk_set: Optional[Set[int]],
+    **kwargs: Any,
+) -> None:
+    """The event leaves lists and feeds of the tags removed from it."""
+    if not isinstance(instance, Event) or action not in ("pre_remove", "pre_clear"):
+        return
+    tags = instance.tags.all() if pk_set is None else Tag.objects.filter(pk__in=pk_set)
+    mark_events_removed(tags=tags.values_list("slug", flat=True))
+
+
+@receiver(m2m_changed, sender=Event.attendees.through)
+def attendees_leaving(
+    sender: type,
+    instance: Any,
+    action: str,
+    reverse: bool,
+    pk_set: Optional[Set[int]],
+    **kwargs: Any,
+) -> None:
+    """Events leave the calendar feeds of attendees removed from them."""
+    if action not in ("pre_remove", "pre_clear"):
+        return
+    if reverse:
+        users = [instance.pk]
+    elif pk_set is None:
+        users = list(instance.attendees.values_list("id", flat=True))
+    else:
+        users = list(pk_set)
+    mark_events_removed(users=users)
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def event_tags_changed(sender: type, instance: Any, action: str, **kwargs: Any) -> None:
+    """Reindex the event and bump `updated`, as tags are part of its content."""
+    if not isinstance(instance, Event) or action not in (
+        "post_add",
+        "post_remove",
+        "post_clear",
+    ):
+        return
+    invalidate_card(instance)
+    instance.updated = timezone.now()
+    Event.objects.filter(pk=instance.pk).update(
+        updated=instance.updated, search_vector=event_search_vector()
+    )
+
+
+@receiver(m2m_changed, sender=Event.attendees.through)
+def attendees_changed(
+    sender: type,
+    instance: Any,
+    action: str,
+    reverse: bool,
+    pk_set: Optional[Set[int]],
+    **kwargs: Any,
+) -> None:
+    """Recount attendees, bump `updated` of affected events and fan them out."""
+    if not reverse:
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        events = [instance]
+        user_ids = pk_set
+        usernames = None
+    else:
+        # The user side of the relation: `user.event_set.add(*events)` etc.
+        if action == "pre_clear":
+            instance._cleared_event_ids = set(
+                instance.event_set.values_list("id", flat=True)
+            )
+            return
+        if action == "post_clear":
+            pk_set = instance.__dict__.pop("_cleared_event_ids", set())
+        elif action not in ("post_add", "post_remove"):
+            return
+        events = list(Event.objects.filter(pk__in=pk_set))
+        user_ids = {instance.pk}
+        usernames = [instance.username]
+
+    now = timezone.now()
+    Event.objects.filter(pk__in=[event.pk for event in events]).update(
+        updated=now, attendee_count=attendee_count()
+    )
+    for event in events:
+        invalidate_card(event)
+        event.updated = now
+        timeline.sync_event(event)
+    live.attendees_changed(
+        [event.pk for event in events],
+        user_ids,
+        joined=action == "post_add",
+        usernames=usernames,
+    )
@@ -0,0 +1,267 @@
+from typing import Collection, Iterator, List, Optional, Sequence, Set
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.query import QuerySet
+from django.http import HttpRequest
+from django.utils.functional import cached_property
+
+from . import live, timeline
+from .models import FriendSuggestion, Friendship, Profile
+
+SUGGESTIONS_LIMIT = 10
+
+Edge = Profile.friends.through
+
+_user_profile = Profile._meta.get_field("user").remote_field
+
+
+class SocialGraph:
+    """Social data of the current user, loaded lazily and at most once.
+
+    An instance is attached to every request as `request.social` by
+    `SocialGraphMiddleware`, so views and templates share the same batched
+    queries instead of each walking `request.user.profile` relations again.
+    Async views must `await aload(...)` what their templates need first.
+    """
+
+    def __init__(self, request: HttpRequest) -> None:
+        self.request = request
+
+    @cached_property
+    def profile(self) -> Optional[Profile]:
+        if not self.request.user.is_authenticated:
+            return None
+        try:
+            return self.request.user.profile
+        except Profile.DoesNotExist:
+            return None
+
+    @cached_property
+    def friends(self) -> List[Profile]:
+        """Friends' profiles together with their users."""
+        return list(self._friends_query())
+
+    @cached_property
+    def friend_ids(self) -> Set[int]:
+        """Profile ids of friends, for O(1) membership checks."""
+        if "friends" in self.__dict__:
+            return {friend.id for friend in self.friends}
+        return set(self._friend_ids_query())
+
+    @cached_property
+    def friend_requests(self) -> List[Friendship]:
+        """Pending requests sent to the user, with senders' profiles and users."""
+        return list(self._friend_requests_query())
+
+    @cached_property
+    def suggestions(self) -> List[FriendSuggestion]:
+        """Best "people you may know" candidates, without pending requests."""
+        return list(self._suggestions_query())
+
+    async def aload(self, *names: str) -> None:
+        """Load given properties (e.g. "friends") using the async ORM."""
+        if "profile" not in self.__dict__:
+            user = await self.request.auser()  # type: ignore[attr-defined]
+            if not user.is_authenticated:
+                self.profile = None
+            elif _user_profile.is_cached(user):
+                # Users from `umealse.auth.CachedModelBackend` come with it.
+                self.profile = _user_profile.get_cached_value(user)
+            else:
+                self.profile = await Profile.objects.filter(user_id=user.pk).afirst()
+        for name in names:
+            if name not in self.__dict__:
+                rows = [row async for row in getattr(self, f"_{name}_query")()]
+                setattr(self, name, set(rows) if name == "friend_ids" else rows)
+
+    def _friends_query(self) -> QuerySet:
+        if self.profile is None:
+            return Profile.objects.none()
+        return self.profile.friends.select_related("user").order_by("id")
+
+    def _friend_ids_query(self) -> QuerySet:
+        return Profile.friends.through.objects.filter(
+            from_profile_id=getattr(self.profile, "id", None)
+        ).values_list("to_profile_id", flat=True)
+
+    def _friend_requests_query(self) -> QuerySet:
+        return (
+            Friendship.objects.filter(to_user_id=getattr(self.profile, "id", None))
+            .select_related("from_user__user")
+            .order_by("id")
+        )
+
+    def _suggestions_query(self) -> QuerySet:
+        if self.profile is None:
+            return FriendSuggestion.objects.none()
+        pending = Friendship.objects.filter(
+            Q(from_user_id=self.profile.id, to_user_id=OuterRef("candidate_id"))
+            | Q(from_user_id=OuterRef("candidate_id"), to_user_id=self.profile.id)
+        )
+        return (
+            FriendSuggestion.objects.filter(profile_id=self.profile.id)
+            .exclude(Exists(pending))
+            .select_related("candidate__user")
+            .order_by("-mutual_friends", "candidate_id")[:SUGGESTIONS_LIMIT]
+        )
+
+
+def _insert_suggestions(condition: str, params: Sequence[int]) -> None:
+    """Insert suggestion rows for friend-of-friend pairs matching condition.
+
+    `a` is an edge from a profile to its friend and `b` an edge from that
+    friend onwards, so grouping by both ends counts mutual friends. Pairs that
+    already are friends are skipped.
+
+    A concurrent refresh of overlapping profiles may have inserted a row since
+    this transaction deleted it; it's overwritten with the new count. Rows are
+    inserted in key order, so two refreshes lock them in the same order.
+    """
+    quote = connection.ops.quote_name
+    edges = quote(Profile.friends.through._meta.db_table)
+    suggestions = quote(FriendSuggestion._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {suggestions} (profile_id, candidate_id, mutual_friends)
+            SELECT a.from_profile_id, b.to_profile_id, COUNT(*)
+            FROM {edges} a
+            JOIN {edges} b ON b.from_profile_id = a.to_profile_id
+            WHERE a.from_profile_id <> b.to_profile_id
+                AND ({condition})
+                AND NOT EXISTS (
+                    SELECT 1 FROM {edges} c
+                    WHERE c.from_profile_id = a.from_profile_id
+                        AND c.to_profile_id = b.to_profile_id
+                )
+            GROUP BY a.from_profile_id, b.to_profile_id
+            ORDER BY a.from_profile_id, b.to_profile_id
+            ON CONFLICT (profile_id, candidate_id)
+            DO UPDATE SET mutual_friends = EXCLUDED.mutual_friends
+            """,
+            params,
+        )
+
+
+def refresh_suggestions(profile_ids: Collection[int]) -> None:
+    """Recompute every suggestion owned by or pointing at given profiles.
+
+    Adding or removing the friendship a-b only changes mutual friend counts of
+    pairs that include a or b, so refreshing both ends after the change keeps
+    the whole index exact.
+    """
+    ids = list(profile_ids)
+    if not ids:
+        return
+    placeholders = ", ".join(["%s"] * len(ids))
+    with transaction.atomic():
+        FriendSuggestion.objects.filter(
+            Q(profile_id__in=ids) | Q(candidate_id__in=ids)
+        ).delete()
+        # One side of the join per statement, so each can use its index; the
+        # second skips the pairs the first inserted.
+        _insert_suggestions(f"a.from_profile_id IN ({placeholders})", ids)
+        _insert_suggestions(
+            f"b.to_profile_id IN ({placeholders})"
+            f" AND a.from_profile_id NOT IN ({placeholders})",
+            ids + ids,
+        )
+
+
+def rebuild_suggestions(batch_size: int = 1000) -> Iterator[int]:
+    """Rebuild the whole suggestion index, `batch_size` profiles at a time.
+
+    Every batch is swapped in its own transaction, so readers never see a
+    half-empty index. Yields the number of profiles processed so far.
+    """
+    profile_ids = Profile.objects.order_by("id").values_list("id", flat=True)
+    done = 0
+    last_id = 0
+    while True:
+        batch = list(profile_ids.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        with transaction.atomic():
+            FriendSuggestion.objects.filter(
+                profile_id__gte=batch[0], profile_id__lte=batch[-1]
+            ).delete()
+            _insert_suggestions(
+                "a.from_profile_id >= %s AND a.from_profile_id <= %s",
+                [batch[0], batch[-1]],
+            )
+        done += len(batch)
+        last_id = batch[-1]
+        yield done
+
+
+class FriendshipError(Exception):
+    """Raised when a friendship change isn't allowed; the message says why."""
+
+
+def request_friendship(sender: Profile, addressee: Profile) -> Friendship:
+    """Send a friend request, unless the two are friends or one is pending."""
+    if sender.id == addressee.id:
+        raise FriendshipError("You can't befriend yourself.")
+    if Edge.objects.filter(from_profile=sender, to_profile=addressee).exists():
+        raise FriendshipError("You're friends already.")
+    try:
+        with transaction.atomic():
+            friendship = Friendship.objects.create(from_user=sender, to_user=addressee)
+    except IntegrityError:
+        # `unique_friendship_pair`, in either direction.
+        raise FriendshipError("Friend request was already sent.")
+    live.friend_request_sent(friendship)
+    return friendship
+
+
+def accept_requests(
+    addressee: Profile, request_ids: Optional[Collection[int]] = None
+) -> List[int]:
+    """Accept given pending requests sent to addressee, or all of them.
+
+    Takes the same number of queries however many requests are accepted.
+    Returns profile ids of the new friends.
+    """
+    with transaction.atomic():
+        pending = Friendship.objects.filter(to_user=addressee)
+        if request_ids is not None:
+            pending = pending.filter(id__in=request_ids)
+        sender_ids = list(
+            pending.select_for_update().values_list("from_user_id", flat=True)
+        )
+        if not sender_ids:
+            return []
+        Edge.objects.bulk_create(
+            [
+                Edge(from_profile_id=a, to_profile_id=b)
+                for sender_id in sender_ids
+                for a, b in ((addressee.id, sender_id), (sender_id, addressee.id))
+            ],
+            ignore_conflicts=True,
+        )
+        pending.filter(from_user_id__in=sender_ids).delete()
+        refresh_suggestions([addressee.id, *sender_ids])
+        timeline.add_friends(addressee.id, sender_ids)
+        live.friend_requests_accepted(addressee, sender_ids)
+    return sender_ids
+
+
+def reject_request(addressee: Profile, request_id: int) -> bool:
+    """Delete a pending request sent to addressee; False if there's none."""
+    deleted, _ = Friendship.objects.filter(id=request_id, to_user=addressee).delete()
+    return bool(deleted)
+
+
+def unfriend(profile: Profile, friend_id: int) -> bool:
+    """End a friendship; False if the two weren't friends."""
+    with transaction.atomic():
+        deleted, _ = Edge.objects.filter(
+            Q(from_profile=profile, to_profile_id=friend_id)
+            | Q(from_profile_id=friend_id, to_profile=profile)
+        ).delete()
+        if not deleted:
+            return False
+        refresh_suggestions([profile.id, friend_id])
+        timeline.remove_friends(profile.id, [friend_id])
+    return True
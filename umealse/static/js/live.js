@@ -0,0 +1,94 @@
+// Live updates of the event and dashboard pages, see umealse/live.py.
+(function () {
+    "use strict";
+
+    var page = document.querySelector("[data-live-url]");
+    if (!page || !window.EventSource) {
+        return;
+    }
+    var source = new EventSource(page.dataset.liveUrl);
+
+    // Handle messages of a type, reloading the page for those too large to
+    // be sent in full.
+    function listen(type, handler) {
+        source.addEventListener(type, function (e) {
+            var data = JSON.parse(e.data);
+            if (data.reload) {
+                window.location.reload();
+                return;
+            }
+            handler(data);
+        });
+    }
+
+    function item(parent, children) {
+        var li = document.createElement("li");
+        children.forEach(function (child) {
+            li.append(child);
+        });
+        parent.append(li);
+    }
+
+    function link(text, href) {
+        var a = document.createElement("a");
+        a.textContent = text;
+        a.href = href;
+        return a;
+    }
+
+    listen("attendees", function (data) {
+        var count = document.getElementById("attendee-count");
+        var list = document.getElementById("attendees");
+        if (!count || !list) {
+            return;
+        }
+        var capacity = count.dataset.capacity;
+        count.textContent = capacity
+            ? data.attendee_count + "/" + capacity + " seats taken"
+            : data.attendee_count + " attending";
+        var names = data.cleared ? [] : Array.from(
+            list.querySelectorAll(".attendee"), function (span) {
+                return span.textContent;
+            }
+        ).filter(function (name) {
+            return data.left.indexOf(name) < 0;
+        });
+        data.joined.forEach(function (name) {
+            if (names.indexOf(name) < 0) {
+                names.push(name);
+            }
+        });
+        list.replaceChildren();
+        names.forEach(function (name, i) {
+            var span = document.createElement("span");
+            span.className = "attendee";
+            span.textContent = name;
+            list.append(i ? " | " : "", span);
+        });
+    });
+
+    listen("friend_request", function (data) {
+        var requests = document.getElementById("friend-requests");
+        if (!requests) {
+            return;
+        }
+        var id = String(data.id);
+        item(requests.querySelector("ul"), [
+            data.username + " ",
+            link("Accept", requests.dataset.acceptUrl.replace(/0$/, id)),
+            " | ",
+            link("Reject", requests.dataset.rejectUrl.replace(/0$/, id)),
+        ]);
+        requests.hidden = false;
+    });
+
+    listen("friend_accepted", function (data) {
+        var friends = document.getElementById("friends");
+        if (friends) {
+            var href = friends.dataset.profileUrl.replace(
+                /-$/, encodeURIComponent(data.username)
+            );
+            item(friends, [link(data.username, href)]);
+        }
+    });
+})();
@@ -1,11 +1,22 @@
-from io import BytesIO
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from typing import Any, List
+from unittest import mock
 from PIL import Image
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
-from umealse.models import Profile
+from umealse import social, timeline
+from umealse.models import FriendSuggestion, Friendship, Profile
+from umealse.tests.utils import JobQueueMixin, QueryBudgetMixin
 
 
 class AccountTestCase(TestCase):
@@ -94,3 +105,417 @@ class AccountTestCase(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.user.username)
+
+
+class SocialGraphTestCase(QueryBudgetMixin, TestCase):
+    """Tests for pages reading the social graph of the logged in user."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profile = Profile.objects.create(user=self.user)
+        others = [
+            Profile.objects.create(
+                user=User.objects.create_user(username=f"other{i}", password="x")
+            )
+            for i in range(8)
+        ]
+        for friend in others[:5]:
+            self.profile.friends.add(friend)
+            friend.friends.add(self.profile)
+        for stranger in others[5:]:
+            Friendship.objects.create(from_user=stranger, to_user=self.profile)
+        self.friend, self.stranger = others[0], others[5]
+        self.client.login(username="testuser", password="testpass")
+
+    def test_dashboard_budget(self) -> None:
+        with self.assertMaxQueries(6):
+            response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "other4")
+        self.assertContains(response, "You have friend invites from")
+        self.assertContains(response, "other7")
+
+    def test_profile_of_friend(self) -> None:
+        url = reverse("profile", args=[self.friend.user.username])
+        with self.assertMaxQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, "Delete friend")
+        self.assertNotContains(response, "Add to friends")
+
+    def test_profile_of_stranger(self) -> None:
+        response = self.client.get(
+            reverse("profile", args=[self.stranger.user.username])
+        )
+        self.assertContains(response, "Add to friends")
+        self.assertNotContains(response, "Delete friend")
+
+    def test_own_profile(self) -> None:
+        response = self.client.get(reverse("profile", args=[self.user.username]))
+        self.assertNotContains(response, "Add to friends")
+        self.assertNotContains(response, "Delete friend")
+
+    def test_missing_profile(self) -> None:
+        response = self.client.get(reverse("profile", args=["nobody"]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_dashboard(self) -> None:
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("dashboard"))
+        self.assertContains(response, "other4")
+        self.assertContains(response, "other7")
+
+
+# As configured with a shared cache (REDIS_URL).
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    AUTHENTICATION_BACKENDS=["umealse.auth.CachedModelBackend"],
+)
+class CachedAuthTestCase(QueryBudgetMixin, TestCase):
+    """Signed in users and their sessions are read from the cache."""
+
+    # Loading the session, the user and their profile; not e.g. friends.
+    IDENTITY_QUERIES = (
+        'FROM "django_session"',
+        'FROM "auth_user" WHERE',
+        'FROM "auth_user" LEFT OUTER JOIN "umealse_profile"',
+        'FROM "umealse_profile" WHERE "umealse_profile"."user_id"',
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profile = Profile.objects.create(user=self.user)
+        self.client.login(username="testuser", password="testpass")
+
+    def identity_queries(self, url: str) -> List[str]:
+        with self.assertMaxQueries(10) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query["sql"]
+            for query in context.captured_queries
+            if any(pattern in query["sql"] for pattern in self.IDENTITY_QUERIES)
+        ]
+
+    def test_warm_pages_skip_identity_queries(self) -> None:
+        # Signing in saved `last_login`, which dropped the cached user.
+        self.assertEqual(len(self.identity_queries(reverse("dashboard"))), 1)
+        for name in ("dashboard", "edit_profile", "event_list"):
+            with self.subTest(page=name):
+                self.assertEqual(self.identity_queries(reverse(name)), [])
+
+    def test_profile_edit_invalidates(self) -> None:
+        self.client.get(reverse("dashboard"))
+        self.client.post(
+            reverse("edit_profile"),
+            {"first_name": "Ada", "last_name": "", "email": "ada@example.com"},
+        )
+        self.assertContains(self.client.get(reverse("dashboard")), "Hello Ada")
+
+    def test_password_change_signs_out(self) -> None:
+        self.client.get(reverse("dashboard"))
+        self.user.set_password("newpass")
+        self.user.save()
+        response = self.client.get(reverse("dashboard"))
+        self.assertRedirects(
+            response, f"{reverse('login')}?next={reverse('dashboard')}"
+        )
+
+    def test_user_without_profile(self) -> None:
+        self.profile.delete()
+        response = self.client.get(reverse("event_list"))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+
+class FriendSuggestionTestCase(QueryBudgetMixin, TestCase):
+    """Tests for the friend-of-friend suggestion index."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profiles = {"me": Profile.objects.create(user=self.user)}
+        for name in "abcde":
+            user = User.objects.create(username=name)
+            self.profiles[name] = Profile.objects.create(user=user)
+        for first, second in [("me", "a"), ("me", "b"), ("a", "c"), ("b", "c")]:
+            self.befriend(first, second)
+        self.befriend("b", "d")
+        call_command("rebuild_friend_suggestions", stdout=StringIO())
+        self.client.login(username="testuser", password="testpass")
+
+    def befriend(self, first: str, second: str) -> None:
+        self.profiles[first].friends.add(self.profiles[second])
+        self.profiles[second].friends.add(self.profiles[first])
+
+    def suggestions(self, name: str) -> dict:
+        return {
+            suggestion.candidate.user.username: suggestion.mutual_friends
+            for suggestion in FriendSuggestion.objects.filter(
+                profile=self.profiles[name]
+            ).select_related("candidate__user")
+        }
+
+    def test_rebuild(self) -> None:
+        self.assertEqual(self.suggestions("me"), {"c": 2, "d": 1})
+        self.assertEqual(self.suggestions("c"), {"testuser": 2, "d": 1})
+        self.assertEqual(self.suggestions("e"), {})
+
+    def test_dashboard_lists_suggestions(self) -> None:
+        with self.assertMaxQueries(6):
+            response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "People you may know")
+        suggested = [
+            s.candidate.user.username
+            for s in response.context["request"].social.suggestions
+        ]
+        self.assertEqual(suggested, ["c", "d"])
+
+    def test_pending_request_is_not_suggested(self) -> None:
+        Friendship.objects.create(
+            from_user=self.profiles["d"], to_user=self.profiles["me"]
+        )
+        response = self.client.get(reverse("dashboard"))
+        suggested = [
+            s.candidate.user.username
+            for s in response.context["request"].social.suggestions
+        ]
+        self.assertEqual(suggested, ["c"])
+
+    def test_accept_and_delete_update_index(self) -> None:
+        request = Friendship.objects.create(
+            from_user=self.profiles["c"], to_user=self.profiles["me"]
+        )
+        self.client.get(reverse("accept_friend_request", args=[request.id]))
+        self.assertEqual(self.suggestions("me"), {"d": 1})
+        self.assertEqual(self.suggestions("a"), {"b": 2})
+        self.assertEqual(self.suggestions("c"), {"d": 1})
+
+        self.client.get(reverse("delete_friend", args=[self.profiles["b"].user_id]))
+        self.assertEqual(self.suggestions("me"), {"b": 1})
+        self.assertEqual(self.suggestions("b"), {"testuser": 1, "a": 1})
+        self.assertEqual(self.suggestions("d"), {"c": 1})
+
+        expected = {name: self.suggestions(name) for name in self.profiles}
+        call_command("rebuild_friend_suggestions", "--batch-size=2", stdout=StringIO())
+        self.assertEqual(
+            {name: self.suggestions(name) for name in self.profiles}, expected
+        )
+
+
+class FriendSuggestionConcurrencyTestCase(TransactionTestCase):
+    """Refreshing overlapping suggestions from two threads at once."""
+
+    def test_concurrent_accepts(self) -> None:
+        profiles = {
+            name: Profile.objects.create(user=User.objects.create(username=name))
+            for name in "xmzyw"
+        }
+        for first, second in [("x", "m"), ("m", "z"), ("y", "z")]:
+            Friendship.objects.create(
+                from_user=profiles[first], to_user=profiles[second]
+            )
+            social.accept_requests(profiles[second])
+        # Both accepts refresh the x-z suggestions.
+        requests = [
+            Friendship.objects.create(from_user=profiles["y"], to_user=profiles["x"]),
+            Friendship.objects.create(from_user=profiles["w"], to_user=profiles["z"]),
+        ]
+        barrier = threading.Barrier(len(requests))
+        errors = []
+        add_friends = timeline.add_friends
+
+        def slow_add_friends(*args: Any) -> None:
+            # Keep the transaction open while the other one refreshes.
+            add_friends(*args)
+            time.sleep(0.3)
+
+        def accept(request: Friendship) -> None:
+            try:
+                barrier.wait()
+                social.accept_requests(request.to_user, [request.id])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=accept, args=[r]) for r in requests]
+        with mock.patch("umealse.timeline.add_friends", slow_add_friends):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        suggestions = FriendSuggestion.objects.get(
+            profile=profiles["x"], candidate=profiles["z"]
+        )
+        self.assertEqual(suggestions.mutual_friends, 2)
+
+
+class FriendshipTestCase(QueryBudgetMixin, TestCase):
+    """Tests for friend requests and friendship changes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profile = Profile.objects.create(user=self.user)
+        self.others = [
+            Profile.objects.create(user=User.objects.create(username=f"other{i}"))
+            for i in range(30)
+        ]
+        self.client.login(username="testuser", password="testpass")
+
+    def friend_ids(self, profile: Profile) -> set:
+        return set(profile.friends.values_list("id", flat=True))
+
+    def test_request_is_unique_per_pair(self) -> None:
+        other = self.others[0]
+        social.request_friendship(self.profile, other)
+        for sender, addressee, message in [
+            (self.profile, other, "Friend request was already sent."),
+            (other, self.profile, "Friend request was already sent."),
+            (self.profile, self.profile, "You can't befriend yourself."),
+        ]:
+            with self.assertRaisesMessage(social.FriendshipError, message):
+                social.request_friendship(sender, addressee)
+        self.assertEqual(Friendship.objects.count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Friendship.objects.create(from_user=other, to_user=self.profile)
+
+        social.accept_requests(other)
+        with self.assertRaisesMessage(
+            social.FriendshipError, "You're friends already."
+        ):
+            social.request_friendship(other, self.profile)
+
+    def test_send_request_view(self) -> None:
+        url = reverse("send_friend_request", args=[self.others[0].user_id])
+        response = self.client.get(url, follow=True)
+        self.assertContains(response, "Friend request sent.")
+        response = self.client.get(url, follow=True)
+        self.assertContains(response, "Friend request was already sent.")
+
+    def test_accept_and_unfriend(self) -> None:
+        other = self.others[0]
+        request = Friendship.objects.create(from_user=other, to_user=self.profile)
+        self.assertEqual(social.accept_requests(other, [request.id]), [])
+
+        response = self.client.get(
+            reverse("accept_friend_request", args=[request.id]), follow=True
+        )
+        self.assertContains(response, "Friend request accepted.")
+        self.assertEqual(self.friend_ids(self.profile), {other.id})
+        self.assertEqual(self.friend_ids(other), {self.profile.id})
+        self.assertFalse(Friendship.objects.exists())
+
+        self.client.get(reverse("delete_friend", args=[other.user_id]))
+        self.assertEqual(self.friend_ids(self.profile), set())
+        self.assertEqual(self.friend_ids(other), set())
+        self.assertFalse(social.unfriend(self.profile, other.id))
+
+    def test_accept_all_takes_constant_queries(self) -> None:
+        for other in self.others[:2]:
+            Friendship.objects.create(from_user=other, to_user=self.profile)
+        with self.assertMaxQueries(12) as few:
+            social.accept_requests(self.profile)
+
+        for other in self.others[2:]:
+            Friendship.objects.create(from_user=other, to_user=self.profile)
+        with self.assertMaxQueries(len(few)):
+            accepted = social.accept_requests(self.profile)
+        self.assertEqual(len(accepted), 28)
+        self.assertEqual(
+            self.friend_ids(self.profile), {other.id for other in self.others}
+        )
+        self.assertEqual(self.friend_ids(self.others[29]), {self.profile.id})
+
+    def test_accept_all_view(self) -> None:
+        for other in self.others[:3]:
+            Friendship.objects.create(from_user=other, to_user=self.profile)
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, "Accept all")
+
+        response = self.client.post(reverse("accept_all_friend_requests"), follow=True)
+        self.assertContains(response, "Accepted 3 friend requests.")
+        self.assertEqual(len(self.friend_ids(self.profile)), 3)
+
+
+class ProfilePhotoTestCase(JobQueueMixin, TestCase):
+    """Tests for processing of uploaded profile photos."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profile = Profile.objects.create(user=self.user)
+        self.client.login(username="testuser", password="testpass")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, size=(400, 300)):
+        image = Image.new(mode="RGB", size=size, color=(127, 127, 255))
+        buffer = BytesIO()
+        image.save(buffer, "JPEG")
+        photo = SimpleUploadedFile(
+            name="photo.jpg", content=buffer.getvalue(), content_type="image/jpeg"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("edit_profile"),
+                {"first_name": "Test", "email": "test@user.com", "photo": photo},
+            )
+        self.run_jobs()
+        return response
+
+    def test_upload_generates_variants(self) -> None:
+        self.upload()
+        self.profile.refresh_from_db()
+        self.assertEqual(
+            sorted(self.profile.photo_variants),
+            ["jpg_100", "jpg_200", "webp_100", "webp_200"],
+        )
+        path = self.profile.photo.storage.path(self.profile.photo_variants["webp_200"])
+        with Image.open(path) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (200, 200)))
+
+        response = self.client.get(reverse("profile", args=[self.user.username]))
+        self.assertContains(response, self.profile.photo_variant_urls["webp_100"])
+        self.assertNotContains(response, self.profile.photo.url)
+
+    def test_new_upload_replaces_variants(self) -> None:
+        self.upload()
+        self.profile.refresh_from_db()
+        old_variants = self.profile.photo_variants
+
+        self.upload()
+        self.profile.refresh_from_db()
+        storage = self.profile.photo.storage
+        for name in old_variants.values():
+            self.assertFalse(storage.exists(name))
+        for name in self.profile.photo_variants.values():
+            self.assertTrue(storage.exists(name))
+
+    @override_settings(PROFILE_PHOTO_MAX_PIXELS=100 * 100)
+    def test_too_large_photo_is_rejected(self) -> None:
+        response = self.upload()
+        self.assertContains(response, "Photo dimensions are too large.")
+        self.profile.refresh_from_db()
+        self.assertFalse(self.profile.photo)
+
+    def test_backfill_command(self) -> None:
+        image = Image.new(mode="RGB", size=(50, 80))
+        buffer = BytesIO()
+        image.save(buffer, "PNG")
+        self.profile.photo.save(
+            "old.png", SimpleUploadedFile("old.png", buffer.getvalue())
+        )
+
+        call_command("generate_photo_variants", stdout=StringIO())
+        self.profile.refresh_from_db()
+        self.assertEqual(len(self.profile.photo_variants), 4)
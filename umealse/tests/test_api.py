@@ -0,0 +1,155 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from taggit.models import Tag
+
+from umealse.models import Event, Friendship, Profile
+from umealse.tests.utils import QueryBudgetMixin
+
+
+class ApiTestCase(QueryBudgetMixin, TestCase):
+    """Tests for the JSON API in `umealse.api`."""
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profile = Profile.objects.create(user=self.user)
+        self.guests = [User.objects.create(username=f"guest{i}") for i in range(3)]
+        self.tag = Tag.objects.create(name="Soup", slug="soup")
+        start = timezone.now() + datetime.timedelta(days=1)
+        self.events = []
+        for i in range(25):
+            event = Event.objects.create(
+                title=f"Event {i}",
+                slug=f"event-{i}",
+                host=self.guests[i % 3],
+                body="Hot soup",
+                event_date=start + datetime.timedelta(hours=i),
+            )
+            event.tags.add(self.tag)
+            event.attendees.add(*self.guests)
+            self.events.append(event)
+        Event.objects.create(
+            title="Draft", slug="draft", host=self.user, body="", status="DF"
+        )
+        self.client.login(username="testuser", password="testpass")
+
+    def get(self, name: str, **params: str):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_events_pages(self) -> None:
+        first = self.get("api_events")
+        self.assertEqual(len(first["data"]), 20)
+        self.assertEqual(
+            first["data"][0],
+            {
+                "id": self.events[24].id,
+                "title": "Event 24",
+                "host": "guest0",
+                "event_date": first["data"][0]["event_date"],
+                "capacity": None,
+                "attendee_count": 3,
+                "tags": ["Soup"],
+                "url": self.events[24].get_absolute_url(),
+            },
+        )
+        self.assertIsNone(first["previous"])
+
+        second = self.get("api_events", cursor=first["next"])
+        self.assertEqual(
+            [event["title"] for event in second["data"]],
+            [f"Event {i}" for i in range(4, -1, -1)],
+        )
+        self.assertIsNone(second["next"])
+        self.assertEqual(len(self.get("api_events", limit="5", tag="soup")["data"]), 5)
+
+    def test_sparse_fieldsets(self) -> None:
+        data = self.get("api_events", fields="id, title,attendees", limit="1")["data"]
+        self.assertEqual(
+            data,
+            [
+                {
+                    "id": self.events[24].id,
+                    "title": "Event 24",
+                    "attendees": ["guest0", "guest1", "guest2"],
+                }
+            ],
+        )
+
+    def test_query_budget(self) -> None:
+        """Queries don't grow with rows, and drop with the relations left out."""
+        # Two queries load the session and its user.
+        with self.assertMaxQueries(4):
+            self.get("api_events", limit="100")
+        with self.assertMaxQueries(5):
+            self.get("api_events", limit="100", fields="id,tags,attendees")
+        with self.assertMaxQueries(3):
+            self.get("api_events", limit="100", fields="id,title,host")
+
+    def test_ids(self) -> None:
+        ids = [self.events[3].id, 0, self.events[1].id, self.events[3].id]
+        with self.assertMaxQueries(3):
+            data = self.get(
+                "api_events", ids=",".join(map(str, ids)), fields="id,host"
+            )["data"]
+        self.assertEqual(
+            data,
+            [
+                {"id": self.events[3].id, "host": "guest0"},
+                {"id": self.events[1].id, "host": "guest1"},
+            ],
+        )
+        draft = Event.objects.get(slug="draft")
+        self.assertEqual(self.get("api_events", ids=str(draft.id))["data"], [])
+
+    def test_errors(self) -> None:
+        for params, error in [
+            ({"fields": "id,secret"}, "Unknown fields: secret."),
+            ({"ids": "1,x"}, "ids must be comma separated integers."),
+            ({"ids": ",".join(map(str, range(101)))}, "At most 100 ids"),
+            ({"limit": "0"}, "limit must be between 1 and 100."),
+            ({"cursor": "!"}, "Invalid cursor."),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(reverse("api_events"), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(error, response.json()["error"])
+
+        self.assertEqual(self.client.post(reverse("api_events")).status_code, 405)
+        self.client.logout()
+        response = self.client.get(reverse("api_events"))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "Authentication required."})
+
+    def test_tags(self) -> None:
+        Tag.objects.create(name="Bread", slug="bread")
+        data = self.get("api_tags", fields="name,url")["data"]
+        self.assertEqual(
+            data,
+            [
+                {"name": "Bread", "url": reverse("event_list_by_tag", args=["bread"])},
+                {"name": "Soup", "url": reverse("event_list_by_tag", args=["soup"])},
+            ],
+        )
+
+    def test_profiles_and_friendships(self) -> None:
+        friends = [Profile.objects.create(user=guest) for guest in self.guests]
+        self.profile.friends.add(*friends[:2])
+        Friendship.objects.create(from_user=friends[2], to_user=self.profile)
+
+        with self.assertMaxQueries(4):
+            data = self.get("api_profiles", friends="1")["data"]
+        self.assertEqual(
+            [profile["username"] for profile in data], ["guest0", "guest1"]
+        )
+        self.assertEqual(len(self.get("api_profiles")["data"]), 4)
+
+        data = self.get("api_friendships", fields="from_username,to_user")["data"]
+        self.assertEqual(
+            data, [{"from_username": "guest2", "to_user": self.profile.id}]
+        )
+        self.assertEqual(self.get("api_friendships", sent="1")["data"], [])
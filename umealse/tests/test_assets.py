@@ -0,0 +1,161 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from umealse import assets
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "umealse.assets.CompressedManifestStaticFilesStorage"},
+}
+
+
+class CompressedManifestStorageTestCase(SimpleTestCase):
+    """Tests for `collectstatic` with `CompressedManifestStaticFilesStorage`."""
+
+    def setUp(self) -> None:
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_collectstatic(self) -> None:
+        with override_settings(STATIC_ROOT=self.root, STORAGES=STORAGES):
+            call_command("collectstatic", interactive=False, stdout=StringIO())
+            url = staticfiles_storage.url("css/umealse.css")
+        with open(os.path.join(self.root, "staticfiles.json")) as f:
+            hashed = json.load(f)["paths"]["css/umealse.css"]
+        self.assertRegex(hashed, r"^css/umealse\.[0-9a-f]{12}\.css$")
+        self.assertTrue(url.endswith(hashed))
+
+        with open(os.path.join(self.root, hashed), "rb") as f:
+            original = f.read()
+        for name in (hashed, "css/umealse.css"):
+            with open(os.path.join(self.root, name + ".gz"), "rb") as f:
+                compressed = f.read()
+            self.assertEqual(gzip.decompress(compressed), original)
+            self.assertLess(len(compressed), len(original))
+        # Images don't get compressed variants.
+        self.assertFalse(
+            any(
+                name.endswith(".png.gz")
+                for _, _, files in os.walk(self.root)
+                for name in files
+            )
+        )
+
+
+class ServeFileTestCase(SimpleTestCase):
+    """Tests for serving files with `serve_static` and `serve_media`."""
+
+    def setUp(self) -> None:
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.content = b"body { color: red; }\n" * 100
+        os.makedirs(os.path.join(self.root, "css"))
+        for name, data in [
+            ("css/site.0123456789ab.css", self.content),
+            ("css/site.0123456789ab.css.gz", gzip.compress(self.content)),
+            ("photo.jpg", b"\xff\xd8" + bytes(1000)),
+        ]:
+            with open(os.path.join(self.root, name), "wb") as f:
+                f.write(data)
+        self.factory = RequestFactory()
+        settings = override_settings(
+            STATIC_ROOT=self.root, MEDIA_ROOT=self.root, SENDFILE_HEADER=""
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get(self, path: str, view=assets.serve_static, **headers: str):
+        headers = {name.replace("_", "-"): value for name, value in headers.items()}
+        return view(self.factory.get(f"/static/{path}", headers=headers), path)
+
+    def test_full_file(self) -> None:
+        response = self.get("css/site.0123456789ab.css")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Cache-Control"], assets.IMMUTABLE)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_precompressed(self) -> None:
+        response = self.get("css/site.0123456789ab.css", Accept_Encoding="br;q=0, gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)), self.content
+        )
+        self.assertTrue(response["ETag"].endswith('-gzip"'))
+        self.assertNotIn("Content-Disposition", response)
+
+        response = self.get("css/site.0123456789ab.css", Accept_Encoding="gzip;q=0")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_conditional(self) -> None:
+        etag = self.get("css/site.0123456789ab.css")["ETag"]
+        response = self.get("css/site.0123456789ab.css", If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Cache-Control"], assets.IMMUTABLE)
+
+    def test_ranges(self) -> None:
+        size = len(self.content)
+        for header, status, body, content_range in [
+            ("bytes=0-9", 206, self.content[:10], f"bytes 0-9/{size}"),
+            ("bytes=2000-", 206, self.content[2000:], f"bytes 2000-{size - 1}/{size}"),
+            ("bytes=-5", 206, self.content[-5:], f"bytes {size - 5}-{size - 1}/{size}"),
+            ("bytes=0-1,4-5", 200, self.content, None),
+            (f"bytes={size}-", 416, b"", f"bytes */{size}"),
+        ]:
+            with self.subTest(range=header):
+                response = self.get("css/site.0123456789ab.css", Range=header)
+                self.assertEqual(response.status_code, status)
+                content = (
+                    b"".join(response.streaming_content)
+                    if response.streaming
+                    else response.content
+                )
+                self.assertEqual(content, body)
+                self.assertEqual(response.get("Content-Range"), content_range)
+
+        # A range of a file that changed since is answered with all of it.
+        response = self.get(
+            "css/site.0123456789ab.css", Range="bytes=0-9", If_Range='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_media(self) -> None:
+        response = self.get("photo.jpg", view=assets.serve_media)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Cache-Control"], "public, max-age=604800")
+
+    def test_unhashed_static(self) -> None:
+        os.rename(
+            os.path.join(self.root, "css/site.0123456789ab.css"),
+            os.path.join(self.root, "css/site.css"),
+        )
+        response = self.get("css/site.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        self.assertNotIn("Vary", response)
+
+    def test_missing_and_outside_root(self) -> None:
+        for path in ("css/missing.css", "../etc/passwd", "css"):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.get(path)
+
+    def test_sendfile(self) -> None:
+        with override_settings(SENDFILE_HEADER="X-Accel-Redirect"):
+            response = self.get("css/site.0123456789ab.css", Range="bytes=0-9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(
+            response["X-Accel-Redirect"], "/internal/static/css/site.0123456789ab.css"
+        )
+        self.assertEqual(response["Cache-Control"], assets.IMMUTABLE)
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from umealse.models import Event, FriendSuggestion, Friendship, Profile
+
+
+class GenerateDataTestCase(TestCase):
+    """Tests for the `generate_data` management command."""
+
+    def generate(self, **options) -> None:
+        call_command(
+            "generate_data", "--users=60", "--events=80", stdout=StringIO(), **options
+        )
+
+    def test_generates_graph_and_events(self) -> None:
+        self.generate()
+        self.assertEqual(Profile.objects.count(), 60)
+        self.assertEqual(Event.objects.count(), 80)
+        self.assertTrue(Friendship.objects.exists())
+        self.assertTrue(FriendSuggestion.objects.exists())
+        self.assertTrue(Event.objects.filter(tags__name="soup").exists())
+        self.assertTrue(Event.objects.filter(attendees__isnull=False).exists())
+
+        edges = Profile.friends.through.objects
+        self.assertEqual(
+            set(edges.values_list("from_profile", "to_profile")),
+            set(edges.values_list("to_profile", "from_profile")),
+        )
+        degrees = sorted(
+            Profile.objects.annotate(degree=Count("friends")).values_list(
+                "degree", flat=True
+            )
+        )
+        # Preferential attachment grows hubs well above the typical degree.
+        self.assertGreater(degrees[-1], 3 * degrees[len(degrees) // 2])
+
+    def test_is_seeded(self) -> None:
+        self.generate(seed=7, prefix="a")
+        self.generate(seed=7, prefix="b")
+        titles = Event.objects.order_by("id").values_list("title", flat=True)
+        self.assertEqual(list(titles[:80]), list(titles[80:]))
+
+    def test_refuses_existing_prefix(self) -> None:
+        User.objects.create(username="user1")
+        with self.assertRaises(CommandError):
+            self.generate()
+
+
+@override_settings(ALLOWED_HOSTS=["localhost"])
+class BenchmarkViewsTestCase(TestCase):
+    """Tests for the `benchmark_views` management command."""
+
+    def setUp(self) -> None:
+        call_command("generate_data", "--users=20", "--events=30", stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.baseline = os.path.join(directory, "baseline.json")
+
+    def test_save_and_compare_baseline(self) -> None:
+        out = StringIO()
+        call_command(
+            "benchmark_views", "--repeat=3", f"--save={self.baseline}", stdout=out
+        )
+        for page in ("event_list", "event_list_tag", "event_detail", "dashboard"):
+            self.assertIn(page, out.getvalue())
+        with open(self.baseline) as f:
+            baseline = json.load(f)
+        self.assertIn("show_profile", baseline)
+
+        # Loosen timings, so only query counts can regress.
+        for metrics in baseline.values():
+            metrics.update(p50_ms=1e9, p95_ms=1e9, peak_kib=1e9)
+        with open(self.baseline, "w") as f:
+            json.dump(baseline, f)
+        out = StringIO()
+        call_command(
+            "benchmark_views", "--repeat=3", f"--baseline={self.baseline}", stdout=out
+        )
+        self.assertIn("No regressions.", out.getvalue())
+
+        baseline["dashboard"]["queries"] -= 1
+        with open(self.baseline, "w") as f:
+            json.dump(baseline, f)
+        with self.assertRaisesMessage(CommandError, "1 regressions found."):
+            call_command(
+                "benchmark_views",
+                "--repeat=3",
+                f"--baseline={self.baseline}",
+                stdout=StringIO(),
+                stderr=StringIO(),
+            )
+
+
+@override_settings(ALLOWED_HOSTS=["localhost"])
+class BenchmarkServersTestCase(TransactionTestCase):
+    """Tests for the `benchmark_servers` management command."""
+
+    # Replica aliases, if configured, mirror the default database.
+    databases = "__all__"
+
+    def test_both_servers_serve_pages(self) -> None:
+        user = User.objects.create_user(username="testuser", password="testpass")
+        Profile.objects.create(user=user)
+        Event.objects.create(
+            title="Test Event",
+            slug="test-event",
+            host=user,
+            body="Test event",
+            status=Event.Status.PUBLISHED,
+        )
+        out = StringIO()
+        call_command(
+            "benchmark_servers",
+            "testuser",
+            "--requests=6",
+            "--concurrency=2",
+            stdout=out,
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line[:5] for line in lines], ["WSGI:", "ASGI:"])
+        for line in lines:
+            self.assertIn(" 0 non-200 responses", line)
@@ -1,11 +1,31 @@
 import pytest
 import datetime
-from django.test import TestCase, Client
+import threading
+from typing import Tuple
+from unittest import mock
+from django.core.cache import cache
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.core import mail
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.http import HttpResponse
 from django.urls import reverse
+from django.utils.text import slugify
+from django.utils import timezone
 from django.contrib.auth.models import User
-from umealse.models import Event
+from umealse.models import Event, Friendship, Invitation, Profile, TimelineEntry
 from taggit.models import Tag
 
+from umealse import ical, invitations, rsvp
+from umealse.cards import card_cache_key
+from umealse.tests.utils import JobQueueMixin, QueryBudgetMixin
+
 
 class EventListTestCase(TestCase):
     """Tests for event_list endpoint."""
@@ -52,6 +72,83 @@ class EventListTestCase(TestCase):
         self.assertTemplateUsed(response, "event/list.html")
 
 
+class EventListPaginationTestCase(TestCase):
+    """Tests for cursor pagination of event_list endpoint."""
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.tag = Tag.objects.create(name="Test Tag", slug="test-tag")
+        now = timezone.now()
+        for i in range(25):
+            event = Event.objects.create(
+                title=f"Event {i}",
+                slug=f"event-{i}",
+                host=self.user,
+                body="Test event",
+                # Pairs of events share a date to exercise the id tie-breaker.
+                event_date=now + datetime.timedelta(days=i // 2),
+                status=Event.Status.PUBLISHED,
+            )
+            if i % 2:
+                event.tags.add(self.tag)
+        self.expected = list(
+            Event.published.order_by("-event_date", "-id").values_list("id", flat=True)
+        )
+        self.client.login(username="testuser", password="testpass")
+
+    def tearDown(self) -> None:
+        self.user.delete()
+        Event.objects.all().delete()
+
+    @staticmethod
+    def page_ids(response) -> list:
+        return [event.id for event in response.context["events"]]
+
+    def test_walk_forward_and_back(self) -> None:
+        url = reverse("event_list")
+        response = self.client.get(url)
+        pages = [response]
+        while response.context["events"].has_next:
+            cursor = response.context["events"].next_cursor
+            response = self.client.get(url, {"cursor": cursor})
+            pages.append(response)
+
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].context["events"].has_previous)
+        self.assertNotContains(pages[0], "Page 1 of")
+        seen = [event_id for page in pages for event_id in self.page_ids(page)]
+        self.assertEqual(seen, self.expected)
+
+        cursor = pages[-1].context["events"].previous_cursor
+        response = self.client.get(url, {"cursor": cursor})
+        self.assertEqual(self.page_ids(response), self.expected[10:20])
+        self.assertTrue(response.context["events"].has_next)
+
+        cursor = response.context["events"].previous_cursor
+        response = self.client.get(url, {"cursor": cursor})
+        self.assertEqual(self.page_ids(response), self.expected[:10])
+        self.assertFalse(response.context["events"].has_previous)
+
+    def test_invalid_cursor_shows_first_page(self) -> None:
+        response = self.client.get(reverse("event_list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.page_ids(response), self.expected[:10])
+
+    def test_cursor_with_tag(self) -> None:
+        url = reverse("event_list_by_tag", args=[self.tag.slug])
+        tagged = list(
+            Event.published.filter(tags__in=[self.tag])
+            .order_by("-event_date", "-id")
+            .values_list("id", flat=True)
+        )
+        response = self.client.get(url)
+        cursor = response.context["events"].next_cursor
+        response = self.client.get(url, {"cursor": cursor})
+        self.assertEqual(self.page_ids(response), tagged[10:])
+        self.assertFalse(response.context["events"].has_next)
+
+
 class EventDetailTestCase(TestCase):
     """Tests for event_detail endpoint."""
 
@@ -131,3 +228,832 @@ class EventAddTestCase(TestCase):
         self.assertEqual(event.title, "Test Event")
         self.assertEqual(event.host, self.user)
         self.assertEqual(event.attendees.count(), 0)
+
+
+class EventQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Ensure event pages cost the same number of queries however many rows."""
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        guests = [
+            User.objects.create_user(username=f"guest{i}", password="testpass")
+            for i in range(5)
+        ]
+        self.tag = Tag.objects.create(name="Test Tag", slug="test-tag")
+        other_tag = Tag.objects.create(name="Other Tag", slug="other-tag")
+        for i in range(10):
+            event = Event.objects.create(
+                title=f"Event {i}",
+                slug=f"event-{i}",
+                host=guests[i % 5],
+                body="Test event",
+                status=Event.Status.PUBLISHED,
+            )
+            event.tags.add(self.tag, other_tag)
+            event.attendees.add(*guests)
+        self.event = event
+        self.client.login(username="testuser", password="testpass")
+
+    def tearDown(self) -> None:
+        User.objects.all().delete()
+        Event.objects.all().delete()
+
+    def test_event_list_budget(self) -> None:
+        with self.assertMaxQueries(5):
+            response = self.client.get(reverse("event_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "guest4")
+
+    def test_event_list_by_tag_budget(self) -> None:
+        with self.assertMaxQueries(6):
+            response = self.client.get(
+                reverse("event_list_by_tag", args=[self.tag.slug])
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Other Tag")
+
+    def test_event_detail_budget(self) -> None:
+        with self.assertMaxQueries(6):
+            response = self.client.get(reverse("event_detail", args=[self.event.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "guest3")
+
+
+class FriendsFeedTestCase(QueryBudgetMixin, TestCase):
+    """Tests for the friends_feed endpoint and timeline fan-out."""
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profile = Profile.objects.create(user=self.user)
+        self.friend = User.objects.create(username="friend")
+        self.stranger = User.objects.create(username="stranger")
+        friend_profile = Profile.objects.create(user=self.friend)
+        Profile.objects.create(user=self.stranger)
+        self.profile.friends.add(friend_profile)
+        friend_profile.friends.add(self.profile)
+        self.tomorrow = timezone.now() + datetime.timedelta(days=1)
+        self.url = reverse("friends_feed")
+        self.client.login(username="testuser", password="testpass")
+
+    def tearDown(self) -> None:
+        User.objects.all().delete()
+        Event.objects.all().delete()
+
+    def create_event(self, host: User, **kwargs) -> Event:
+        return Event.objects.create(
+            title=f"{host.username} meal",
+            slug="meal",
+            host=host,
+            body="Test event",
+            event_date=kwargs.pop("event_date", self.tomorrow),
+            **kwargs,
+        )
+
+    def feed_titles(self) -> list:
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [entry.event.title for entry in response.context["entries"]]
+
+    def test_feed_lists_friends_events(self) -> None:
+        self.create_event(self.friend)
+        self.create_event(self.stranger)
+        self.create_event(self.user)
+        self.create_event(self.friend, status=Event.Status.DRAFT)
+        self.create_event(
+            self.friend, event_date=timezone.now() - datetime.timedelta(days=1)
+        )
+        self.assertEqual(self.feed_titles(), ["friend meal"])
+
+    def test_feed_lists_events_attended_by_friends(self) -> None:
+        event = self.create_event(self.stranger)
+        event.attendees.add(self.friend)
+        self.assertEqual(self.feed_titles(), ["stranger meal"])
+
+        event.attendees.remove(self.friend)
+        self.assertEqual(self.feed_titles(), [])
+
+    def test_feed_follows_friendships(self) -> None:
+        self.create_event(self.stranger)
+        self.create_event(self.user)
+        request = Friendship.objects.create(
+            from_user=self.stranger.profile, to_user=self.profile
+        )
+        self.client.get(reverse("accept_friend_request", args=[request.id]))
+        self.assertEqual(self.feed_titles(), ["stranger meal"])
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(owner=self.stranger.profile).values_list(
+                    "event__title", flat=True
+                )
+            ),
+            ["testuser meal"],
+        )
+
+        self.client.get(reverse("delete_friend", args=[self.stranger.id]))
+        self.assertEqual(self.feed_titles(), [])
+
+    def test_feed_budget(self) -> None:
+        for i in range(15):
+            self.create_event(
+                self.friend, event_date=self.tomorrow + datetime.timedelta(hours=i)
+            )
+        with self.assertMaxQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context["entries"]), 10)
+        self.assertTrue(response.context["entries"].has_next)
+
+
+class EventSearchTestCase(TestCase):
+    """Tests for event_search endpoint and the full-text index."""
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass", is_staff=True, is_superuser=True
+        )
+        self.pasta = Event.objects.create(
+            title="Pasta night",
+            slug="pasta-night",
+            host=self.user,
+            body="Homemade noodles with tomatoes.",
+        )
+        self.soup = Event.objects.create(
+            title="Soup lunch",
+            slug="soup-lunch",
+            host=self.user,
+            body="Leftover pasta goes into the soup.",
+        )
+        Event.objects.create(
+            title="Pasta draft",
+            slug="pasta-draft",
+            host=self.user,
+            body="Not published yet.",
+            status=Event.Status.DRAFT,
+        )
+        self.url = reverse("event_search")
+        self.client.login(username="testuser", password="testpass")
+
+    def tearDown(self) -> None:
+        self.user.delete()
+        Event.objects.all().delete()
+
+    def search(self, query: str, **params) -> list:
+        response = self.client.get(self.url, {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [event.title for event in response.context["events"]]
+
+    def test_search_ranks_title_above_body(self) -> None:
+        self.assertEqual(self.search("pasta"), ["Pasta night", "Soup lunch"])
+        self.assertEqual(self.search("noodle"), ["Pasta night"])
+        self.assertEqual(self.search("pizza"), [])
+
+    def test_search_follows_updates(self) -> None:
+        self.soup.tags.add("vegan")
+        self.assertEqual(self.search("vegan"), ["Soup lunch"])
+
+        self.soup.tags.clear()
+        self.soup.title = "Vegan soup lunch"
+        self.soup.save()
+        self.assertEqual(self.search("vegan"), ["Vegan soup lunch"])
+
+    def test_search_cursor(self) -> None:
+        for i in range(12):
+            Event.objects.create(
+                title=f"Curry {i}", slug="curry", host=self.user, body="curry"
+            )
+        response = self.client.get(self.url, {"q": "curry"})
+        self.assertContains(response, "q=curry&amp;cursor=")
+        cursor = response.context["events"].next_cursor
+        self.assertEqual(len(self.search("curry", cursor=cursor)), 2)
+
+    def test_admin_search_uses_index(self) -> None:
+        url = reverse("admin:umealse_event_changelist")
+        response = self.client.get(url, {"q": "noodles"})
+        self.assertContains(response, "Pasta night")
+        self.assertNotContains(response, "Soup lunch")
+
+
+class EventCardCacheTestCase(QueryBudgetMixin, TestCase):
+    """Tests for cached rendering of event cards on the list page."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.event = Event.objects.create(
+            title="Test Event", slug="test-event", host=self.user, body="Test event"
+        )
+        self.event.tags.add("soup")
+        self.url = reverse("event_list")
+        self.client.login(username="testuser", password="testpass")
+
+    def tearDown(self) -> None:
+        self.user.delete()
+        Event.objects.all().delete()
+
+    def test_warm_cards_skip_rendering_queries(self) -> None:
+        self.client.get(self.url)
+        with self.assertMaxQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, "soup")
+
+    def test_cards_follow_changes(self) -> None:
+        self.client.get(self.url)
+
+        self.event.tags.add("vegan")
+        self.assertContains(self.client.get(self.url), "vegan")
+
+        self.event.tags.remove("soup")
+        self.assertNotContains(self.client.get(self.url), "soup")
+
+        self.event.title = "Renamed Event"
+        self.event.save()
+        self.assertContains(self.client.get(self.url), "Renamed Event")
+
+    def test_delete_drops_card(self) -> None:
+        self.client.get(self.url)
+        self.event.refresh_from_db()
+        key = card_cache_key(self.event)
+        self.assertIsNotNone(cache.get(key))
+
+        self.event.delete()
+        self.assertIsNone(cache.get(key))
+
+
+class EventConditionalGetTestCase(QueryBudgetMixin, TestCase):
+    """Tests for ETag / Last-Modified handling of event pages."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.guest = User.objects.create(username="guest")
+        self.event = Event.objects.create(
+            title="Test Event", slug="test-event", host=self.user, body="Test event"
+        )
+        self.other = Event.objects.create(
+            title="Other Event", slug="other-event", host=self.user, body="Other"
+        )
+        self.event.tags.add("soup")
+        self.other.tags.add("soup")
+        self.client.login(username="testuser", password="testpass")
+
+    def tearDown(self) -> None:
+        User.objects.all().delete()
+        Event.objects.all().delete()
+
+    def assertNotModified(self, url: str, budget: int = 3) -> None:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+        with self.assertMaxQueries(budget):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def assertModified(self, url: str, etag: str) -> None:
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_event_detail(self) -> None:
+        url = reverse("event_detail", args=[self.event.id])
+        self.assertNotModified(url)
+        etag = self.client.get(url)["ETag"]
+
+        self.event.attendees.add(self.guest)
+        self.assertModified(url, etag)
+        etag = self.client.get(url)["ETag"]
+
+        self.event.tags.add("vegan")
+        self.assertModified(url, etag)
+
+    def test_event_detail_last_modified(self) -> None:
+        url = reverse("event_detail", args=[self.event.id])
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_event_detail_depends_on_user(self) -> None:
+        url = reverse("event_detail", args=[self.event.id])
+        etag = self.client.get(url)["ETag"]
+        User.objects.create_user(username="testuser2", password="testpass")
+        self.client.login(username="testuser2", password="testpass")
+        self.assertModified(url, etag)
+
+    def test_event_detail_depends_on_user_fields(self) -> None:
+        url = reverse("event_detail", args=[self.event.id])
+        self.event.host = self.guest
+        self.event.save()
+        etag = self.client.get(url)["ETag"]
+        self.user.first_name = "Test"
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Hello Test")
+
+    def test_messages_are_not_swallowed(self) -> None:
+        url = reverse("event_detail", args=[self.event.id])
+        self.event.host = self.guest
+        self.event.event_date = timezone.now() + datetime.timedelta(days=1)
+        self.event.capacity = 1
+        self.event.save()
+        self.event.attendees.add(self.guest)
+        etag = self.client.get(url)["ETag"]
+        self.client.post(reverse("join_event", args=[self.event.id]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Sorry, the event is full")
+        # Nor can the page showing them be revalidated later.
+        self.assertNotIn("ETag", response)
+        self.assertNotModified(url)
+
+    def test_event_list(self) -> None:
+        url = reverse("event_list")
+        self.assertNotModified(url)
+        etag = self.client.get(url)["ETag"]
+
+        self.other.delete()
+        self.assertModified(url, etag)
+
+    def test_event_list_by_tag(self) -> None:
+        url = reverse("event_list_by_tag", args=["soup"])
+        self.assertNotModified(url)
+        etag = self.client.get(url)["ETag"]
+
+        self.other.tags.remove("soup")
+        self.assertModified(url, etag)
+
+    def test_removals_are_shared_by_workers(self) -> None:
+        """A worker that didn't see a removal notices it all the same."""
+        url = reverse("event_list_by_tag", args=["soup"])
+        etag = self.client.get(url)["ETag"]
+        self.other.tags.remove("soup")
+        cache.clear()
+        self.assertModified(url, etag)
+
+
+class EventAsyncTestCase(TestCase):
+    """Tests for event pages served by the async request handler."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.event = Event.objects.create(
+            title="Test Event",
+            slug="test-event",
+            host=self.user,
+            body="Test event",
+            status=Event.Status.PUBLISHED,
+        )
+        self.event.tags.add("soup")
+
+    async def test_event_list(self) -> None:
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("event_list"))
+        self.assertContains(response, "Test Event")
+        self.assertContains(response, "Hello testuser")
+
+        response = await self.async_client.get(
+            reverse("event_list"), headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_event_list_by_missing_tag(self) -> None:
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("event_list_by_tag", args=["missing"])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_event_detail(self) -> None:
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("event_detail", args=[self.event.id])
+        )
+        self.assertContains(response, "Test Event")
+
+    async def test_event_detail_requires_login(self) -> None:
+        url = reverse("event_detail", args=[self.event.id])
+        response = await self.async_client.get(url)
+        self.assertRedirects(
+            response, f"/login/?next={url}", fetch_redirect_response=False
+        )
+
+
+class EventCalendarTestCase(TestCase):
+    """Tests for the iCalendar feeds."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.host = User.objects.create_user(username="host", password="testpass")
+        soon = timezone.now() + datetime.timedelta(days=1)
+        self.hosted, self.attended, self.other, self.old, self.draft = [
+            Event.objects.create(
+                title=title,
+                slug=slugify(title),
+                host=host,
+                body="Soup; bread, butter\nand wine",
+                event_date=date,
+                status=status,
+            )
+            for title, host, date, status in [
+                ("Hosted", self.user, soon, Event.Status.PUBLISHED),
+                ("Attended", self.host, soon, Event.Status.PUBLISHED),
+                ("Other", self.host, soon, Event.Status.PUBLISHED),
+                (
+                    "Old",
+                    self.user,
+                    soon - datetime.timedelta(days=60),
+                    Event.Status.PUBLISHED,
+                ),
+                ("Draft", self.user, soon, Event.Status.DRAFT),
+            ]
+        ]
+        self.attended.attendees.add(self.user)
+        self.other.tags.add("soup")
+        self.url = reverse("calendar", args=[ical.calendar_token(self.user)])
+
+    async def get_feed(self, url: str, **headers: str) -> Tuple[HttpResponse, str]:
+        response = await self.async_client.get(url, headers=headers)
+        if response.status_code != 200:
+            return response, ""
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        return response, content.decode()
+
+    async def test_user_feed(self) -> None:
+        response, content = await self.get_feed(self.url)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertTrue(content.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertEqual(content.count("BEGIN:VEVENT"), 2)
+        self.assertIn("SUMMARY:Hosted\r\n", content)
+        self.assertIn("SUMMARY:Attended\r\n", content)
+        self.assertIn("DESCRIPTION:Soup\\; bread\\, butter\\nand wine\r\n", content)
+        self.assertIn(f"URL:http://testserver/event/{self.hosted.id}\r\n", content)
+
+    async def test_tag_feed(self) -> None:
+        url = reverse("calendar_by_tag", args=[ical.calendar_token(self.user), "soup"])
+        _, content = await self.get_feed(url)
+        self.assertEqual(content.count("BEGIN:VEVENT"), 1)
+        self.assertIn("SUMMARY:Other\r\n", content)
+
+        url = reverse("calendar_by_tag", args=[ical.calendar_token(self.user), "tea"])
+        response, _ = await self.get_feed(url)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_forged_token(self) -> None:
+        response, _ = await self.get_feed(
+            reverse("calendar", args=[f"{self.host.pk}:forged"])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_wsgi_feed_is_streamed(self) -> None:
+        """Under WSGI the feed is a sync iterator, not read into a list."""
+        response = self.client.get(self.url)
+        self.assertFalse(response.is_async)
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.count("BEGIN:VEVENT"), 2)
+
+    def test_conditional_get(self) -> None:
+        etag = self.client.get(self.url)["ETag"]
+        # Answered from the aggregate `updated` alone.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            self.url, headers={"if-modified-since": response["Last-Modified"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_leaving_changes_etag(self) -> None:
+        response, _ = await self.get_feed(self.url)
+        # Leaving an event drops it from the feed without bumping others.
+        await self.attended.attendees.aremove(self.user)
+        response, content = await self.get_feed(
+            self.url, if_none_match=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("SUMMARY:Attended", content)
+
+    def test_removals_only_change_affected_feeds(self) -> None:
+        guest = User.objects.create(username="guest")
+        self.other.attendees.add(guest)
+        guest_url = reverse("calendar", args=[ical.calendar_token(guest)])
+        tag_url = reverse("calendar_by_tag", args=[ical.calendar_token(guest), "soup"])
+        self.client.login(username="testuser", password="testpass")
+        etags = {url: self.client.get(url)["ETag"] for url in [guest_url, tag_url]}
+
+        self.attended.attendees.remove(self.user)
+        self.hosted.tags.add("tea")
+        self.hosted.tags.remove("tea")
+        for url, etag in etags.items():
+            response = self.client.get(url, headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 304, url)
+
+        self.other.tags.remove("soup")
+        response = self.client.get(tag_url, headers={"if-none-match": etags[tag_url]})
+        self.assertEqual(response.status_code, 200)
+
+        # Even in a worker whose cache doesn't have it.
+        self.attended.attendees.add(guest)
+        etag = self.client.get(guest_url)["ETag"]
+        self.other.attendees.remove(guest)
+        cache.clear()
+        response = self.client.get(guest_url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_long_lines_are_folded(self) -> None:
+        self.hosted.title = "Żurek " * 30
+        lines = ical.vevent(self.hosted, "http://testserver/", "testserver")
+        for line in lines.split("\r\n"):
+            self.assertLessEqual(len(line.encode()), 75)
+        self.assertIn(f"SUMMARY:{self.hosted.title}\r\n", lines.replace("\r\n ", ""))
+
+
+class EventImportExportTestCase(QueryBudgetMixin, TestCase):
+    """Tests for the `import_events` and `export_events` management commands."""
+
+    def setUp(self) -> None:
+        self.host = User.objects.create_user(username="host", password="testpass")
+        self.guest = User.objects.create_user(username="guest", password="testpass")
+        self.friend = Profile.objects.create(
+            user=User.objects.create_user(username="friend", password="testpass")
+        )
+        self.friend.friends.add(Profile.objects.create(user=self.guest))
+        self.rows = [
+            {
+                "title": f"Soup {i}",
+                "host": "host",
+                "body": "Hot soup",
+                "event_date": (
+                    timezone.now() + datetime.timedelta(days=i + 1)
+                ).isoformat(),
+                "tags": ["soup", f"batch-{i % 2}"],
+                "attendees": ["guest"] if i == 0 else [],
+            }
+            for i in range(5)
+        ]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "events.jsonl")
+
+    def write_rows(self) -> None:
+        with open(self.path, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in self.rows)
+
+    def test_import(self) -> None:
+        self.write_rows()
+        out = StringIO()
+        # A batch takes the same number of queries however many rows it has.
+        with self.assertMaxQueries(14):
+            call_command("import_events", self.path, stdout=out)
+        self.assertIn("Imported 5 events.", out.getvalue())
+
+        events = Event.objects.order_by("event_date")
+        self.assertEqual([e.slug for e in events], [f"soup-{i}" for i in range(5)])
+        self.assertEqual(Event.objects.filter(tags__name="soup").count(), 5)
+        self.assertEqual(Event.objects.filter(tags__name="batch-1").count(), 2)
+        self.assertEqual(list(events[0].attendees.all()), [self.guest])
+        self.assertEqual([e.attendee_count for e in events], [1, 0, 0, 0, 0])
+        self.assertTrue(Event.objects.filter(search_vector="soup").exists())
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list("owner", "event")),
+            [(self.friend.id, events[0].id)],
+        )
+
+    def test_invalid_row_rolls_back_its_batch(self) -> None:
+        self.rows[3]["host"] = "nobody"
+        self.write_rows()
+        with self.assertRaisesMessage(CommandError, "Row 4: unknown user 'nobody'."):
+            call_command(
+                "import_events", self.path, "--batch-size=2", stdout=StringIO()
+            )
+        self.assertEqual(Event.objects.count(), 2)
+
+    def test_attendees_over_capacity(self) -> None:
+        self.rows[0]["capacity"] = 0
+        self.write_rows()
+        with self.assertRaisesMessage(
+            CommandError, "Row 1: 1 attendees exceed capacity 0."
+        ):
+            call_command("import_events", self.path, stdout=StringIO())
+        self.assertFalse(Event.objects.exists())
+
+    def test_location(self) -> None:
+        self.rows[0].update(latitude=63.8258, longitude=20.263)
+        self.rows[1]["latitude"] = 63.8258
+        self.write_rows()
+        with self.assertRaisesMessage(
+            CommandError, "Row 2: give both latitude and longitude."
+        ):
+            call_command("import_events", self.path, stdout=StringIO())
+
+        del self.rows[1]["latitude"]
+        self.write_rows()
+        call_command("import_events", self.path, stdout=StringIO())
+        self.assertEqual(Event.objects.get(slug="soup-0").geohash, "u7q7j55h4p7z")
+        self.assertEqual(Event.objects.filter(geohash__isnull=False).count(), 1)
+
+    def test_round_trip(self) -> None:
+        self.rows[0].update(latitude=63.8258, longitude=20.263)
+        self.write_rows()
+        call_command("import_events", self.path, stdout=StringIO())
+        for format in ("jsonl", "csv"):
+            with self.subTest(format=format):
+                first, second = f"{self.path}.1.{format}", f"{self.path}.2.{format}"
+                call_command(
+                    "export_events", first, "--batch-size=2", stdout=StringIO()
+                )
+                Event.objects.all().delete()
+                call_command("import_events", first, stdout=StringIO())
+                call_command("export_events", second, stdout=StringIO())
+                with open(first) as a, open(second) as b:
+                    self.assertEqual(a.read(), b.read())
+                self.assertEqual(Event.objects.filter(attendees=self.guest).count(), 1)
+
+
+class EventRsvpTestCase(TestCase):
+    """Tests for join_event and leave_event endpoints."""
+
+    def setUp(self) -> None:
+        self.host = User.objects.create_user(username="host", password="testpass")
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.event = Event.objects.create(
+            title="Test Event",
+            slug="test-event",
+            host=self.host,
+            body="Test description",
+            event_date=timezone.now() + datetime.timedelta(days=1),
+            capacity=1,
+        )
+        self.join_url = reverse("join_event", args=[self.event.id])
+        self.leave_url = reverse("leave_event", args=[self.event.id])
+        self.client.login(username="testuser", password="testpass")
+
+    def test_join_and_leave(self) -> None:
+        response = self.client.get(self.join_url)
+        self.assertEqual(response.status_code, 405)
+
+        response = self.client.post(self.join_url, follow=True)
+        self.assertRedirects(response, reverse("event_detail", args=[self.event.id]))
+        self.assertContains(response, "You're attending the event.")
+        self.assertContains(response, "1/1 seats taken")
+        self.assertEqual(list(self.event.attendees.all()), [self.user])
+
+        response = self.client.post(self.join_url, follow=True)
+        self.assertContains(response, "You're attending the event already.")
+
+        response = self.client.post(self.leave_url, follow=True)
+        self.assertContains(response, "You're no longer attending the event.")
+        self.assertContains(response, "0/1 seats taken")
+        self.assertFalse(self.event.attendees.exists())
+
+    def test_join_full_event(self) -> None:
+        self.event.attendees.add(self.host)
+        response = self.client.post(self.join_url, follow=True)
+        self.assertContains(response, "Sorry, the event is full.")
+        self.assertEqual(list(self.event.attendees.all()), [self.host])
+
+    def test_join_own_or_past_event(self) -> None:
+        self.client.login(username="host", password="testpass")
+        response = self.client.post(self.join_url, follow=True)
+        self.assertContains(response, "You're hosting the event.")
+
+        Event.objects.filter(id=self.event.id).update(event_date=timezone.now())
+        self.client.login(username="testuser", password="testpass")
+        response = self.client.post(self.join_url, follow=True)
+        self.assertContains(response, "The event has already taken place.")
+        self.assertNotContains(response, 'value="Join"')
+        self.assertFalse(self.event.attendees.exists())
+
+    def test_join_unpublished_event(self) -> None:
+        Event.objects.filter(id=self.event.id).update(status=Event.Status.DRAFT)
+        response = self.client.post(self.join_url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_attendee_count_follows_attendees(self) -> None:
+        """The count is kept whichever side of the relation changes."""
+        self.event.capacity = None
+        self.event.save()
+        self.event.attendees.add(self.host, self.user)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendee_count, 2)
+
+        self.user.event_set.clear()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendee_count, 1)
+
+        self.event.attendees.clear()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendee_count, 0)
+
+
+class EventRsvpConcurrencyTestCase(TransactionTestCase):
+    """Joining an event from many threads at once doesn't overbook it."""
+
+    databases = "__all__"
+
+    def test_concurrent_joins(self) -> None:
+        host = User.objects.create_user(username="host", password="testpass")
+        users = [
+            User.objects.create_user(username=f"user{i}", password="testpass")
+            for i in range(20)
+        ]
+        event = Event.objects.create(
+            title="Test Event",
+            slug="test-event",
+            host=host,
+            body="Soup",
+            event_date=timezone.now() + datetime.timedelta(days=1),
+            capacity=5,
+        )
+        barrier = threading.Barrier(len(users))
+        results = []
+
+        def join(user: User) -> None:
+            try:
+                barrier.wait()
+                try:
+                    results.append(rsvp.join(event.id, user))
+                except rsvp.EventFull:
+                    results.append(None)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=join, args=[user]) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(results.count(None), 15)
+        event.refresh_from_db()
+        self.assertEqual(event.attendee_count, 5)
+        self.assertEqual(event.attendees.count(), 5)
+
+
+class EventInviteTestCase(JobQueueMixin, QueryBudgetMixin, TestCase):
+    """Tests for invite_to_event endpoint."""
+
+    def setUp(self) -> None:
+        self.host = User.objects.create_user(username="host", password="testpass")
+        profile = Profile.objects.create(user=self.host)
+        self.friends = [
+            Profile.objects.create(
+                user=User.objects.create_user(
+                    username=f"friend{i}", email=f"friend{i}@example.com"
+                )
+            )
+            for i in range(30)
+        ]
+        profile.friends.add(*self.friends)
+        self.event = Event.objects.create(
+            title="Test Event", slug="test-event", host=self.host, body="Soup"
+        )
+        self.url = reverse("invite_to_event", args=[self.event.id])
+        self.client.login(username="host", password="testpass")
+
+    def test_only_host_invites(self) -> None:
+        User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_invite_friends(self) -> None:
+        response = self.client.get(self.url)
+        self.assertContains(response, "friend29")
+
+        response = self.client.post(
+            self.url, {"friends": [self.friends[0].id, self.friends[1].id]}
+        )
+        self.assertEqual(mail.outbox, [])
+        self.run_jobs()
+        self.assertRedirects(response, reverse("event_detail", args=[self.event.id]))
+        self.assertEqual(Invitation.objects.count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ["friend0@example.com"])
+        self.assertIn(f"http://testserver/event/{self.event.id}", mail.outbox[0].body)
+
+        # Everyone else is invited, the first two aren't emailed again.
+        response = self.client.post(self.url, {"everyone": "on"}, follow=True)
+        self.run_jobs()
+        self.assertContains(response, "Invited 28 friends.")
+        self.assertEqual(Invitation.objects.count(), 30)
+        self.assertEqual(len(mail.outbox), 30)
+        self.assertFalse(Invitation.objects.filter(notified__isnull=True).exists())
+
+    def test_invite_nobody(self) -> None:
+        response = self.client.post(self.url, {})
+        self.assertContains(response, "Pick friends to invite.")
+        self.assertFalse(Invitation.objects.exists())
+
+    @mock.patch.object(invitations, "EMAIL_BATCH_SIZE", 10)
+    def test_emails_sent_in_batches(self) -> None:
+        """Inserting and queuing take a query each, emailing a couple per batch."""
+        with self.assertMaxQueries(3):
+            invitations.invite(self.event, self.friends, "http://testserver/")
+        # The event, then a savepoint, select and update per batch of 10.
+        with self.assertMaxQueries(16) as queries:
+            invitations.send_invitations(self.event.id, "http://testserver/")
+        self.assertEqual(len(mail.outbox), 30)
+        self.assertEqual(len([q for q in queries if "SKIP LOCKED" in q["sql"]]), 4)
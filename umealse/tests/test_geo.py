@@ -0,0 +1,148 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+
+from umealse import geo
+from umealse.models import Event
+from umealse.tests.utils import QueryPlanMixin
+
+
+class GeohashTestCase(SimpleTestCase):
+    """Tests for the geohash helpers in `umealse.geo`."""
+
+    def test_encode(self) -> None:
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geo.encode(-25.382708, -49.265506, 7), "6gkzwgj")
+
+    def test_cover(self) -> None:
+        prefixes = geo.cover(63.8258, 20.263, 5)
+        self.assertEqual(len(prefixes), 9)
+        self.assertIn(geo.encode(63.8258, 20.263, len(prefixes[0])), prefixes)
+        # Every point within the radius falls in one of the cells.
+        for dlat, dlon in [(0.04, 0), (-0.04, 0), (0, 0.09), (0, -0.09)]:
+            geohash = geo.encode(63.8258 + dlat, 20.263 + dlon)
+            self.assertTrue(any(geohash.startswith(p) for p in prefixes))
+
+        self.assertLess(len(geo.cover(63.8258, 20.263, 0.5)[0]), 8)
+        self.assertGreater(len(geo.cover(63.8258, 20.263, 0.5)[0]), 4)
+        self.assertEqual(geo.cover(0, 0, 10000), [])
+
+    def test_cover_wraps_around_antimeridian(self) -> None:
+        prefixes = geo.cover(0, 179.99, 5)
+        self.assertTrue(any(p.startswith("8") for p in prefixes))
+        self.assertTrue(any(p.startswith("2") for p in prefixes))
+
+    def test_prefix_filter_bounds(self) -> None:
+        self.assertEqual(geo._successor("u6sc"), "u6sd")
+        self.assertEqual(geo._successor("u6sz"), "u6t")
+        self.assertIsNone(geo._successor("zz"))
+
+
+class EventNearbyTestCase(QueryPlanMixin, TestCase):
+    """Tests for the nearby events search."""
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        soon = timezone.now() + datetime.timedelta(days=1)
+        self.events = {
+            title: Event.objects.create(
+                title=title,
+                slug=slugify(title),
+                host=self.user,
+                body="Soup",
+                event_date=date,
+                latitude=latitude,
+                longitude=longitude,
+            )
+            for title, date, latitude, longitude in [
+                ("Centre", soon, 63.8258, 20.263),
+                ("Campus", soon, 63.8203, 20.3055),
+                ("Airport", soon, 63.7918, 20.2829),
+                ("Stockholm", soon, 59.3293, 18.0686),
+                ("Past", soon - datetime.timedelta(days=2), 63.8258, 20.263),
+                ("Nowhere", soon, None, None),
+            ]
+        }
+
+    def test_save_computes_geohash(self) -> None:
+        event = self.events["Centre"]
+        self.assertEqual(event.geohash, geo.encode(63.8258, 20.263))
+        event.latitude = event.longitude = None
+        event.save(update_fields=["latitude", "longitude"])
+        event.refresh_from_db()
+        self.assertIsNone(event.geohash)
+        self.assertIsNone(self.events["Nowhere"].geohash)
+
+    def test_nearby(self) -> None:
+        events = geo.nearby(Event.objects.all(), 63.8258, 20.263, 5)
+        self.assertEqual(
+            [e.title for e in events], ["Centre", "Past", "Campus", "Airport"]
+        )
+        self.assertAlmostEqual(events[2].distance, 2.17, places=2)
+        events = geo.nearby(Event.objects.all(), 63.8258, 20.263, 2)
+        self.assertEqual([e.title for e in events], ["Centre", "Past"])
+
+    def test_nearby_uses_geohash_index(self) -> None:
+        events = geo.nearby(Event.objects.all(), 63.8258, 20.263, 5)
+        self.assertNoSeqScan(events, ["umealse_event"])
+        indexes = [node.get("Index Name") for node in self.plan_nodes(events)]
+        self.assertIn("event_geohash_idx", indexes)
+
+    def test_view(self) -> None:
+        self.client.login(username="testuser", password="testpass")
+        response = self.client.get(reverse("events_nearby"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["events"])
+
+        url = reverse("events_nearby")
+        params = {"latitude": 63.8258, "longitude": 20.263, "radius": 10}
+        response = self.client.get(url, params)
+        self.assertEqual(
+            [e.title for e in response.context["events"]],
+            ["Centre", "Campus", "Airport"],
+        )
+        self.assertContains(response, "2.2 km away")
+        self.assertNotContains(response, "Stockholm")
+
+    def test_pagination(self) -> None:
+        Event.objects.bulk_create(
+            Event(
+                title=f"Soup {i}",
+                slug=f"soup-{i}",
+                host=self.user,
+                body="Soup",
+                event_date=timezone.now() + datetime.timedelta(days=1),
+                latitude=63.8258 + i / 1000,
+                longitude=20.263,
+                geohash=geo.encode(63.8258 + i / 1000, 20.263),
+            )
+            for i in range(1, 13)
+        )
+        self.client.login(username="testuser", password="testpass")
+        url = reverse("events_nearby")
+        params = {"latitude": 63.8258, "longitude": 20.263, "radius": 2}
+        first = self.client.get(url, params).context["events"]
+        self.assertEqual(len(first), 10)
+        second = self.client.get(url, {**params, "cursor": first.next_cursor})
+        titles = [e.title for e in second.context["events"]]
+        self.assertEqual(titles, ["Soup 10", "Soup 11", "Soup 12"])
+
+
+class BenchmarkNearbyTestCase(TestCase):
+    """Tests for the `benchmark_nearby` management command."""
+
+    def test_rolls_back(self) -> None:
+        out = StringIO()
+        call_command(
+            "benchmark_nearby", "--events=500", "--repeat=3", "--radius=50", stdout=out
+        )
+        self.assertIn("Seeded 500 events", out.getvalue())
+        self.assertIn("geohash", out.getvalue())
+        self.assertIn("full scan", out.getvalue())
+        self.assertFalse(Event.objects.filter(title__startswith="Nearby").exists())
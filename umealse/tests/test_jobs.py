@@ -0,0 +1,172 @@
+import datetime
+from io import StringIO
+from typing import List
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from umealse import jobs, notifications
+from umealse.models import Friendship, Job, Profile
+from umealse.tests.utils import JobQueueMixin
+
+done: List[int] = []
+
+
+def record(value: int) -> None:
+    done.append(value)
+
+
+def explode(value: int) -> None:
+    raise ValueError(value)
+
+
+def take_over(value: int) -> None:
+    """Run so long that the lease expires and another worker claims the job."""
+    Job.objects.update(run_at=timezone.now() - datetime.timedelta(seconds=1))
+    jobs.claim(10)
+    done.append(value)
+
+
+class JobQueueTestCase(TestCase):
+    """Tests for the job queue in `umealse.jobs`."""
+
+    def setUp(self) -> None:
+        done.clear()
+
+    def test_run(self) -> None:
+        jobs.enqueue(record, 1)
+        [job] = jobs.claim(10)
+        self.assertEqual(Job.objects.get().status, Job.Status.RUNNING)
+        self.assertEqual(jobs.claim(10), [])
+
+        self.assertTrue(jobs.run(job))
+        self.assertEqual(done, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delay(self) -> None:
+        jobs.enqueue(record, 1, delay=60)
+        self.assertEqual(jobs.claim(10), [])
+
+    def test_deduplication(self) -> None:
+        jobs.enqueue(record, 1, key="record")
+        jobs.enqueue(record, 2, key="record")
+        self.assertEqual(Job.objects.get().args, [1])
+        jobs.run(jobs.claim(10)[0])
+
+        jobs.enqueue(record, 3, key="record")
+        self.assertEqual(Job.objects.get().args, [3])
+
+    def test_retry_with_backoff(self) -> None:
+        jobs.enqueue(explode, 1, max_attempts=2)
+        self.assertFalse(jobs.run(jobs.claim(10)[0]))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertIn("ValueError: 1", job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(jobs.claim(10), [])
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertFalse(jobs.run(jobs.claim(10)[0]))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertEqual(jobs.claim(10), [])
+        self.assertEqual(
+            jobs.queue_stats(), {"queued": 0, "running": 0, "failed": 1, "due": 0}
+        )
+
+    def test_expired_lease(self) -> None:
+        """Jobs of a worker that died are taken over once their lease expires."""
+        jobs.enqueue(record, 1)
+        jobs.claim(10)
+        Job.objects.update(run_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(len(jobs.claim(10)), 1)
+
+    def test_lease_renewed_on_start(self) -> None:
+        """Jobs waiting in a batch are leased anew when they start."""
+        jobs.enqueue(record, 1)
+        jobs.enqueue(record, 2)
+        first, second = jobs.claim(10)
+        self.assertTrue(jobs.run(first))
+        # The first one took longer than the lease.
+        Job.objects.update(run_at=timezone.now() - datetime.timedelta(seconds=1))
+        [taken] = jobs.claim(10)
+        self.assertEqual(taken.id, second.id)
+
+        # The first worker doesn't run it again, nor touch the new lease.
+        self.assertFalse(jobs.run(second))
+        self.assertEqual(done, [1])
+        self.assertTrue(jobs.run(taken))
+        self.assertEqual(done, [1, 2])
+
+    def test_lost_lease_keeps_job(self) -> None:
+        """A worker whose lease expired mid-run leaves the job to its new owner."""
+        jobs.enqueue(take_over, 1)
+        self.assertTrue(jobs.run(jobs.claim(10)[0]))
+        self.assertEqual(Job.objects.get().status, Job.Status.RUNNING)
+
+
+class FriendRequestNotificationTestCase(JobQueueMixin, TestCase):
+    """Friend request emails are sent through the job queue."""
+
+    def setUp(self) -> None:
+        self.sender = User.objects.create_user(
+            username="sender", email="sender@example.com", password="testpass"
+        )
+        self.addressee = User.objects.create_user(
+            username="addressee", email="addressee@example.com", password="testpass"
+        )
+        Profile.objects.create(user=self.sender)
+        Profile.objects.create(user=self.addressee)
+
+    def test_request_and_accept(self) -> None:
+        self.client.login(username="sender", password="testpass")
+        self.client.get(reverse("send_friend_request", args=[self.addressee.id]))
+        self.assertEqual(mail.outbox, [])
+        self.run_jobs()
+        self.assertEqual(mail.outbox[0].to, ["addressee@example.com"])
+        self.assertEqual(mail.outbox[0].subject, "sender wants to be your friend")
+
+        self.client.login(username="addressee", password="testpass")
+        friendship = Friendship.objects.get()
+        self.client.get(reverse("accept_friend_request", args=[friendship.id]))
+        self.run_jobs()
+        self.assertEqual(mail.outbox[1].to, ["sender@example.com"])
+        self.assertEqual(
+            mail.outbox[1].subject, "addressee accepted your friend request"
+        )
+
+    def test_withdrawn_request(self) -> None:
+        friendship = Friendship.objects.create(
+            from_user=self.sender.profile, to_user=self.addressee.profile
+        )
+        jobs.enqueue(notifications.friend_request_sent, friendship.id)
+        friendship.delete()
+        self.run_jobs()
+        self.assertEqual(mail.outbox, [])
+
+
+class RunJobsCommandTestCase(TransactionTestCase):
+    """Tests for the `run_jobs` management command."""
+
+    databases = "__all__"
+
+    def setUp(self) -> None:
+        done.clear()
+
+    def test_drain(self) -> None:
+        for value in range(50):
+            jobs.enqueue(record, value)
+        jobs.enqueue(explode, 0, max_attempts=1)
+        out = StringIO()
+        call_command(
+            "run_jobs", "--concurrency=4", "--batch-size=5", "--drain", stdout=out
+        )
+        # Every job ran exactly once, whichever thread claimed it.
+        self.assertEqual(sorted(done), list(range(50)))
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+        self.assertIn("51 jobs (1 failed)", out.getvalue())
+        self.assertIn("0 due, 0 queued, 0 running, 1 failed", out.getvalue())
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import select
+from typing import Any, Dict, List
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from umealse import live, social
+from umealse.live import Message
+from umealse.models import Event, Profile
+
+
+class BrokerTestCase(SimpleTestCase):
+    """Tests for `LocalBroker` and its subscriptions."""
+
+    async def test_publish(self) -> None:
+        broker = live.LocalBroker()
+        subscription = broker.subscribe(["event:1", "profile:2"])
+        self.assertTrue(broker.has_subscribers("event:1"))
+        self.assertFalse(broker.has_subscribers("event:2"))
+        broker.publish("event:1", {"type": "attendees"})
+        broker.publish("event:2", {"type": "other"})
+        broker.publish("profile:2", {"type": "friend_request"})
+        self.assertEqual(await subscription.next(1), {"type": "attendees"})
+        self.assertEqual(await subscription.next(1), {"type": "friend_request"})
+        self.assertIsNone(await subscription.next(0.01))
+
+        broker.unsubscribe(subscription)
+        self.assertEqual(broker.subscriber_count(), 0)
+        self.assertFalse(broker.has_subscribers("event:1"))
+        broker.publish("event:1", {"type": "attendees"})
+        self.assertIsNone(await subscription.next(0.01))
+
+    @override_settings(LIVE_QUEUE_SIZE=2)
+    async def test_overflow(self) -> None:
+        """A subscriber falling behind loses its subscription."""
+        broker = live.LocalBroker()
+        slow = broker.subscribe(["event:1"])
+        for i in range(3):
+            broker.publish("event:1", {"type": "attendees", "i": i})
+        await asyncio.sleep(0)
+        with self.assertRaises(live.SubscriptionLost):
+            await slow.next(1)
+
+        closed = broker.subscribe(["event:1"])
+        closed.put(None)
+        with self.assertRaises(live.SubscriptionLost):
+            await closed.next(1)
+
+
+class PostgresBrokerTestCase(TransactionTestCase):
+    """Tests for relaying messages with `PostgresBroker`."""
+
+    def notifications(self, *messages: Message) -> List[str]:
+        """Payloads of messages published while listening on a connection."""
+        wrapper = connections["default"]
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {live.PostgresBroker.CHANNEL}")
+            for message in messages:
+                live.PostgresBroker().publish("event:1", message)
+            while len(conn.notifies) < len(messages) and select.select(
+                [conn], [], [], 5
+            ) != ([], [], []):
+                conn.poll()
+            return [notify.payload for notify in conn.notifies]
+        finally:
+            conn.close()
+
+    async def test_relay(self) -> None:
+        broker = live.PostgresBroker()
+        message = {"type": "attendees", "joined": ["guest"]}
+        huge = {"type": "attendees", "joined": ["guest"] * 2000}
+        payloads = await sync_to_async(self.notifications)(message, huge)
+        self.assertEqual(len(payloads), 2)
+        self.assertTrue(all(len(p.encode()) <= broker.MAX_PAYLOAD for p in payloads))
+
+        # Relay them as the listening thread would, without starting it.
+        subscription = live.LocalBroker.subscribe(broker, ["event:1"])
+        for payload in payloads:
+            broker._relay(payload)
+        self.assertEqual(await subscription.next(1), message)
+        self.assertEqual(
+            await subscription.next(1), {"type": "attendees", "reload": True}
+        )
+
+
+class PublishTestCase(TestCase):
+    """Tests for changes published to live channels."""
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profile = Profile.objects.create(user=self.user)
+        self.guest = User.objects.create(username="guest")
+        self.guest_profile = Profile.objects.create(user=self.guest)
+        self.event = Event.objects.create(
+            title="Test Event", slug="test-event", host=self.user, body="Soup"
+        )
+        patcher = mock.patch("umealse.live.broker")
+        self.broker = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def published(self) -> List[Any]:
+        calls = [call.args for call in self.broker.publish.call_args_list]
+        self.broker.reset_mock()
+        return calls
+
+    def test_attendees(self) -> None:
+        channel = live.event_channel(self.event.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.attendees.add(self.guest, self.user)
+        self.assertEqual(
+            self.published(),
+            [
+                (
+                    channel,
+                    {
+                        "type": "attendees",
+                        "joined": ["guest", "testuser"],
+                        "left": [],
+                        "cleared": False,
+                        "attendee_count": 2,
+                    },
+                )
+            ],
+        )
+
+        # The signal knows the username of a user leaving events.
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.guest.event_set.remove(self.event)
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        [(_, message)] = self.published()
+        self.assertEqual(message["left"], ["guest"])
+        self.assertEqual(message["attendee_count"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.attendees.clear()
+        [(_, message)] = self.published()
+        self.assertTrue(message["cleared"])
+        self.assertEqual(message["attendee_count"], 0)
+
+        # Nothing is published before the transaction commits.
+        with self.captureOnCommitCallbacks():
+            self.event.attendees.add(self.guest)
+        self.assertEqual(self.published(), [])
+
+    def test_unfollowed(self) -> None:
+        """Nothing is looked up or published for pages nobody follows."""
+        self.broker.has_subscribers.return_value = False
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.event.attendees.add(self.guest)
+            social.request_friendship(self.guest_profile, self.profile)
+        with self.assertNumQueries(0):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.published(), [])
+
+    def test_friendships(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship = social.request_friendship(self.guest_profile, self.profile)
+        self.assertEqual(
+            self.published(),
+            [
+                (
+                    live.profile_channel(self.profile.id),
+                    {
+                        "type": "friend_request",
+                        "id": friendship.id,
+                        "username": "guest",
+                    },
+                )
+            ],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            social.accept_requests(self.profile)
+        self.assertEqual(
+            self.published(),
+            [
+                (
+                    live.profile_channel(self.guest_profile.id),
+                    {"type": "friend_accepted", "username": "testuser"},
+                )
+            ],
+        )
+
+    def test_pages_subscribe(self) -> None:
+        self.client.login(username="testuser", password="testpass")
+        response = self.client.get(self.event.get_absolute_url())
+        self.assertContains(response, f'data-live-url="/live/?event={self.event.id}"')
+        self.assertContains(response, 'id="attendee-count"')
+        response = self.client.get(reverse("dashboard"))
+        self.assertContains(response, 'data-live-url="/live/"')
+        self.assertContains(response, 'id="friend-requests"')
+
+
+class LiveUpdatesAppTestCase(TransactionTestCase):
+    """Tests for streaming live updates with `LiveUpdatesApp`."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.profile = Profile.objects.create(user=self.user)
+        self.event = Event.objects.create(
+            title="Test Event", slug="test-event", host=self.user, body="Soup"
+        )
+        self.client.login(username="testuser", password="testpass")
+        self.cookie = (
+            f"{settings.SESSION_COOKIE_NAME}="
+            f"{self.client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        )
+        self.passed_on: List[Dict] = []
+
+        async def django_app(scope: Dict, receive: Any, send: Any) -> None:
+            self.passed_on.append(scope)
+
+        self.app = live.LiveUpdatesApp(django_app)
+
+    def scope(self, query: str = "", cookie: str = "", **extra: Any) -> Dict:
+        return {
+            "type": "http",
+            "method": "GET",
+            "path": "/live/",
+            "query_string": query.encode(),
+            "headers": [(b"cookie", cookie.encode())] if cookie else [],
+            **extra,
+        }
+
+    async def call(self, scope: Dict) -> List[Dict]:
+        sent: List[Dict] = []
+
+        async def receive() -> Dict:
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict) -> None:
+            sent.append(message)
+
+        await asyncio.wait_for(self.app(scope, receive, send), 5)
+        return sent
+
+    @override_settings(LIVE_HEARTBEAT_SECONDS=0.2)
+    async def test_stream(self) -> None:
+        disconnected = asyncio.Event()
+        sent: asyncio.Queue = asyncio.Queue()
+
+        async def receive() -> Dict:
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        app = asyncio.ensure_future(
+            self.app(
+                self.scope(f"event={self.event.id}", self.cookie),
+                receive,
+                sent.put,
+            )
+        )
+
+        async def body() -> bytes:
+            while True:
+                message = await asyncio.wait_for(sent.get(), 5)
+                if message["body"] != b": ping\n\n":
+                    return message["body"]
+
+        start = await asyncio.wait_for(sent.get(), 5)
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        self.assertEqual(await body(), f"retry: {live.RETRY_MS}\n\n".encode())
+
+        message = {"type": "attendees", "attendee_count": 1}
+        live.broker().publish(live.event_channel(self.event.id), message)
+        live.broker().publish(live.event_channel(0), {"type": "attendees"})
+        live.broker().publish(
+            live.profile_channel(self.profile.id), {"type": "friend_request"}
+        )
+        data = json.dumps(message, separators=(",", ":"))
+        self.assertEqual(await body(), f"event: attendees\ndata: {data}\n\n".encode())
+        self.assertTrue((await body()).startswith(b"event: friend_request\n"))
+        # Idle connections get a comment now and then.
+        message = await asyncio.wait_for(sent.get(), 5)
+        self.assertEqual(message["body"], b": ping\n\n")
+
+        disconnected.set()
+        await asyncio.wait_for(app, 5)
+        self.assertEqual(live.broker().subscriber_count(), 0)
+
+    async def test_refused(self) -> None:
+        for scope in (self.scope(), self.scope(cookie="sessionid=invalid")):
+            with self.subTest(headers=scope["headers"]):
+                sent = await self.call(scope)
+                self.assertEqual(sent[0]["status"], 204)
+        sent = await self.call(self.scope(cookie=self.cookie, method="POST"))
+        self.assertEqual(sent[0]["status"], 405)
+
+    async def test_other_paths(self) -> None:
+        await self.call(self.scope(path="/events/"))
+        await self.call({"type": "lifespan"})
+        self.assertEqual(
+            [scope.get("path") for scope in self.passed_on], ["/events/", None]
+        )
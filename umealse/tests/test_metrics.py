@@ -0,0 +1,85 @@
+import re
+
+from django.contrib.auth.models import User
+from django.test import TestCase, modify_settings, override_settings
+from django.urls import reverse
+
+from umealse.metrics import Histogram, _percentile, registry
+from umealse.models import Event
+
+
+@modify_settings(MIDDLEWARE={"prepend": "umealse.middleware.RequestMetricsMiddleware"})
+class RequestMetricsTestCase(TestCase):
+    """Tests for `RequestMetricsMiddleware` and the `request_metrics` view."""
+
+    def setUp(self) -> None:
+        registry.histograms.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        Event.objects.create(
+            title="Test Event", slug="test-event", host=self.user, body="Test"
+        )
+        self.client.login(username="testuser", password="testpass")
+
+    def test_server_timing(self) -> None:
+        response = self.client.get(reverse("event_list"))
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "tpl;dur=", "view;dur=", "total;dur="):
+            self.assertIn(metric, timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+        self.assertNotIn("tpl;dur=0.0", timing)
+
+    def test_histograms(self) -> None:
+        for _ in range(3):
+            self.client.get(reverse("event_list"))
+        self.client.get(reverse("dashboard"))
+
+        stats = registry.snapshot()
+        self.assertEqual(stats["event_list"]["count"], 3)
+        self.assertEqual(stats["dashboard"]["count"], 1)
+        self.assertGreater(stats["event_list"]["queries_mean"], 0)
+        self.assertEqual(sum(stats["event_list"]["buckets"].values()), 3)
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_requests_are_logged(self) -> None:
+        with self.assertLogs("umealse.metrics", "WARNING") as logs:
+            self.client.get(reverse("event_list"))
+        self.assertIn("Slow request /events/", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    def test_metrics_endpoint_is_staff_only(self) -> None:
+        url = reverse("request_metrics")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse("event_list"))
+        self.assertEqual(self.client.get(url).json()["event_list"]["count"], 1)
+        response = self.client.get(url, {"format": "prometheus"})
+        self.assertContains(
+            response,
+            'umealse_request_duration_seconds_count{view="event_list"} 1',
+        )
+        # Every sample belongs to a declared metric, or parsers leave it untyped.
+        lines = response.content.decode().splitlines()
+        types = {line.split()[2] for line in lines if line.startswith("# TYPE")}
+        for line in lines:
+            if not line.startswith("#"):
+                name = line.split("{")[0]
+                family = re.sub(r"_(bucket|sum|count)$", "", name)
+                self.assertTrue({name, family} & types, line)
+
+
+class HistogramTestCase(TestCase):
+    """Tests for the rolling window of request histograms."""
+
+    def test_old_requests_leave_the_window(self) -> None:
+        histogram = Histogram(window=300)
+        histogram.observe(40, 5, 2, now=1000)
+        histogram.observe(8000, 5, 2, now=1100)
+        recent = histogram.recent(now=1100)
+        self.assertEqual(recent.count, 2)
+        self.assertEqual((_percentile(recent, 0.5), _percentile(recent, 1)), (50, None))
+
+        self.assertEqual(histogram.recent(now=1350).count, 1)
+        self.assertEqual(histogram.recent(now=1500).count, 0)
+        self.assertEqual(histogram.total.count, 2)
@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.utils import timezone
+from taggit.models import Tag
+
+from umealse.models import Event, Profile, TimelineEntry
+from umealse.pagination import KeysetPaginator
+from umealse.search import search_events
+from umealse.social import SocialGraph
+from umealse.tests.utils import QueryPlanMixin
+
+EVENT_TABLES = ["umealse_event", "taggit_taggeditem"]
+
+
+class QueryPlanTestCase(QueryPlanMixin, TestCase):
+    """Key querysets keep using indexes over a generated dataset."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        call_command("generate_data", "--users=300", "--events=3000", stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        tags = Tag.objects.annotate(uses=Count("taggit_taggeditem_items"))
+        cls.popular_tag = tags.order_by("-uses").first()
+        cls.rare_tag = tags.order_by("uses").first()
+        cls.profile = (
+            Profile.objects.annotate(degree=Count("friends"))
+            .order_by("-degree")
+            .first()
+        )
+
+    def test_event_list(self) -> None:
+        paginator = KeysetPaginator(Event.published.select_related("host"), 10)
+        first, _, _ = paginator._query(None)
+        self.assertNoSeqScan(first, EVENT_TABLES, ordered=True)
+
+        second, _, _ = paginator._query(paginator.page().next_cursor)
+        self.assertNoSeqScan(second, EVENT_TABLES, ordered=True)
+
+    def test_event_list_by_tag(self) -> None:
+        # Sorting the few events of a rare tag is cheaper than walking the
+        # date index, so only a popular tag has to be read in order.
+        for tag, ordered in ((self.popular_tag, True), (self.rare_tag, False)):
+            with self.subTest(tag=tag.name):
+                events = Event.published.select_related("host").filter(tags__in=[tag])
+                first, _, _ = KeysetPaginator(events, 10)._query(None)
+                self.assertNoSeqScan(first, EVENT_TABLES, ordered=ordered)
+
+    def test_event_detail(self) -> None:
+        event = Event.published.first()
+        self.assertNoSeqScan(
+            Event.published.with_detail_relations().filter(id=event.id),
+            EVENT_TABLES,
+        )
+
+    def test_upcoming_events(self) -> None:
+        self.assertNoSeqScan(
+            Event.published.filter(event_date__gte=timezone.now()).values_list(
+                "id", "event_date"
+            ),
+            EVENT_TABLES,
+        )
+
+    def test_search(self) -> None:
+        self.assertNoSeqScan(
+            search_events(Event.published.all(), "soup").order_by("-rank", "-id")[:11],
+            EVENT_TABLES,
+        )
+
+    def test_friends_feed(self) -> None:
+        entries = TimelineEntry.objects.filter(
+            owner=self.profile, event_date__gte=timezone.now()
+        ).select_related("event__host")
+        paginator = KeysetPaginator(entries, 10, ordering=("event_date", "event_id"))
+        first, _, _ = paginator._query(None)
+        self.assertNoSeqScan(first, ["umealse_timelineentry"], ordered=True)
+
+    def test_friend_suggestions(self) -> None:
+        graph = SocialGraph.__new__(SocialGraph)
+        graph.profile = self.profile
+        self.assertNoSeqScan(
+            graph._suggestions_query(), ["umealse_friendsuggestion"], ordered=True
+        )
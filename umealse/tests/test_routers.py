@@ -0,0 +1,58 @@
+import time
+
+from django.db import router
+from django.http import HttpRequest, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from umealse.middleware import ReplicaPinningMiddleware
+from umealse.models import Event
+from umealse.routers import use_primary
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTestCase(SimpleTestCase):
+    """Tests for routing reads to replicas while keeping read-your-writes."""
+
+    def setUp(self) -> None:
+        self.factory = RequestFactory()
+
+    def view(self, write: bool = False):
+        """A view answering with the alias its reads go to."""
+
+        def view(request: HttpRequest) -> HttpResponse:
+            if write:
+                # What saving or updating an event asks the router first.
+                router.db_for_write(Event)
+            return HttpResponse(Event.objects.all().db)
+
+        return ReplicaPinningMiddleware(view)
+
+    def test_reads_go_to_replicas(self) -> None:
+        self.assertEqual(Event.objects.all().db, "replica1")
+        response = self.view()(self.factory.get("/"))
+        self.assertEqual(response.content, b"replica1")
+        self.assertNotIn("primary_until", response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self) -> None:
+        self.assertEqual(Event.objects.all().db, "default")
+
+    def test_writes_pin_client_to_primary(self) -> None:
+        response = self.view(write=True)(self.factory.get("/"))
+        cookie = response.cookies["primary_until"]
+        self.assertEqual(cookie["max-age"], 5)
+
+        request = self.factory.get("/")
+        request.COOKIES["primary_until"] = cookie.value
+        self.assertEqual(self.view()(request).content, b"default")
+
+        request.COOKIES["primary_until"] = str(time.time() - 1)
+        self.assertEqual(self.view()(request).content, b"replica1")
+
+    def test_unsafe_methods_read_from_primary(self) -> None:
+        self.assertEqual(self.view()(self.factory.post("/")).content, b"default")
+
+    def test_use_primary(self) -> None:
+        with use_primary():
+            self.assertEqual(Event.objects.all().db, "default")
+        self.assertEqual(Event.objects.all().db, "replica1")
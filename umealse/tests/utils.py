@@ -0,0 +1,81 @@
+import json
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.query import QuerySet
+from django.test.utils import CaptureQueriesContext
+
+from umealse import jobs
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting that a block stays within a query budget."""
+
+    @contextmanager
+    def assertMaxQueries(
+        self, budget: int, using: str = DEFAULT_DB_ALIAS
+    ) -> Iterator[CaptureQueriesContext]:
+        """Fail if more than `budget` queries are executed inside the block."""
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = "\n".join(
+                f"{i}. {query['sql']}"
+                for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(  # type: ignore[attr-defined]
+                f"{executed} queries executed, budget is {budget}:\n{queries}"
+            )
+
+
+class QueryPlanMixin:
+    """TestCase mixin asserting on PostgreSQL plans of querysets."""
+
+    def plan_nodes(self, queryset: QuerySet) -> List[Dict[str, Any]]:
+        """All nodes of the plan `EXPLAIN` picks for queryset, outermost first.
+
+        Sequential scans are disabled, so small test tables can't make them
+        the cheapest plan; one left in the plan means no index fits.
+        """
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        nodes = []
+        pending = [json.loads(queryset.explain(format="json"))[0]["Plan"]]
+        while pending:
+            node = pending.pop(0)
+            nodes.append(node)
+            pending.extend(node.get("Plans", []))
+        return nodes
+
+    def assertNoSeqScan(
+        self, queryset: QuerySet, tables: Sequence[str], ordered: bool = False
+    ) -> None:
+        """Fail if any of tables is read by a sequential scan.
+
+        With `ordered`, also fail if rows have to be sorted, i.e. the order
+        doesn't come from an index.
+        """
+        nodes = self.plan_nodes(queryset)
+        plan = queryset.explain()
+        for node in nodes:
+            if node["Node Type"] == "Seq Scan" and node["Relation Name"] in tables:
+                self.fail(  # type: ignore[attr-defined]
+                    f"Sequential scan on {node['Relation Name']}:\n{plan}"
+                )
+            if ordered and node["Node Type"] in ("Sort", "Incremental Sort"):
+                self.fail(f"Rows are sorted:\n{plan}")  # type: ignore[attr-defined]
+
+
+class JobQueueMixin:
+    """TestCase mixin running queued jobs, as a `run_jobs` worker would."""
+
+    def run_jobs(self) -> None:
+        while True:
+            claimed = jobs.claim(100)
+            if not claimed:
+                return
+            for job in claimed:
+                self.assertTrue(jobs.run(job))  # type: ignore[attr-defined]
@@ -0,0 +1,127 @@
+"""Fan-out-on-write maintenance of the friends feed.
+
+A profile's timeline holds upcoming published events hosted or attended by
+any of its friends. Entries are written when an event or its attendees
+change and when friendships are created or removed, so that reading the feed
+never has to walk the friends graph.
+"""
+from itertools import chain
+from typing import Collection, List, Sequence
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from .models import Event, Profile, TimelineEntry
+
+Edge = Profile.friends.through
+
+
+def sync_event(event: Event) -> None:
+    """Fan an event out to friends of its host and attendees."""
+    entries = TimelineEntry.objects.filter(event_id=event.id)
+    if event.status != Event.Status.PUBLISHED or event.event_date < timezone.now():
+        entries.delete()
+        return
+
+    audience = list(
+        Edge.objects.filter(
+            Q(to_profile__user_id=event.host_id) | Q(to_profile__user__event=event)
+        )
+        .exclude(from_profile__user_id=event.host_id)
+        .values_list("from_profile_id", flat=True)
+        .distinct()
+    )
+    with transaction.atomic():
+        entries.exclude(owner_id__in=audience).delete()
+        entries.exclude(event_date=event.event_date).update(event_date=event.event_date)
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    owner_id=owner_id, event=event, event_date=event.event_date
+                )
+                for owner_id in audience
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def fan_out_new(events: Sequence[Event]) -> None:
+    """Fan out freshly created events (e.g. bulk imported) in a few queries.
+
+    Unlike `sync_event` it doesn't look for stale entries, as new events have
+    none yet.
+    """
+    now = timezone.now()
+    upcoming = {
+        event.id: event
+        for event in events
+        if event.status == Event.Status.PUBLISHED and event.event_date >= now
+    }
+    if not upcoming:
+        return
+    by_host = Edge.objects.filter(to_profile__user__events__in=upcoming).values_list(
+        "from_profile_id", "from_profile__user_id", "to_profile__user__events"
+    )
+    by_attendee = Edge.objects.filter(to_profile__user__event__in=upcoming).values_list(
+        "from_profile_id", "from_profile__user_id", "to_profile__user__event"
+    )
+    entries = [
+        TimelineEntry(
+            owner_id=owner_id,
+            event_id=event_id,
+            event_date=upcoming[event_id].event_date,
+        )
+        for owner_id, user_id, event_id in chain(by_host, by_attendee)
+        if user_id != upcoming[event_id].host_id
+    ]
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True, batch_size=1000)
+
+
+def add_friends(profile_id: int, friend_ids: Collection[int]) -> None:
+    """Backfill timelines after profile became friends with each of friend_ids."""
+    if not friend_ids:
+        return
+    upcoming = Event.published.filter(event_date__gte=timezone.now())
+    theirs = (
+        upcoming.filter(
+            Q(host__profile__in=friend_ids) | Q(attendees__profile__in=friend_ids)
+        )
+        .exclude(host__profile=profile_id)
+        .values_list("id", "event_date")
+        .distinct()
+    )
+    mine = (
+        upcoming.filter(Q(host__profile=profile_id) | Q(attendees__profile=profile_id))
+        .values_list("id", "event_date", "host__profile")
+        .distinct()
+    )
+
+    entries: List[TimelineEntry] = [
+        TimelineEntry(owner_id=profile_id, event_id=event_id, event_date=event_date)
+        for event_id, event_date in theirs
+    ]
+    for event_id, event_date, host_profile_id in mine:
+        entries.extend(
+            TimelineEntry(owner_id=friend_id, event_id=event_id, event_date=event_date)
+            for friend_id in friend_ids
+            if friend_id != host_profile_id
+        )
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True, batch_size=1000)
+
+
+def remove_friends(profile_id: int, friend_ids: Collection[int]) -> None:
+    """Drop entries that were only there because of the removed friendships."""
+    if not friend_ids:
+        return
+    prune(TimelineEntry.objects.filter(owner_id__in=[profile_id, *friend_ids]))
+
+
+def prune(entries: QuerySet) -> None:
+    """Delete entries whose owner is no longer friends with host or attendees."""
+    justified = Edge.objects.filter(from_profile_id=OuterRef("owner_id")).filter(
+        Q(to_profile__user__events=OuterRef("event_id"))
+        | Q(to_profile__user__event=OuterRef("event_id"))
+    )
+    entries.exclude(Exists(justified)).delete()
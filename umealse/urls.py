@@ -1,5 +1,5 @@
 from django.urls import path, include
-from . import views
+from . import api, views
 
 
 urlpatterns = [
@@ -24,11 +24,35 @@ urlpatterns = [
         views.reject_friend_request,
         name="reject_friend_request",
     ),
+    path(
+        "accept_friends",
+        views.accept_all_friend_requests,
+        name="accept_all_friend_requests",
+    ),
     path("delete_friend/<int:userID>", views.delete_friend, name="delete_friend"),
     # events urls
     path("events/", views.event_list, name="event_list"),
     path("events/add", views.add_event, name="add_event"),
+    path("events/search", views.event_search, name="event_search"),
+    path("events/nearby", views.events_nearby, name="events_nearby"),
+    path("feed/", views.friends_feed, name="friends_feed"),
     path("tag/<slug:tag_slug>/", views.event_list, name="event_list_by_tag"),
     path("event/<int:id>", views.event_detail, name="event_detail"),
-    path("event/<int:id>", views.invite_to_event, name="invite_to_event"),
+    path("event/<int:id>/invite", views.invite_to_event, name="invite_to_event"),
+    path("event/<int:id>/join", views.join_event, name="join_event"),
+    path("event/<int:id>/leave", views.leave_event, name="leave_event"),
+    # calendar feeds
+    path("calendar/<str:token>.ics", views.calendar_feed, name="calendar"),
+    path(
+        "calendar/<str:token>/tag/<slug:tag_slug>.ics",
+        views.calendar_feed,
+        name="calendar_by_tag",
+    ),
+    # JSON API
+    path("api/v1/events", api.events, name="api_events"),
+    path("api/v1/tags", api.tags, name="api_tags"),
+    path("api/v1/profiles", api.profiles, name="api_profiles"),
+    path("api/v1/friendships", api.friendships, name="api_friendships"),
+    # monitoring
+    path("metrics/", views.request_metrics, name="request_metrics"),
 ]
@@ -1,14 +1,61 @@
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
+from django.template.defaultfilters import pluralize
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
 from django.utils.text import slugify
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
 from taggit.models import Tag
 
-from .forms import EventAddForm, ProfileEditForm, UserEditForm, UserRegistrationForm
-from .models import Event, Friendship, Profile
+from .forms import (
+    EventAddForm,
+    InviteForm,
+    NearbyForm,
+    ProfileEditForm,
+    UserEditForm,
+    UserRegistrationForm,
+)
+from . import geo, invitations, notifications, rsvp, social
+from .cards import arender_cards, render_cards
+from .conditional import (
+    calendar_validators,
+    conditional_page,
+    event_detail_validators,
+    event_list_validators,
+)
+from .ical import (
+    astream_calendar,
+    calendar_token,
+    feed_events,
+    stream_calendar,
+    token_user_id,
+    window,
+)
+from .images import process_profile_photo
+from .jobs import enqueue
+from .metrics import registry
+from .models import Event, Profile, TimelineEntry
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import search_events
+
+
+async def _pin_user(request: HttpRequest) -> None:
+    """Resolve `request.user` up front, so templates can use it in async views."""
+    request.user = await request.auser()  # type: ignore[attr-defined]
 
 
 def landing_page(request: HttpRequest) -> HttpResponse:
@@ -17,37 +64,166 @@ def landing_page(request: HttpRequest) -> HttpResponse:
 
 
 @login_required
-def event_list(request: HttpRequest, tag_slug: str = "") -> HttpResponse:
+@cache_control(private=True, no_cache=True)
+@conditional_page(event_list_validators)
+async def event_list(request: HttpRequest, tag_slug: str = "") -> HttpResponse:
     """Generate view enlisting all published events."""
-    events = Event.published.all()
-    tag = None
+    await _pin_user(request)
+    events = Event.published.select_related("host")
+    tag = calendar_url = None
     if tag_slug:
-        tag = get_object_or_404(Tag, slug=tag_slug)
+        tag = await aget_object_or_404(Tag, slug=tag_slug)
         events = events.filter(tags__in=[tag])
+        calendar_url = request.build_absolute_uri(
+            reverse("calendar_by_tag", args=[calendar_token(request.user), tag_slug])
+        )
 
-    paginator = Paginator(events, 10)
-    page_number = request.GET.get("page", 1)
+    paginator = KeysetPaginator(events, 10, ordering=("-event_date", "-id"))
 
     try:
-        events = paginator.page(page_number)
-    except PageNotAnInteger:
-        events = paginator.page(1)
-    except EmptyPage:
-        events = paginator.page(paginator.num_pages)
+        events = await paginator.apage(request.GET.get("cursor"))
+    except InvalidCursor:
+        events = await paginator.apage()
 
     return render(
         request,
         "event/list.html",
-        {"events": events, "tag": tag, "section": "events"},
+        {
+            "events": events,
+            "cards": await arender_cards(events.object_list),
+            "tag": tag,
+            "calendar_url": calendar_url,
+            "section": "events",
+        },
+    )
+
+
+@login_required
+def event_search(request: HttpRequest) -> HttpResponse:
+    """Generate view enlisting published events matching a full-text query."""
+    query = request.GET.get("q", "").strip()
+    events = None
+    cards = []
+    if query:
+        results = search_events(Event.published.select_related("host"), query)
+        paginator = KeysetPaginator(results, 10, ordering=("-rank", "-id"))
+
+        try:
+            events = paginator.page(request.GET.get("cursor"))
+        except InvalidCursor:
+            events = paginator.page()
+        cards = render_cards(events.object_list)
+
+    return render(
+        request,
+        "event/search.html",
+        {
+            "events": events,
+            "cards": cards,
+            "query": query,
+            "params": urlencode({"q": query}),
+            "section": "events",
+        },
     )
 
 
 @login_required
-def event_detail(request: HttpRequest, id: int) -> HttpResponse:
+@cache_control(private=True, no_cache=True)
+@conditional_page(event_detail_validators)
+async def event_detail(request: HttpRequest, id: int) -> HttpResponse:
     """Generate detailed event view."""
-    event = get_object_or_404(Event, id=id, status=Event.Status.PUBLISHED)
+    await _pin_user(request)
+    event = await aget_object_or_404(Event.published.with_detail_relations(), id=id)
 
-    return render(request, "event/detail.html", {"event": event, "section": "events"})
+    return render(
+        request,
+        "event/detail.html",
+        {"event": event, "live_url": settings.LIVE_PATH, "section": "events"},
+    )
+
+
+@login_required
+def events_nearby(request: HttpRequest) -> HttpResponse:
+    """Generate view enlisting upcoming events around a point, nearest first."""
+    nearby_form = NearbyForm(request.GET or None)
+    events = None
+    results = []
+    if nearby_form.is_valid():
+        cd = nearby_form.cleaned_data
+        upcoming = Event.published.filter(event_date__gte=timezone.now())
+        candidates = geo.nearby(
+            upcoming.select_related("host"),
+            cd["latitude"],
+            cd["longitude"],
+            cd["radius"],
+        )
+        paginator = KeysetPaginator(candidates, 10, ordering=("distance", "id"))
+
+        try:
+            events = paginator.page(request.GET.get("cursor"))
+        except InvalidCursor:
+            events = paginator.page()
+        results = list(zip(events.object_list, render_cards(events.object_list)))
+
+    return render(
+        request,
+        "event/nearby.html",
+        {
+            "nearby_form": nearby_form,
+            "events": events,
+            "results": results,
+            "params": urlencode(
+                {name: request.GET.get(name, "") for name in nearby_form.fields}
+            ),
+            "section": "events",
+        },
+    )
+
+
+@login_required
+def friends_feed(request: HttpRequest) -> HttpResponse:
+    """Generate view enlisting upcoming events hosted or attended by friends."""
+    entries = TimelineEntry.objects.filter(
+        owner=request.social.profile, event_date__gte=timezone.now()
+    ).select_related("event__host")
+
+    paginator = KeysetPaginator(entries, 10, ordering=("event_date", "event_id"))
+
+    try:
+        entries = paginator.page(request.GET.get("cursor"))
+    except InvalidCursor:
+        entries = paginator.page()
+
+    return render(request, "event/feed.html", {"entries": entries, "section": "feed"})
+
+
+@cache_control(private=True, no_cache=True)
+@conditional_page(calendar_validators)
+async def calendar_feed(
+    request: HttpRequest, token: str, tag_slug: str = ""
+) -> HttpResponse:
+    """Stream an iCalendar feed of the user's events, or of events with a tag."""
+    user_id = token_user_id(token)
+    if (
+        user_id is None
+        or not await User.objects.filter(id=user_id, is_active=True).aexists()
+    ):
+        raise Http404
+    name = "umeal.se"
+    if tag_slug:
+        tag = await aget_object_or_404(Tag, slug=tag_slug)
+        name = f"umeal.se: {tag.name}"
+
+    stream = astream_calendar if isinstance(request, ASGIRequest) else stream_calendar
+    return StreamingHttpResponse(
+        stream(
+            window(feed_events(user_id, tag_slug)),
+            name,
+            lambda event: request.build_absolute_uri(event.get_absolute_url()),
+            request.get_host(),
+        ),
+        content_type="text/calendar; charset=utf-8",
+    )
 
 
 @login_required
@@ -70,12 +246,72 @@ def add_event(request: HttpRequest) -> HttpResponse:
 
 @login_required
 def invite_to_event(request: HttpRequest, id: int) -> HttpResponse:
-    ...
+    """Invite some or all friends of the host to their event."""
+    event = get_object_or_404(Event.published, id=id, host=request.user)
+    if request.method == "POST":
+        invite_form = InviteForm(request.social.profile, request.POST)
+        if invite_form.is_valid():
+            count = invitations.invite(
+                event,
+                invite_form.guests(),
+                request.build_absolute_uri(event.get_absolute_url()),
+            )
+            messages.success(request, f"Invited {count} friend{pluralize(count)}.")
+            return redirect("event_detail", id=event.id)
+    else:
+        invite_form = InviteForm(request.social.profile)
+
+    return render(
+        request,
+        "event/invite.html",
+        {"event": event, "invite_form": invite_form, "section": "events"},
+    )
+
+
+@login_required
+@require_POST
+def join_event(request: HttpRequest, id: int) -> HttpResponse:
+    """Add the user to attendees of an event, if there's a seat left."""
+    try:
+        if rsvp.join(id, request.user):
+            messages.success(request, "You're attending the event.")
+        else:
+            messages.error(request, "You're attending the event already.")
+    except Event.DoesNotExist:
+        raise Http404
+    except rsvp.RsvpError as e:
+        messages.error(request, str(e))
+    return redirect("event_detail", id=id)
 
 
 @login_required
-def dashboard(request: HttpRequest) -> HttpResponse:
-    return render(request, "account/dashboard.html", {"section": "dashboard"})
+@require_POST
+def leave_event(request: HttpRequest, id: int) -> HttpResponse:
+    """Remove the user from attendees of an event."""
+    try:
+        if rsvp.leave(id, request.user):
+            messages.success(request, "You're no longer attending the event.")
+        else:
+            messages.error(request, "You weren't attending the event.")
+    except Event.DoesNotExist:
+        raise Http404
+    return redirect("event_detail", id=id)
+
+
+@login_required
+async def dashboard(request: HttpRequest) -> HttpResponse:
+    await _pin_user(request)
+    await request.social.aload("friends", "friend_requests", "suggestions")
+    calendar_url = reverse("calendar", args=[calendar_token(request.user)])
+    return render(
+        request,
+        "account/dashboard.html",
+        {
+            "calendar_url": request.build_absolute_uri(calendar_url),
+            "live_url": settings.LIVE_PATH,
+            "section": "dashboard",
+        },
+    )
 
 
 def register(request: HttpRequest) -> HttpResponse:
@@ -97,9 +333,13 @@ def register(request: HttpRequest) -> HttpResponse:
 
 
 @login_required
-def show_profile(request: HttpRequest, username: str) -> HttpResponse:
+async def show_profile(request: HttpRequest, username: str) -> HttpResponse:
     """Show user profile."""
-    user = User.objects.get(username=username)
+    await _pin_user(request)
+    user = await aget_object_or_404(
+        User.objects.select_related("profile"), username=username
+    )
+    await request.social.aload("friend_ids")
     return render(
         request,
         "account/profile.html",
@@ -117,7 +357,9 @@ def edit_profile(request: HttpRequest) -> HttpResponse:
         )
         if user_form.is_valid() and profile_form.is_valid():
             user_form.save()
-            profile_form.save()
+            profile = profile_form.save()
+            if "photo" in profile_form.changed_data:
+                enqueue(process_profile_photo, profile.id)
             messages.success(request, "Profile updated successfully.")
         else:
             messages.error(request, "Error updating your profile.")
@@ -135,25 +377,26 @@ def edit_profile(request: HttpRequest) -> HttpResponse:
 @login_required
 def send_friend_request(request: HttpRequest, userID: int) -> HttpResponse:
     """Send a friend request to a user identified by userID."""
-    from_user = request.user
-    to_user = User.objects.get(id=userID)
-    _, created = Friendship.objects.get_or_create(
-        from_user=from_user.profile, to_user=to_user.profile
-    )
-    if created:
-        messages.success(request, "Friend request sent.")
+    to_profile = get_object_or_404(Profile.objects.select_related("user"), user=userID)
+    try:
+        friendship = social.request_friendship(request.social.profile, to_profile)
+    except social.FriendshipError as e:
+        messages.error(request, str(e))
     else:
-        messages.error(request, "Friend request was already sent.")
+        enqueue(
+            notifications.friend_request_sent,
+            friendship.id,
+            key=f"friend-request:{friendship.id}",
+        )
+        messages.success(request, "Friend request sent.")
 
-    return redirect("profile", username=to_user.username)
+    return redirect("profile", username=to_profile.user.username)
 
 
 @login_required
 def reject_friend_request(request: HttpRequest, requestID: int) -> HttpResponse:
     """Reject a friend request from another user.."""
-    friend_request = Friendship.objects.get(id=requestID)
-    if friend_request.to_user == request.user.profile:
-        friend_request.delete()
+    if social.reject_request(request.social.profile, requestID):
         messages.success(request, "Friend request rejected.")
     else:
         messages.error(request, "Friend request can't be rejected.")
@@ -163,23 +406,45 @@ def reject_friend_request(request: HttpRequest, requestID: int) -> HttpResponse:
 @login_required
 def accept_friend_request(request: HttpRequest, requestID: int) -> HttpResponse:
     """Accept a friend request from another user.."""
-    friend_request = Friendship.objects.get(id=requestID)
-    if friend_request.to_user == request.user.profile:
-        friend_request.to_user.friends.add(friend_request.from_user)
-        friend_request.from_user.friends.add(friend_request.to_user)
-        friend_request.delete()
+    profile = request.social.profile
+    sender_ids = social.accept_requests(profile, [requestID])
+    if sender_ids:
+        enqueue(notifications.friend_requests_accepted, profile.id, sender_ids)
         messages.success(request, "Friend request accepted.")
     else:
         messages.error(request, "Friend request can't be accepted.")
     return redirect("dashboard")
 
 
+@login_required
+@require_POST
+def accept_all_friend_requests(request: HttpRequest) -> HttpResponse:
+    """Accept every pending friend request at once."""
+    profile = request.social.profile
+    sender_ids = social.accept_requests(profile)
+    if sender_ids:
+        enqueue(notifications.friend_requests_accepted, profile.id, sender_ids)
+    count = len(sender_ids)
+    messages.success(request, f"Accepted {count} friend request{pluralize(count)}.")
+    return redirect("dashboard")
+
+
 @login_required
 def delete_friend(request: HttpRequest, userID: int) -> HttpResponse:
     """Delete existing friendship."""
-    user_profile = request.user.profile
-    friend_profile = User.objects.get(id=userID).profile
-    user_profile.friends.remove(friend_profile)
-    friend_profile.friends.remove(user_profile)
+    friend_profile = get_object_or_404(
+        Profile.objects.select_related("user"), user=userID
+    )
+    social.unfriend(request.social.profile, friend_profile.id)
 
     return redirect("profile", username=friend_profile.user.username)
+
+
+@staff_member_required
+def request_metrics(request: HttpRequest) -> HttpResponse:
+    """Dump per-view request histograms as JSON, or `?format=prometheus`."""
+    if request.GET.get("format") == "prometheus":
+        return HttpResponse(
+            registry.prometheus(), content_type="text/plain; version=0.0.4"
+        )
+    return JsonResponse(registry.snapshot())